@@ -0,0 +1,466 @@
+"""
+Content-addressed incremental cache for processed card assets
+卡片去背的增量快取：記錄來源像素雜湊、後端與參數，沒有變動的卡片直接略過
+
+The manifest is a JSON file next to the outputs. Each entry is keyed by the
+output path and stores:
+
+    source        來源檔（相對於 manifest 目錄）
+    source_hash   來源「像素」的 SHA-256（與 PNG 壓縮方式無關）
+    backend       pil / opencv / rembg
+    params        後端參數
+    output_hash   輸出檔內容的 SHA-256
+
+File size and mtime are stored as well so unchanged files are never
+decoded or re-read just to prove they are unchanged.
+
+MaskCache keeps the alpha masks a keying model produced, one grayscale PNG
+per (source pixels, model, params), so post-processing can be redone
+without running inference again.
+
+GenerationCache keeps the images ComfyUI rendered, keyed by a hash of the
+exact workflow that was submitted (prompt, seed, size, model, batch size),
+so an unchanged prompt never has to be generated twice.
+
+StageCache is the per-stage cache of the card pipeline: for every item it
+keeps the hash of the stage's inputs and parameters and the outputs that
+key produced.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+MANIFEST_NAME = ".keying_manifest.json"
+MASK_CACHE_NAME = ".mask_cache"
+GENERATION_CACHE_NAME = ".generation_cache"
+STAGE_CACHE_NAME = ".stage_cache.json"
+
+# 原地去背時原圖可能放的位置，依偏好排序：rembg 的備份與上線卡片一致，_backup 可能是較舊的圖
+ORIGINAL_SUFFIXES = ("_before_rembg.png", "_backup.png")
+# 去背卡片與原圖在可見像素上的平均 RGB 差，低於此值視為同一張圖
+ORIGINAL_MATCH_TOLERANCE = 8.0
+
+
+def hash_image(img):
+    """已開啟的 PIL 圖片的像素雜湊"""
+    digest = hashlib.sha256()
+    digest.update(f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def hash_pixels(path):
+    """來源圖片解碼後的像素雜湊：重新壓縮同一張圖不會被視為變更"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return hash_image(img)
+
+
+def hash_file(path):
+    """檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_keyed(path):
+    """圖片已經去背：有 alpha 通道且至少有一個像素不是完全不透明"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if "A" not in img.getbands():
+            return False
+        return img.getchannel("A").getextrema()[0] < 255
+
+
+def original_distance(keyed_path, original_path):
+    """
+    Mean absolute RGB difference between a keyed card and a candidate original
+
+    Only pixels the keying left visible (alpha > 0) are compared, since the
+    keyers keep the original colour there. Returns None when the sizes differ.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(keyed_path) as img:
+        keyed = np.asarray(img.convert("RGBA"), dtype=np.int16)
+    with Image.open(original_path) as img:
+        original = np.asarray(img.convert("RGB"), dtype=np.int16)
+    if keyed.shape[:2] != original.shape[:2]:
+        return None
+    visible = keyed[..., 3] > 0
+    if not visible.any():
+        visible = np.ones(visible.shape, dtype=bool)
+    return float(np.abs(keyed[..., :3] - original)[visible].mean())
+
+
+def _matching_original(keyed_path, candidates):
+    """像素差在 ORIGINAL_MATCH_TOLERANCE 以內、差最小的候選原圖；都不吻合時回傳 None"""
+    best, best_distance = None, ORIGINAL_MATCH_TOLERANCE
+    for candidate in candidates:
+        distance = original_distance(keyed_path, candidate)
+        if distance is not None and distance <= best_distance:
+            # 同分時保留排在前面（偏好較高）的候選
+            if best is None or distance < best_distance:
+                best, best_distance = candidate, distance
+    return best
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class AssetManifest:
+    """
+    JSON manifest mapping each output file to the source and settings that built it
+
+    Args:
+        path: manifest 檔案路徑，或放置 manifest 的目錄
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if path.is_dir():
+            path = path / MANIFEST_NAME
+        self.path = path
+        self.root = path.parent
+        self.entries = {}
+        # 本次執行中已計算過的雜湊：{(path, size, mtime): hash}
+        self._hash_memo = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+
+    def _key(self, path):
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _memo(self, func, path):
+        memo_key = (str(Path(path).resolve()), *_stat_key(path))
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = func(path)
+        return self._hash_memo[memo_key]
+
+    def source_hash(self, path):
+        """來源像素雜湊；大小與修改時間和 manifest 相同時沿用記錄值"""
+        for entry in self.entries.values():
+            if entry["source"] == self._key(path) and entry["source_stat"] == _stat_key(path):
+                return entry["source_hash"]
+        return self._memo(hash_pixels, path)
+
+    def output_matches(self, entry, output_path):
+        """輸出檔仍是 manifest 記錄的那一份（沒有被覆蓋或重新生成）"""
+        output_path = Path(output_path)
+        if not output_path.exists():
+            return False
+        if entry["output_stat"] == _stat_key(output_path):
+            return True
+        return self._memo(hash_file, output_path) == entry["output_hash"]
+
+    def output_entry(self, output_path):
+        """output_path 仍是 manifest 記錄的輸出時回傳該筆記錄，否則回傳 None"""
+        entry = self.entries.get(self._key(output_path))
+        if entry is not None and self.output_matches(entry, output_path):
+            return entry
+        return None
+
+    def refresh_output(self, output_path):
+        """輸出檔被後製（例如重新壓縮）後，更新記錄的輸出雜湊，來源與參數不變"""
+        entry = self.entries.get(self._key(output_path))
+        if entry is not None:
+            entry["output_hash"] = hash_file(output_path)
+            entry["output_stat"] = _stat_key(output_path)
+
+    def card_source(self, card_path, backup_path, alternates=None):
+        """
+        Decide which file holds the un-keyed art for an in-place card
+
+        Returns card_path only when the card holds new, un-keyed art, so the
+        caller should refresh its backup from it. Otherwise returns the
+        original to key from, taken from (in order of preference) the source
+        recorded for the card, alternates and backup_path:
+
+        - the card is still the output we wrote last time: the first of them
+          that exists
+        - the card is keyed but has no matching record (first run, or keyed
+          by another script): the one whose pixels match the visible pixels
+          of the card, else the first that exists
+
+        A keyed card is never returned, so it is never backed up as an
+        original. backup_path is returned when no original exists at all.
+
+        Args:
+            card_path: 原地處理的卡片
+            backup_path: 目前後端的備份檔
+            alternates: 其他可能的原圖；預設為卡片旁的 ORIGINAL_SUFFIXES 檔案
+        """
+        card_path, backup_path = Path(card_path), Path(backup_path)
+        if alternates is None:
+            alternates = [card_path.with_name(card_path.stem + suffix) for suffix in ORIGINAL_SUFFIXES]
+        entry = self.entries.get(self._key(card_path))
+
+        candidates = []
+        if entry is not None:
+            candidates.append(self.root / entry["source"])
+        candidates.extend(Path(p) for p in alternates)
+        candidates.append(backup_path)
+        candidates = [
+            c for i, c in enumerate(candidates)
+            if c.exists() and c.resolve() != card_path.resolve() and c not in candidates[:i]
+        ]
+
+        if card_path.exists():
+            if entry is not None and self.output_matches(entry, card_path):
+                return candidates[0] if candidates else backup_path
+            if not is_keyed(card_path):
+                return card_path
+            # 已去背但沒有對應記錄：找像素吻合的原圖，不能把去背結果當成原圖備份
+            matched = _matching_original(card_path, candidates)
+            if matched is not None:
+                return matched
+        return candidates[0] if candidates else backup_path
+
+    def is_fresh(self, source_path, output_path, backend, params):
+        """輸出檔存在，且來源像素、後端與參數都和上次相同"""
+        entry = self.entries.get(self._key(output_path))
+        if entry is None:
+            return False
+        if entry["backend"] != backend or entry["params"] != _normalize(params):
+            return False
+        if entry["source"] != self._key(source_path) or not Path(source_path).exists():
+            return False
+        if not self.output_matches(entry, output_path):
+            return False
+        return self.source_hash(source_path) == entry["source_hash"]
+
+    def record(self, source_path, output_path, backend, params, source_hash=None):
+        """記錄一次成功的處理結果"""
+        self.entries[self._key(output_path)] = {
+            "source": self._key(source_path),
+            "source_hash": source_hash or self.source_hash(source_path),
+            "source_stat": _stat_key(source_path),
+            "backend": backend,
+            "params": _normalize(params),
+            "output_hash": hash_file(output_path),
+            "output_stat": _stat_key(output_path),
+        }
+
+    def save(self):
+        """原子寫入 manifest，避免中斷時留下半個檔案"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class MaskCache:
+    """
+    Alpha masks stored as grayscale PNGs, keyed by source pixels + model
+
+    Args:
+        directory: 快取目錄；MaskCache.beside(source) 會使用來源旁的 .mask_cache
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def beside(cls, source_path):
+        return cls(Path(source_path).parent / MASK_CACHE_NAME)
+
+    def key(self, source_hash, model, params=None):
+        payload = json.dumps({"source": source_hash, "model": model, "params": _normalize(params)},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key):
+        return self.directory / f"{key}.png"
+
+    def load(self, key):
+        """回傳 (H, W) uint8 mask；沒有快取時回傳 None"""
+        import numpy as np
+        from PIL import Image
+
+        path = self.path(key)
+        if not path.exists():
+            return None
+        with Image.open(path) as img:
+            return np.asarray(img.convert("L"))
+
+    def store(self, key, mask):
+        """原子寫入一張 mask"""
+        import numpy as np
+        from PIL import Image
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        # 多個 worker 行程可能同時寫入同一個目錄
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        Image.fromarray(np.asarray(mask, dtype=np.uint8), "L").save(tmp_path, "PNG")
+        os.replace(tmp_path, path)
+
+    def get_or_compute(self, image, model, compute, params=None):
+        """
+        Return the cached mask for ``image``, running ``compute()`` on a miss
+
+        Returns:
+            (mask, hit) where mask is an (H, W) uint8 array
+        """
+        import numpy as np
+
+        key = self.key(hash_image(image), model, params)
+        mask = self.load(key)
+        if mask is not None:
+            self.hits += 1
+            return mask, True
+        mask = np.asarray(compute(), dtype=np.uint8)
+        self.store(key, mask)
+        self.misses += 1
+        return mask, False
+
+
+class GenerationCache:
+    """
+    Generated images stored per workflow hash, one directory per key
+
+    Args:
+        directory: 快取目錄；GenerationCache.beside(game_assets) 會使用素材目錄下的 .generation_cache
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def beside(cls, assets_dir):
+        return cls(Path(assets_dir) / GENERATION_CACHE_NAME)
+
+    def key(self, workflow):
+        """整份 workflow 的雜湊：prompt、種子、尺寸、模型任何一項改變都是新的 key"""
+        payload = json.dumps(workflow, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def lookup(self, key):
+        """回傳快取的圖片路徑列表（依生成順序）；沒有快取時回傳 None"""
+        entry = self.directory / key
+        images = sorted(entry.glob("*.png")) if entry.is_dir() else []
+        if images:
+            self.hits += 1
+            return images
+        self.misses += 1
+        return None
+
+    def store(self, key, images):
+        """
+        Link (or copy) one generation's images into the cache
+
+        Cache entries are never written in place, so they may share an inode
+        with ComfyUI's output files.
+
+        Returns:
+            The cached paths, in the same order as ``images``
+        """
+        import shutil
+        from backup_store import transfer
+
+        entry = self.directory / key
+        # 先寫進暫存目錄再改名，中斷時不會留下只有部分候選的快取
+        tmp_dir = self.directory / f"{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for index, image in enumerate(images):
+            transfer(image, tmp_dir / f"{index:02d}_{Path(image).name}", hardlink=True)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_dir, entry)
+        return sorted(entry.glob("*.png"))
+
+
+class StageCache:
+    """
+    Input-hash cache for one pipeline stage
+
+    An item is fresh when the hash of its input files plus the stage
+    parameters matches the recorded key and every recorded output still has
+    the recorded content. File hashes are memoized by size + mtime, so
+    unchanged files are never re-read.
+
+    Args:
+        path: 快取檔案路徑，或放置快取檔的目錄
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if path.is_dir() or not path.suffix:
+            path = path / STAGE_CACHE_NAME
+        self.path = path
+        self.entries = {}
+        # {絕對路徑: [size, mtime_ns, sha256]}
+        self.files = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+            self.files = data.get("files", {})
+
+    def file_hash(self, path):
+        """檔案內容雜湊；大小與修改時間沒變時沿用記錄值"""
+        name = str(Path(path).resolve())
+        stat_key = _stat_key(path)
+        known = self.files.get(name)
+        if known is None or known[:2] != stat_key:
+            known = [*stat_key, hash_file(path)]
+            self.files[name] = known
+        return known[2]
+
+    def key(self, inputs, params=None):
+        """輸入檔案內容 + 參數的雜湊"""
+        payload = json.dumps({"inputs": [self.file_hash(p) for p in inputs],
+                              "params": _normalize(params)}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_fresh(self, name, key):
+        entry = self.entries.get(name)
+        if entry is None or entry["key"] != key:
+            return False
+        return all(Path(output).exists() and self.file_hash(output) == digest
+                   for output, digest in entry["outputs"].items())
+
+    def record(self, name, key, outputs, info=None):
+        """記錄一次成功的處理結果；info 是下游需要的附帶資料（例如裁切位移）"""
+        self.entries[name] = {
+            "key": key,
+            "outputs": {str(Path(output).resolve()): self.file_hash(output) for output in outputs},
+            "info": info,
+        }
+
+    def info(self, name):
+        entry = self.entries.get(name)
+        return entry["info"] if entry else None
+
+    def save(self):
+        """原子寫入快取檔"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries, "files": self.files},
+                      f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _normalize(params):
+    # JSON 來回一次，讓 tuple/list 與 key 順序不影響比較
+    return json.loads(json.dumps(params or {}, sort_keys=True))
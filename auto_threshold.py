@@ -0,0 +1,97 @@
+"""
+Pick the white-background threshold per card from one histogram
+以每張圖一次的亮度直方圖自動決定去背閾值，不必手動反覆嘗試
+
+Every candidate threshold ``t`` (background = value > t) is scored from the
+256-bin histogram in a single vectorized pass:
+
+    otsu    只看 THRESHOLD_RANGE 下限以上的亮部，取類間變異數最大的 t
+    valley  從背景峰往暗處走，密度第一次落到谷底的位置；
+            適合灰白底或背景不是純白 255 的卡片
+
+Both results are clamped to ``THRESHOLD_RANGE`` so a dark card can never
+push the cut into the artwork.
+"""
+import numpy as np
+
+
+METHODS = ("otsu", "valley")
+THRESHOLD_RANGE = (160, 254)
+
+# valley：平滑視窗寬度，與「谷底」相對於背景峰高度的比例
+VALLEY_SMOOTHING = 5
+VALLEY_FLOOR = 0.05
+
+
+def histogram(values):
+    """uint8 陣列的 256 格直方圖（只掃描一次）"""
+    return np.bincount(values.ravel(), minlength=256)
+
+
+def otsu_scores(hist, limits=THRESHOLD_RANGE):
+    """
+    每個 t 的類間變異數；t 為暗類（前景）的最後一格
+
+    下限以下的暗部不列入統計，否則整張插圖會和白底各成一類，
+    切點落在插圖中間而不是背景邊緣。
+    """
+    hist = hist.astype(np.float64)
+    hist[:limits[0]] = 0
+    p = hist / max(hist.sum(), 1)
+    levels = np.arange(256, dtype=np.float64)
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return np.nan_to_num(scores, nan=0.0, posinf=0.0)
+
+
+def valley_scores(hist, limits=THRESHOLD_RANGE):
+    """
+    Score candidates by how deep they sit in the valley below the background peak
+
+    分數 = 在背景峰下方、平滑後密度已低於 VALLEY_FLOOR * 峰高的位置中，
+    越靠近峰越高；其餘候選為 -inf。
+    """
+    lo, hi = limits
+    kernel = np.ones(VALLEY_SMOOTHING) / VALLEY_SMOOTHING
+    smoothed = np.convolve(hist.astype(np.float64), kernel, mode="same")
+    peak = lo + int(np.argmax(smoothed[lo:]))
+
+    levels = np.arange(256)
+    floor = max(VALLEY_FLOOR * smoothed[peak], smoothed[lo:peak + 1].min())
+    candidate = (levels >= lo) & (levels < peak) & (smoothed <= floor)
+    return np.where(candidate, levels.astype(np.float64), -np.inf)
+
+
+def choose_threshold(hist, method="valley", limits=THRESHOLD_RANGE):
+    """回傳直方圖在 method 下分數最高、且落在 limits 內的閾值"""
+    if method == "otsu":
+        scores = otsu_scores(hist, limits)
+    elif method == "valley":
+        scores = valley_scores(hist, limits)
+    else:
+        raise ValueError(f"Unknown threshold method {method!r}, expected one of {METHODS}")
+
+    lo, hi = limits
+    if not np.isfinite(scores[lo:hi + 1]).any():
+        # 沒有谷底（例如整張都是背景）：退回上限，只去掉最亮的像素
+        return hi
+    return lo + int(np.argmax(scores[lo:hi + 1]))
+
+
+def resolve_threshold(values, threshold):
+    """數字直接回傳；"otsu" / "valley" 則從 values 的直方圖計算"""
+    if isinstance(threshold, str):
+        return choose_threshold(histogram(values), threshold)
+    return threshold
+
+
+def parse_threshold(text):
+    """argparse 型別：整數或自動方法名稱"""
+    if text in METHODS:
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"threshold must be 0-255 or one of {', '.join(METHODS)}") from None
@@ -0,0 +1,180 @@
+"""
+Crop keyed cards to their alpha bounding box with uniform padding
+把去背後的卡片裁到 alpha 的最小外框，四周保留一致的透明邊距，並記錄裁切位移
+
+The offsets go to ``crop_manifest.json`` so layout code can put a cropped
+card back where it sat on the original 720x1280 canvas:
+
+    {"fish_origami.png": {"source_size": [720, 1280], "offset": [x, y],
+                          "size": [w, h], "padding": 8}}
+
+``offset`` is the position of the cropped image's top-left corner on the
+original canvas (it can be negative when the padding extends past the edge).
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from asset_cache import AssetManifest
+from batch_remove_background import collect_inputs
+
+
+MANIFEST_NAME = "crop_manifest.json"
+
+
+def alpha_bbox(alpha, threshold=0):
+    """
+    Tight bounding box of pixels with alpha > threshold
+
+    Returns:
+        (left, top, right, bottom) with exclusive right/bottom, or None when
+        the image is fully transparent
+    """
+    opaque = alpha > threshold
+    rows = np.flatnonzero(opaque.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(opaque.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def crop_to_alpha(img, padding=8, threshold=0):
+    """
+    Crop an RGBA image to its alpha bounding box plus ``padding`` on every side
+
+    Returns:
+        (cropped_image, offset) where offset is the (x, y) of the cropped
+        image on the original canvas; (img, (0, 0)) when nothing is opaque
+    """
+    rgba = np.asarray(img)
+    bbox = alpha_bbox(rgba[..., 3], threshold)
+    if bbox is None:
+        return img, (0, 0)
+
+    left, top, right, bottom = bbox
+    out = np.zeros((bottom - top + 2 * padding, right - left + 2 * padding, 4), dtype=np.uint8)
+    out[padding:padding + bottom - top, padding:padding + right - left] = rgba[top:bottom, left:right]
+    return Image.fromarray(out, "RGBA"), (left - padding, top - padding)
+
+
+def load_manifest(directory):
+    path = Path(directory) / MANIFEST_NAME
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def crop_cards(files, output_dir=None, padding=8, threshold=0):
+    """
+    Crop every file and update the manifest in the output directory
+
+    With output_dir=None the files are overwritten; offsets of cards that
+    were already cropped are composed with the previous ones so the manifest
+    always refers to the original canvas, and cards tracked by the keying
+    manifest get their recorded output refreshed so the next keying run does
+    not mistake the cropped card for new art.
+
+    Returns:
+        list of per-card result dicts
+    """
+    target_dir = Path(output_dir) if output_dir is not None else files[0].parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(target_dir)
+    # 原地裁切去背輸出時要同步更新 keying manifest，否則會被當成「換了新圖」
+    keying = AssetManifest(target_dir) if output_dir is None else None
+    keyed = []
+
+    results = []
+    for path in files:
+        if keying is not None and keying.output_entry(path) is not None:
+            keyed.append(path)
+        img = Image.open(path).convert("RGBA")
+        before_bytes = path.stat().st_size
+        cropped, (dx, dy) = crop_to_alpha(img, padding, threshold)
+
+        previous = manifest.get(path.name) if output_dir is None else None
+        if previous and list(img.size) == previous["size"]:
+            # 已經裁過：位移要疊加在上一次的結果上
+            source_size = previous["source_size"]
+            offset = [previous["offset"][0] + dx, previous["offset"][1] + dy]
+        else:
+            source_size = list(img.size)
+            offset = [dx, dy]
+
+        out_path = target_dir / path.name
+        cropped.save(out_path, "PNG")
+        manifest[path.name] = {
+            "source_size": source_size,
+            "offset": offset,
+            "size": list(cropped.size),
+            "padding": padding,
+        }
+        results.append({
+            "card": path.name,
+            "before_pixels": img.width * img.height,
+            "after_pixels": cropped.width * cropped.height,
+            "before_bytes": before_bytes,
+            "after_bytes": out_path.stat().st_size,
+            "size": cropped.size,
+        })
+        print(f"[CROP] {path.name:28s} {img.width}x{img.height} -> {cropped.width}x{cropped.height} "
+              f"at ({offset[0]}, {offset[1]})")
+
+    with open(target_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if keyed:
+        for path in keyed:
+            keying.refresh_output(path)
+        keying.save()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop keyed cards to their alpha bounding box")
+    parser.add_argument("inputs", help="directory or glob pattern of keyed PNG files")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", type=Path, help="write cropped images here")
+    output.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("--padding", type=int, default=8, help="transparent border kept on every side")
+    parser.add_argument("--alpha-threshold", type=int, default=0,
+                        help="alpha values at or below this count as empty")
+    args = parser.parse_args()
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        print(f"[ERROR] No PNG files matched: {args.inputs}")
+        return
+
+    print("=" * 80)
+    print(" " * 28 + "ALPHA AUTO-CROP")
+    print("=" * 80)
+    start = time.perf_counter()
+    results = crop_cards(files, None if args.in_place else args.output_dir,
+                         args.padding, args.alpha_threshold)
+    elapsed = time.perf_counter() - start
+
+    before_px = sum(r["before_pixels"] for r in results)
+    after_px = sum(r["after_pixels"] for r in results)
+    before_bytes = sum(r["before_bytes"] for r in results)
+    after_bytes = sum(r["after_bytes"] for r in results)
+
+    print()
+    print("=" * 80)
+    print("AUTO-CROP COMPLETE!")
+    print("=" * 80)
+    print(f"[CARDS] {len(results)} in {elapsed:.2f}s")
+    print(f"[TEXTURE] {before_px * 4 / 2**20:.1f} MB -> {after_px * 4 / 2**20:.1f} MB RGBA "
+          f"({after_px / before_px:.0%})")
+    print(f"[BYTES] {before_bytes / 1024:.0f} KB -> {after_bytes / 1024:.0f} KB "
+          f"({after_bytes / before_bytes:.0%})")
+    print(f"[MANIFEST] {MANIFEST_NAME} (offsets on the original canvas)")
+
+
+if __name__ == "__main__":
+    main()
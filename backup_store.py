@@ -0,0 +1,288 @@
+"""
+Content-addressed store for the original (un-keyed) card art
+去背前原圖的內容定址備份庫：同樣內容只存一份，備份檔只是指向它的連結
+
+Layout next to the cards:
+
+    .originals/objects/<sha256>.png   每種內容一份，唯讀
+    .originals/index.json             {"fish_origami_backup.png": [{"hash", "source", "time"}, ...]}
+
+``*_backup.png`` and ``*_before_rembg.png`` stay where the scripts expect
+them, but are hardlinks to the object (reflink or plain copy when the
+filesystem cannot hardlink), so identical originals cost one copy on disk and
+earlier versions can be restored:
+
+    python backup_store.py migrate assets/cards
+    python backup_store.py list assets/cards/fish_origami.png
+    python backup_store.py restore assets/cards/fish_origami.png --version -2
+"""
+import argparse
+import json
+import os
+import shutil
+import stat
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from asset_cache import hash_file
+
+
+STORE_NAME = ".originals"
+BACKUP_SUFFIXES = ("_backup.png", "_before_rembg.png")
+
+# Linux FICLONE ioctl（btrfs / XFS / bcachefs 的 copy-on-write 複製）
+_FICLONE = 0x40049409
+
+
+def reflink_or_copy(source, target):
+    """能 reflink 就 reflink（不佔額外空間），否則一般複製；回傳使用的方法"""
+    source, target = Path(source), Path(target)
+    try:
+        import fcntl
+
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        shutil.copyfile(source, target)
+        return "copy"
+
+
+def transfer(source, target, hardlink=False, verify=True):
+    """
+    Place ``source``'s bytes at ``target`` with as little copying as possible
+
+    Hardlinks are only used when ``hardlink`` is True: a linked target shares
+    its inode with the source, so it must never be written in place. Otherwise
+    a reflink is tried before a plain copy. Copies are checked by hash, and
+    the target only appears (via rename) once it is complete.
+
+    Returns:
+        hardlink / reflink / copy
+    """
+    source, target = Path(source), Path(target)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        _unlink(tmp_path)
+    method = None
+    if hardlink:
+        try:
+            os.link(source, tmp_path)
+            method = "hardlink"
+        except OSError:
+            pass
+    if method is None:
+        method = reflink_or_copy(source, tmp_path)
+        if verify and hash_file(source) != hash_file(tmp_path):
+            _unlink(tmp_path)
+            raise OSError(f"{method} of {source} to {target} does not match the source")
+    os.replace(tmp_path, target)
+    return method
+
+
+def _unlink(path):
+    """刪除可能是唯讀連結的檔案（Windows 上唯讀檔案不能直接刪）"""
+    try:
+        os.unlink(path)
+    except PermissionError:
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        os.unlink(path)
+
+
+class BackupStore:
+    """
+    Deduplicated backups of card originals
+
+    Args:
+        directory: 卡片目錄；備份庫放在其下的 .originals
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.root = self.directory / STORE_NAME
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.index = {}
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f).get("backups", {})
+
+    def object_path(self, digest):
+        return self.objects / f"{digest}.png"
+
+    def put(self, path, digest=None):
+        """把檔案內容放進備份庫（已存在則不動），回傳內容雜湊"""
+        digest = digest or hash_file(path)
+        target = self.object_path(digest)
+        if not target.exists():
+            self.objects.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            # 物件必須是獨立的一份：卡片之後會被原地覆寫，不能與它共用 inode
+            reflink_or_copy(path, tmp_path)
+            # 唯讀：對備份連結的原地寫入會失敗，而不是悄悄改壞物件
+            os.chmod(tmp_path, stat.S_IREAD)
+            os.replace(tmp_path, target)
+        return digest
+
+    def link(self, digest, target):
+        """讓 target 指向物件：優先硬連結，否則 reflink / 複製；回傳使用的方法"""
+        source = self.object_path(digest)
+        target = Path(target)
+        if target.exists():
+            if os.path.samefile(source, target):
+                return "unchanged"
+            _unlink(target)
+            # Windows 上解除唯讀會作用在同一個 inode，刪掉舊連結後再設回來
+            os.chmod(source, stat.S_IREAD)
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError:
+            return reflink_or_copy(source, target)
+
+    def current(self, backup_path):
+        """備份檔目前記錄的版本，沒有時回傳 None"""
+        history = self.index.get(Path(backup_path).name)
+        return history[-1] if history else None
+
+    def backup(self, card_path, backup_path):
+        """
+        Store the card's bytes and point ``backup_path`` at them
+
+        內容與目前的備份相同時只計算一次雜湊，不寫任何檔案。
+
+        Returns:
+            (digest, method) where method is hardlink / reflink / copy / unchanged
+        """
+        card_path, backup_path = Path(card_path), Path(backup_path)
+        digest = hash_file(card_path)
+        latest = self.current(backup_path)
+        if latest and latest["hash"] == digest and backup_path.exists() \
+                and self.object_path(digest).exists():
+            return digest, "unchanged"
+
+        self.put(card_path, digest)
+        method = self.link(digest, backup_path)
+        self._record(backup_path, digest, card_path.name)
+        self.save()
+        return digest, method
+
+    def adopt(self, backup_path):
+        """把既有的一般備份檔收進備份庫，原地換成連結；回傳 (digest, method)"""
+        backup_path = Path(backup_path)
+        digest = hash_file(backup_path)
+        self.put(backup_path, digest)
+        method = self.link(digest, backup_path)
+        latest = self.current(backup_path)
+        if not latest or latest["hash"] != digest:
+            self._record(backup_path, digest, backup_path.name)
+        return digest, method
+
+    def _record(self, backup_path, digest, source_name):
+        self.index.setdefault(Path(backup_path).name, []).append({
+            "hash": digest,
+            "source": source_name,
+            # 微秒精度：同一次執行內的多個版本也能正確排序
+            "time": datetime.now().isoformat(timespec="microseconds"),
+        })
+
+    def history_for(self, card_path):
+        """卡片所有備份的版本，依時間排序：[(backup_name, entry), ...]"""
+        stem = Path(card_path).stem
+        names = [stem + suffix for suffix in BACKUP_SUFFIXES]
+        versions = [(name, entry) for name in names for entry in self.index.get(name, [])]
+        return sorted(versions, key=lambda item: item[1]["time"])
+
+    def restore(self, card_path, version=-1, target=None):
+        """
+        Copy a stored version back over the card (or ``target``)
+
+        還原的是獨立可寫的一份，之後對卡片的處理不會影響備份庫。
+
+        Returns:
+            (backup_name, entry) that was restored
+        """
+        versions = self.history_for(card_path)
+        if not versions:
+            raise LookupError(f"No backups recorded for {Path(card_path).name}")
+        name, entry = versions[version]
+        target = Path(target or card_path)
+        if target.exists():
+            _unlink(target)
+        reflink_or_copy(self.object_path(entry["hash"]), target)
+        os.chmod(target, stat.S_IREAD | stat.S_IWRITE)
+        return name, entry
+
+    def stats(self):
+        """物件數、實際佔用與備份檔的邏輯大小（bytes）"""
+        objects = list(self.objects.glob("*.png")) if self.objects.exists() else []
+        stored = sum(p.stat().st_size for p in objects)
+        logical = sum(
+            p.stat().st_size for suffix in BACKUP_SUFFIXES
+            for p in self.directory.glob("*" + suffix)
+        )
+        return {"objects": len(objects), "stored_bytes": stored, "backup_bytes": logical}
+
+    def save(self):
+        """原子寫入 index"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "backups": self.index}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+
+def backup_original(card_path, backup_path):
+    """各去背腳本共用：把卡片目前的內容存成 backup_path，回傳使用的方法"""
+    _, method = BackupStore(Path(card_path).parent).backup(card_path, backup_path)
+    return method
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicated store for card originals")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="turn existing backup files into store links")
+    migrate.add_argument("cards_dir", type=Path)
+    listing = sub.add_parser("list", help="show the stored versions of a card")
+    listing.add_argument("card", type=Path)
+    restore = sub.add_parser("restore", help="copy a stored version back over a card")
+    restore.add_argument("card", type=Path)
+    restore.add_argument("--version", type=int, default=-1,
+                         help="index into the version list (default: latest)")
+    restore.add_argument("--output", type=Path, help="write here instead of over the card")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        store = BackupStore(args.cards_dir)
+        for suffix in BACKUP_SUFFIXES:
+            for path in sorted(args.cards_dir.glob("*" + suffix)):
+                digest, method = store.adopt(path)
+                print(f"  {path.name:40s} {digest[:12]} {method}")
+        store.save()
+        s = store.stats()
+        print(f"[STORE] {s['objects']} object(s), {s['stored_bytes'] / 1024:.0f} KB stored for "
+              f"{s['backup_bytes'] / 1024:.0f} KB of backup files")
+        return 0
+
+    store = BackupStore(args.card.parent)
+    if args.command == "list":
+        versions = store.history_for(args.card)
+        if not versions:
+            print(f"[NONE] No backups recorded for {args.card.name}")
+            return 1
+        for i, (name, entry) in enumerate(versions):
+            print(f"  [{i - len(versions)}] {entry['time'][:19]}  {entry['hash'][:12]}  {name}")
+        return 0
+
+    try:
+        name, entry = store.restore(args.card, args.version, args.output)
+    except (LookupError, IndexError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    print(f"[RESTORED] {args.output or args.card} <- {name} ({entry['time'][:19]}, {entry['hash'][:12]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Batch background removal across all CPU cores
+多核心批次去背：支援 PIL 閾值、OpenCV 形態學與 rembg 三種後端
+
+Examples:
+    python batch_remove_background.py assets/cards --backend pil --in-place
+    python batch_remove_background.py "assets/cards/*_backup.png" --backend opencv --output-dir out
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from asset_cache import AssetManifest, hash_pixels
+from auto_threshold import parse_threshold
+from backup_store import backup_original
+
+
+BACKENDS = ("pil", "opencv", "rembg")
+
+# 備份檔不是最終卡片，目錄模式下預設略過
+VARIANT_SUFFIXES = ("_backup.png", "_before_rembg.png")
+
+# 原地處理時原圖保存的位置，與各個單獨腳本一致
+BACKUP_SUFFIX = {
+    "pil": "_backup.png",
+    "opencv": "_backup.png",
+    "rembg": "_before_rembg.png",
+}
+
+
+def collect_inputs(pattern, include_variants=False):
+    """
+    將目錄或 glob 展開成排序後的 PNG 路徑列表
+
+    只有目錄會略過備份檔；使用者明確寫出的 glob 或檔案照單全收
+    """
+    path = Path(pattern)
+    if path.is_dir():
+        files = sorted(path.glob("*.png"))
+        if not include_variants:
+            files = [f for f in files if not f.name.endswith(VARIANT_SUFFIXES)]
+        return files
+    if path.is_file():
+        return [path]
+    return sorted(Path(p) for p in glob.glob(pattern))
+
+
+def _key_pil(input_path, output_path, threshold, softness):
+    import numpy as np
+    from PIL import Image
+    from remove_background import key_white_background
+
+    rgba = np.array(Image.open(input_path).convert("RGBA"))
+    key_white_background(rgba, threshold=threshold, softness=softness)
+    Image.fromarray(rgba, "RGBA").save(output_path, "PNG")
+
+
+_opencv_keyer = None
+
+
+def _key_opencv(input_path, output_path, threshold, softness):
+    global _opencv_keyer
+    from remove_bg_opencv import OpenCVKeyer
+
+    # 每個 worker 行程重複使用同一組緩衝區與 kernel
+    if _opencv_keyer is None or _opencv_keyer.threshold != threshold:
+        _opencv_keyer = OpenCVKeyer(threshold=threshold)
+    _opencv_keyer.key_file(input_path, output_path)
+
+
+_rembg_worker = None
+_rembg_threads = None
+
+
+def _init_pool(rembg_threads):
+    global _rembg_threads
+    _rembg_threads = rembg_threads
+
+
+def _key_rembg(input_path, output_path, threshold, softness):
+    global _rembg_worker
+    from rembg_worker import RembgWorker
+
+    # 每個 worker 行程只載入一次模型
+    if _rembg_worker is None:
+        _rembg_worker = RembgWorker(intra_op_threads=_rembg_threads)
+    # 同一張原圖 + 模型的 mask 會從快取讀取，不必重跑推論
+    result = _rembg_worker.remove_file(input_path, output_path)
+    if result["error"]:
+        raise RuntimeError(result["error"])
+
+
+_BACKEND_FUNCS = {
+    "pil": _key_pil,
+    "opencv": _key_opencv,
+    "rembg": _key_rembg,
+}
+
+
+def process_one(backend, input_path, output_path, threshold=240, softness=16):
+    """
+    Key a single image in a worker process
+
+    Returns:
+        dict with input/output paths, elapsed seconds and an error string
+        (None on success). Exceptions never escape so one bad card cannot
+        take down the whole pool.
+    """
+    start = time.perf_counter()
+    error = None
+    source_hash = None
+    try:
+        _BACKEND_FUNCS[backend](input_path, output_path, threshold, softness)
+        # 順便在 worker 裡算好來源雜湊，主行程寫 manifest 時不必再解碼
+        source_hash = hash_pixels(input_path)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "input": str(input_path),
+        "output": str(output_path),
+        "time": time.perf_counter() - start,
+        "error": error,
+        "source_hash": source_hash,
+    }
+
+
+def backend_params(backend, threshold, softness):
+    """會影響輸出的參數，寫進 manifest 判斷是否需要重做"""
+    if backend == "pil":
+        return {"threshold": threshold, "softness": softness}
+    if backend == "opencv":
+        return {"threshold": threshold, "feather": 0}
+    from rembg_worker import DEFAULT_MODEL
+    return {"model": DEFAULT_MODEL}
+
+
+def plan_jobs(files, backend, output_dir, manifest, params, force=False):
+    """
+    Pair every input with its source and output, dropping unchanged ones
+
+    In-place runs key from the backup copy of the original art, creating or
+    refreshing it when the card holds new art.
+
+    Returns:
+        (jobs, skipped) lists of (source_path, output_path)
+    """
+    jobs = []
+    skipped = []
+    for input_path in files:
+        if output_dir is None:
+            output_path = input_path
+            backup_path = input_path.with_name(input_path.stem + BACKUP_SUFFIX[backend])
+            source_path = manifest.card_source(input_path, backup_path)
+            if source_path == input_path:
+                backup_original(input_path, backup_path)
+                source_path = backup_path
+        else:
+            source_path = input_path
+            output_path = output_dir / input_path.name
+
+        if not force and manifest.is_fresh(source_path, output_path, backend, params):
+            skipped.append((source_path, output_path))
+        else:
+            jobs.append((source_path, output_path))
+    return jobs, skipped
+
+
+def run_batch(files, backend, output_dir=None, workers=None, threshold=240, softness=16, force=False):
+    """
+    Spread background removal over a process pool
+
+    Args:
+        files: 輸入圖片路徑列表
+        backend: "pil"、"opencv" 或 "rembg"
+        output_dir: 輸出目錄；None 表示覆蓋原檔
+        workers: 行程數，預設為 CPU 核心數
+        force: 忽略 manifest，全部重新處理
+
+    Returns:
+        (results, skipped, wall_time) where results is a list of process_one
+        dicts and skipped the (source, output) pairs that were up to date
+    """
+    workers = workers or os.cpu_count() or 1
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = AssetManifest(output_dir if output_dir is not None else Path(files[0]).parent)
+    params = backend_params(backend, threshold, softness)
+    jobs, skipped = plan_jobs(files, backend, output_dir, manifest, params, force=force)
+    for _, output_path in skipped:
+        print(f"[CACHED] {output_path.name}")
+
+    # 平分 CPU 給各行程的 ONNX Runtime，避免執行緒過度訂閱
+    workers = min(workers, len(jobs)) or 1
+    rembg_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    results = []
+    start = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool,
+                                 initargs=(rembg_threads,)) as pool:
+            futures = [
+                pool.submit(process_one, backend, i, o, threshold, softness)
+                for i, o in jobs
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                status = "ERROR" if result["error"] else "OK"
+                print(f"[{done}/{len(jobs)}] {status:5s} {Path(result['output']).name:40s} {result['time']:7.3f}s")
+                if not result["error"]:
+                    manifest.record(result["input"], result["output"], backend, params,
+                                    source_hash=result["source_hash"])
+
+    manifest.save()
+    return results, skipped, time.perf_counter() - start
+
+
+def print_summary(results, skipped, wall_time, backend, workers):
+    """印出吞吐量統計與失敗報告"""
+    ok = [r for r in results if not r["error"]]
+    failed = [r for r in results if r["error"]]
+    busy = sum(r["time"] for r in results)
+
+    print()
+    print("=" * 80)
+    print("BATCH BACKGROUND REMOVAL COMPLETE!")
+    print("=" * 80)
+    print(f"[BACKEND] {backend}   [WORKERS] {workers}")
+    print(f"[SUCCESS] Processed: {len(ok)}/{len(results)} images")
+    print(f"[CACHED] Unchanged, skipped: {len(skipped)}")
+    print(f"[TIME] Wall: {wall_time:.2f}s   Sum of per-image time: {busy:.2f}s")
+    if results and wall_time > 0:
+        print(f"[THROUGHPUT] {len(results) / wall_time:.2f} images/s "
+              f"(parallel efficiency {busy / wall_time / workers:.0%})")
+    if ok:
+        times = sorted(r["time"] for r in ok)
+        print(f"[LATENCY] min {times[0]:.3f}s / median {times[len(times) // 2]:.3f}s / max {times[-1]:.3f}s")
+
+    if failed:
+        print()
+        print(f"[FAILED] {len(failed)} image(s):")
+        for r in failed:
+            print(f"  - {r['input']}: {r['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch background removal across all CPU cores")
+    parser.add_argument("inputs", help="directory or glob pattern of PNG files")
+    parser.add_argument("--backend", choices=BACKENDS, default="pil")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", type=Path, help="write keyed images here")
+    output.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="process pool size (default: number of CPUs)")
+    parser.add_argument("--threshold", type=parse_threshold, default=240,
+                        help="white threshold for the pil and opencv backends, "
+                             "or otsu/valley to pick it per image from its histogram")
+    parser.add_argument("--softness", type=int, default=16,
+                        help="alpha ramp width below the threshold for the pil backend")
+    parser.add_argument("--include-variants", action="store_true",
+                        help="also process *_backup.png and *_before_rembg.png files in a directory")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the manifest and rebuild every image")
+    args = parser.parse_args(argv)
+
+    files = collect_inputs(args.inputs, include_variants=args.include_variants)
+    if not files:
+        print(f"[ERROR] No PNG files matched: {args.inputs}")
+        return 1
+
+    workers = max(1, min(args.workers or 1, len(files)))
+    print("=" * 80)
+    print(" " * 22 + "BATCH BACKGROUND REMOVAL")
+    print("=" * 80)
+    print(f"[INPUT] {len(files)} images   [BACKEND] {args.backend}   [WORKERS] {workers}")
+    print(f"[OUTPUT] {'in place' if args.in_place else args.output_dir}")
+    print()
+
+    results, skipped, wall_time = run_batch(
+        files, args.backend,
+        output_dir=None if args.in_place else args.output_dir,
+        workers=workers, threshold=args.threshold, softness=args.softness,
+        force=args.force,
+    )
+    print_summary(results, skipped, wall_time, args.backend, workers)
+
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Benchmark every background-removal backend on the same card corpus
+用同一組卡片原圖比較 pil / opencv / rembg 三種去背後端的速度、記憶體與遮罩品質
+
+    python benchmark_backends.py --output benchmarks/backends.json
+    python benchmark_backends.py --baseline benchmarks/backends.json
+
+Each backend runs in its own fresh process so its peak RSS is not polluted
+by the others. Timings cover decode + keying in memory (no PNG encode), after
+one untimed warm-up image; rembg's model load is reported separately.
+
+Mask quality is the IoU of ``alpha > 127`` against hand-made reference masks
+``<reference-dir>/<card>_mask.png`` (white = card, black = background).
+``--make-references BACKEND`` writes a starting set from one backend for
+touching up by hand; cards without a reference show ``n/a``.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from auto_threshold import parse_threshold
+from batch_remove_background import BACKENDS
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+DEFAULT_REFERENCE_DIR = ROOT / "benchmarks" / "reference_masks"
+
+# 每張卡片都有 rembg 前的原圖，三種後端都從這裡開始
+CORPUS_SUFFIX = "_before_rembg.png"
+MASK_THRESHOLD = 127
+
+
+def collect_corpus(cards_dir):
+    """回傳 (卡片名稱, 原圖路徑) 列表，依名稱排序"""
+    return [
+        (path.name[:-len(CORPUS_SUFFIX)], path)
+        for path in sorted(Path(cards_dir).glob("*" + CORPUS_SUFFIX))
+    ]
+
+
+def peak_rss():
+    """目前行程的峰值常駐記憶體（bytes）；取不到時回傳 None"""
+    try:
+        import resource
+    except ImportError:
+        # Windows 沒有 resource 模組，改用 psutil（若有安裝）
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 回報 KB，macOS 回報 bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _alpha_pil(path, threshold, softness):
+    from remove_background import key_white_background
+
+    rgba = np.array(Image.open(path).convert("RGBA"))
+    key_white_background(rgba, threshold=threshold, softness=softness)
+    return rgba[..., 3]
+
+
+_opencv_keyer = None
+
+
+def _alpha_opencv(path, threshold, softness):
+    import cv2
+    from remove_bg_opencv import OpenCVKeyer
+
+    global _opencv_keyer
+    if _opencv_keyer is None:
+        _opencv_keyer = OpenCVKeyer(threshold)
+    return _opencv_keyer.mask_of(cv2.imread(str(path)))
+
+
+_rembg_worker = None
+
+
+def _alpha_rembg(path, threshold, softness):
+    from rembg_worker import RembgWorker
+
+    global _rembg_worker
+    if _rembg_worker is None:
+        _rembg_worker = RembgWorker()
+    # 直接推論，不經過 mask 快取
+    return _rembg_worker.mask(Image.open(path))
+
+
+_ALPHA_FUNCS = {
+    "pil": _alpha_pil,
+    "opencv": _alpha_opencv,
+    "rembg": _alpha_rembg,
+}
+
+
+def load_reference(reference_dir, card):
+    path = Path(reference_dir) / f"{card}_mask.png"
+    if not path.exists():
+        return None
+    return np.asarray(Image.open(path).convert("L")) > MASK_THRESHOLD
+
+
+def mask_iou(mask, reference):
+    """兩個布林遮罩的 IoU；兩者都是空的時視為 1.0"""
+    union = np.count_nonzero(mask | reference)
+    if union == 0:
+        return 1.0
+    return np.count_nonzero(mask & reference) / union
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_backend(backend, corpus, reference_dir, threshold=240, softness=16, repeat=1,
+                make_references=False):
+    """
+    Time one backend over the corpus and score its masks
+
+    Runs inside a dedicated worker process.
+
+    Returns:
+        result dict for the JSON report (error is set instead of raising)
+    """
+    result = {"backend": backend, "error": None}
+    alpha_of = _ALPHA_FUNCS[backend]
+    rss_before = peak_rss()
+    try:
+        if backend == "rembg":
+            from rembg_worker import RembgWorker
+
+            global _rembg_worker
+            _rembg_worker = RembgWorker()
+            result["load_time"] = _rembg_worker.load()
+        # 暖機：第一次呼叫的 import 與配置不算進延遲
+        alpha_of(corpus[0][1], threshold, softness)
+
+        latencies = []
+        cards = []
+        start = time.perf_counter()
+        for card, path in corpus:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                alpha = alpha_of(path, threshold, softness)
+                latencies.append(time.perf_counter() - t0)
+
+            mask = alpha > MASK_THRESHOLD
+            if make_references:
+                Path(reference_dir).mkdir(parents=True, exist_ok=True)
+                Image.fromarray(mask.astype(np.uint8) * 255, "L").save(
+                    Path(reference_dir) / f"{card}_mask.png")
+            reference = load_reference(reference_dir, card)
+            if reference is not None and reference.shape != mask.shape:
+                reference = None
+            cards.append({
+                "card": card,
+                "coverage": float(mask.mean()),
+                "iou": None if reference is None else mask_iou(mask, reference),
+            })
+        wall_time = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    scored = [c["iou"] for c in cards if c["iou"] is not None]
+    result.update({
+        "images": len(latencies),
+        "wall_time": wall_time,
+        "images_per_sec": len(latencies) / wall_time if wall_time else None,
+        "p50_latency": percentile(latencies, 50),
+        "p95_latency": percentile(latencies, 95),
+        "peak_rss": peak_rss(),
+        "baseline_rss": rss_before,
+        "mean_iou": sum(scored) / len(scored) if scored else None,
+        "min_iou": min(scored) if scored else None,
+        "cards": cards,
+    })
+    return result
+
+
+def run_suite(corpus, backends, reference_dir, threshold=240, softness=16, repeat=1,
+              make_references=None):
+    """每個後端各開一個新的 spawn 行程依序執行，避免互相影響記憶體與 CPU"""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        print(f"[RUN] {backend} ...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            future = pool.submit(run_backend, backend, corpus, str(reference_dir),
+                                 threshold, softness, repeat, backend == make_references)
+            results.append(future.result())
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fmt(value, pattern, missing="n/a"):
+    return missing if value is None else format(value, pattern)
+
+
+def print_report(results):
+    print()
+    print(f"{'backend':8s} {'img/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'peak MB':>9s} "
+          f"{'mean IoU':>9s} {'min IoU':>8s}")
+    for r in results:
+        if r["error"]:
+            print(f"{r['backend']:8s} [FAILED] {r['error']}")
+            continue
+        p50 = r["p50_latency"] * 1000
+        p95 = r["p95_latency"] * 1000
+        peak = r["peak_rss"] / 2**20 if r["peak_rss"] else None
+        print(f"{r['backend']:8s} {r['images_per_sec']:8.1f} {p50:8.1f} {p95:8.1f} "
+              f"{_fmt(peak, '9.0f'):>9s} {_fmt(r['mean_iou'], '9.4f'):>9s} "
+              f"{_fmt(r['min_iou'], '8.4f'):>8s}")
+        if r.get("load_time") is not None:
+            print(f"{'':8s} model load {r['load_time']:.2f}s (not included above)")
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Print the change against a previous report
+
+    Returns:
+        list of regression descriptions (throughput dropped by more than
+        ``tolerance`` or mean IoU dropped by more than 0.01)
+    """
+    previous = {r["backend"]: r for r in baseline["results"] if not r.get("error")}
+    regressions = []
+    print()
+    print(f"[BASELINE] {baseline.get('commit') or '?'} at {baseline.get('timestamp', '?')}")
+    for r in results:
+        old = previous.get(r["backend"])
+        if r["error"] or old is None:
+            continue
+        speed = r["images_per_sec"] / old["images_per_sec"] - 1
+        line = f"  {r['backend']:8s} throughput {speed:+.1%}"
+        if speed < -tolerance:
+            regressions.append(f"{r['backend']} throughput {speed:+.1%}")
+        if r["mean_iou"] is not None and old.get("mean_iou") is not None:
+            delta = r["mean_iou"] - old["mean_iou"]
+            line += f", mean IoU {delta:+.4f}"
+            if delta < -0.01:
+                regressions.append(f"{r['backend']} mean IoU {delta:+.4f}")
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the background-removal backends")
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR)
+    parser.add_argument("--reference-dir", type=Path, default=DEFAULT_REFERENCE_DIR)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--threshold", type=parse_threshold, default=240,
+                        help="0-255, or otsu/valley for a per-image threshold")
+    parser.add_argument("--softness", type=int, default=16, help="pil backend edge ramp")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per image")
+    parser.add_argument("--make-references", choices=BACKENDS,
+                        help="write reference masks from this backend (to be corrected by hand)")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path,
+                        help="previous --output file; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed throughput drop vs the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    corpus = collect_corpus(args.cards_dir)
+    if not corpus:
+        print(f"[ERROR] No *{CORPUS_SUFFIX} originals found in {args.cards_dir}")
+        return 1
+
+    print("=" * 80)
+    print(" " * 22 + "BACKGROUND REMOVAL BACKEND BENCHMARK")
+    print("=" * 80)
+    print(f"[CORPUS] {len(corpus)} originals from {args.cards_dir}")
+    print(f"[REFERENCES] {args.reference_dir}")
+    print(f"[THRESHOLD] {args.threshold}   [SOFTNESS] {args.softness}   [REPEAT] {args.repeat}")
+
+    results = run_suite(corpus, args.backends, args.reference_dir, args.threshold,
+                        args.softness, args.repeat, args.make_references)
+    print_report(results)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "corpus": [card for card, _ in corpus],
+        "params": {"threshold": args.threshold, "softness": args.softness, "repeat": args.repeat},
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OUTPUT] {args.output}")
+
+    if regressions:
+        print("\n[REGRESSION] " + "; ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
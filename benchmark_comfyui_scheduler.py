@@ -0,0 +1,115 @@
+"""
+Benchmark sequential vs. queued ComfyUI submission against the local stub
+用本機替身伺服器比較「逐張生成」與「佇列排程」的總耗時
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from comfyui_scheduler import GenerationScheduler
+from comfyui_stub import ComfyUIStub, SimpleComfyUIClient, StubWorkflowBuilder
+
+
+def fake_cards(count):
+    return [
+        {"name": f"Card{i}", "color": "Stub", "prompt": f"origami test card {i}"}
+        for i in range(1, count + 1)
+    ]
+
+
+async def run_sequential(client, builder, cards, assets, output, poll_interval, gap):
+    """舊流程：等 ComfyUI 閒置、送出一張、輪詢到完成、再固定等待"""
+    results = []
+    for index, card in enumerate(cards, 1):
+        while True:
+            queue = await client.get_queue()
+            if not queue["queue_running"] and not queue["queue_pending"]:
+                break
+            await asyncio.sleep(poll_interval)
+
+        scheduler = GenerationScheduler(client, builder, assets, output, depth=1,
+                                        poll_interval=poll_interval)
+        results += await scheduler.run([card])
+        if index < len(cards):
+            await asyncio.sleep(gap)
+    return results
+
+
+async def benchmark(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "comfyui_output"
+        assets = Path(tmp) / "assets"
+        assets.mkdir()
+
+        stub = ComfyUIStub(output, job_seconds=args.job_seconds)
+        url = await stub.start(port=args.port)
+        client = SimpleComfyUIClient(url)
+        builder = StubWorkflowBuilder()
+        cards = fake_cards(args.cards)
+
+        print("=" * 80)
+        print(" " * 20 + "COMFYUI SCHEDULER BENCHMARK (stub)")
+        print("=" * 80)
+        print(f"[STUB] {url}   job time {args.job_seconds}s   poll {args.poll_interval}s")
+        print(f"[CARDS] {args.cards}")
+        print()
+
+        timings = {}
+
+        async def timed(name, coro):
+            stub.request_counts.clear()
+            start = time.perf_counter()
+            done = await coro
+            history_requests = stub.request_counts.get("/history/{prompt_id}", 0)
+            timings[name] = (time.perf_counter() - start, len(done), history_requests)
+            print()
+
+        try:
+            if not args.skip_sequential:
+                print(f"[RUN] sequential (idle wait + {args.gap}s gap)")
+                await timed("sequential", run_sequential(client, builder, cards, assets, output,
+                                                         args.poll_interval, args.gap))
+
+            print(f"[RUN] scheduler, polling /history (depth {args.depth})")
+            scheduler = GenerationScheduler(client, builder, assets, output, depth=args.depth,
+                                            poll_interval=args.poll_interval)
+            await timed("polling", scheduler.run(cards))
+
+            print(f"[RUN] scheduler, websocket events (depth {args.depth})")
+            scheduler = GenerationScheduler(client, builder, assets, output, depth=args.depth,
+                                            server_url=url, poll_interval=args.poll_interval)
+            await timed("websocket", scheduler.run(cards))
+        finally:
+            await client.close()
+            await stub.stop()
+
+    ideal = args.cards * args.job_seconds
+    print()
+    print("=" * 80)
+    print(f"[IDEAL] {ideal:.1f}s (GPU busy 100% of the time)")
+    for name, (elapsed, count, history_requests) in timings.items():
+        print(f"[{name.upper()}] {elapsed:.1f}s for {count}/{args.cards} cards "
+              f"(GPU utilisation {ideal / elapsed:.0%}, {history_requests} /history requests)")
+    if "sequential" in timings:
+        print(f"[SPEEDUP] {timings['sequential'][0] / timings['websocket'][0]:.1f}x vs sequential")
+    print("=" * 80)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=6)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--job-seconds", type=float, default=2.0)
+    parser.add_argument("--poll-interval", type=float, default=3.0)
+    parser.add_argument("--gap", type=float, default=5.0,
+                        help="fixed sleep between cards in the sequential run")
+    parser.add_argument("--port", type=int, default=8189)
+    parser.add_argument("--skip-sequential", action="store_true")
+    asyncio.run(benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
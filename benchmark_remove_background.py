@@ -0,0 +1,115 @@
+"""
+Benchmark the NumPy keying engine against the original per-pixel loop
+比較 NumPy 去背引擎與原本逐像素迴圈的速度
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from remove_background import key_white_background
+
+
+DEFAULT_CARDS_DIR = Path(__file__).resolve().parent / "assets" / "cards"
+
+
+def key_white_background_loop(img, threshold=240):
+    """原本 remove_white_background 的逐像素實作（只在記憶體中執行）"""
+    img = img.copy()
+    new_data = []
+    for item in img.getdata():
+        if item[0] > threshold and item[1] > threshold and item[2] > threshold:
+            new_data.append((255, 255, 255, 0))
+        else:
+            new_data.append(item)
+    img.putdata(new_data)
+    return img
+
+
+def time_call(func, repeat):
+    """回傳 func 執行 repeat 次中最快的一次（秒）與最後一次的結果"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(cards_dir, threshold=240, repeat=3, skip_loop=False):
+    """對 cards_dir 內所有 PNG 執行兩種實作並印出比較結果"""
+    files = sorted(Path(cards_dir).glob("*.png"))
+    if not files:
+        print(f"[ERROR] No PNG files found in {cards_dir}")
+        return None
+
+    print("=" * 80)
+    print(" " * 22 + "BACKGROUND KEYING BENCHMARK")
+    print("=" * 80)
+    print(f"[CARDS] {len(files)} images from {cards_dir}")
+    print(f"[THRESHOLD] {threshold}   [REPEAT] best of {repeat}")
+    print()
+    print(f"{'file':40s} {'loop (s)':>10s} {'numpy (s)':>10s} {'speedup':>9s}")
+
+    total_loop = 0.0
+    total_numpy = 0.0
+    mismatches = []
+
+    for path in files:
+        img = Image.open(path).convert("RGBA")
+        pixels = np.array(img)
+
+        numpy_time, keyed = time_call(
+            lambda: key_white_background(pixels.copy(), threshold=threshold), repeat
+        )
+        total_numpy += numpy_time
+
+        if skip_loop:
+            print(f"{path.name:40s} {'-':>10s} {numpy_time:10.4f} {'-':>9s}")
+            continue
+
+        loop_time, looped = time_call(
+            lambda: key_white_background_loop(img, threshold=threshold), 1
+        )
+        total_loop += loop_time
+
+        # softness=0 時兩者的輸出必須逐位元相同
+        if not np.array_equal(np.asarray(looped), keyed):
+            mismatches.append(path.name)
+
+        print(f"{path.name:40s} {loop_time:10.4f} {numpy_time:10.4f} {loop_time / numpy_time:8.1f}x")
+
+    print()
+    print("=" * 80)
+    print(f"[NUMPY] Total: {total_numpy:.3f}s ({len(files) / total_numpy:.1f} images/s)")
+    if not skip_loop:
+        print(f"[LOOP]  Total: {total_loop:.3f}s ({len(files) / total_loop:.1f} images/s)")
+        print(f"[SPEEDUP] {total_loop / total_numpy:.1f}x")
+        if mismatches:
+            print(f"[WARNING] Output differs from the loop for: {', '.join(mismatches)}")
+        else:
+            print("[OK] NumPy output is identical to the per-pixel loop")
+    print("=" * 80)
+
+    return {"loop": total_loop, "numpy": total_numpy, "mismatches": mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR)
+    parser.add_argument("--threshold", type=int, default=240)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="NumPy runs per image (best time is reported)")
+    parser.add_argument("--skip-loop", action="store_true",
+                        help="only time the NumPy engine")
+    args = parser.parse_args()
+
+    run_benchmark(args.cards_dir, threshold=args.threshold,
+                  repeat=args.repeat, skip_loop=args.skip_loop)
+
+
+if __name__ == "__main__":
+    main()
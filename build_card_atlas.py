@@ -0,0 +1,232 @@
+"""
+Pack the final card images into texture atlases
+把最終卡片圖打包成 sprite atlas，並輸出前端可讀的 JSON frame manifest
+
+The manifest uses the TexturePacker / Phaser 3 "multiatlas" layout:
+
+    {"textures": [{"image": "cards-0.png", "size": {"w": .., "h": ..},
+                   "frames": [{"filename": "fish_origami.png",
+                               "frame": {"x": .., "y": .., "w": .., "h": ..},
+                               "rotated": false, "trimmed": false,
+                               "spriteSourceSize": {...}, "sourceSize": {...}}]}],
+     "meta": {...}}
+
+    python build_card_atlas.py --cards-dir assets/cards --output-dir public/assets/atlas
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from batch_remove_background import collect_inputs
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+DEFAULT_OUTPUT_DIR = ROOT / "public" / "assets" / "atlas"
+
+
+class MaxRectsBin:
+    """
+    MaxRects bin packer (best-short-side-fit, no rotation)
+
+    Args:
+        width, height: atlas 頁面大小
+        padding: 每個 frame 之間保留的像素，避免縮放取樣時滲色
+    """
+
+    def __init__(self, width, height, padding=2):
+        self.width = width
+        self.height = height
+        self.padding = padding
+        self.free = [(0, 0, width, height)]
+        self.used = []
+
+    def insert(self, w, h):
+        """放入 w x h 的矩形，回傳 (x, y)；放不下回傳 None"""
+        pw, ph = w + self.padding, h + self.padding
+        best = None
+        for fx, fy, fw, fh in self.free:
+            if pw <= fw and ph <= fh:
+                short_side = min(fw - pw, fh - ph)
+                long_side = max(fw - pw, fh - ph)
+                if best is None or (short_side, long_side) < best[0]:
+                    best = ((short_side, long_side), fx, fy)
+        if best is None:
+            return None
+
+        _, x, y = best
+        placed = (x, y, pw, ph)
+        self._split(placed)
+        self.used.append(placed)
+        return x, y
+
+    def _split(self, placed):
+        px, py, pw, ph = placed
+        new_free = []
+        for rect in self.free:
+            fx, fy, fw, fh = rect
+            # 沒有重疊的空間保持不變
+            if px >= fx + fw or px + pw <= fx or py >= fy + fh or py + ph <= fy:
+                new_free.append(rect)
+                continue
+            # 切出重疊區域四周剩下的最大矩形
+            if px > fx:
+                new_free.append((fx, fy, px - fx, fh))
+            if px + pw < fx + fw:
+                new_free.append((px + pw, fy, fx + fw - px - pw, fh))
+            if py > fy:
+                new_free.append((fx, fy, fw, py - fy))
+            if py + ph < fy + fh:
+                new_free.append((fx, py + ph, fw, fy + fh - py - ph))
+        # 移除被其他空間完全包含的矩形
+        self.free = [
+            a for i, a in enumerate(new_free)
+            if not any(i != j and _contains(b, a) for j, b in enumerate(new_free))
+        ]
+
+    def used_size(self):
+        """實際用到的寬高（不含最右、最下的 padding）"""
+        width = max((x + w - self.padding for x, _, w, _ in self.used), default=0)
+        height = max((y + h - self.padding for _, y, _, h in self.used), default=0)
+        return width, height
+
+
+def _contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ix >= ox and iy >= oy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def pack(sizes, max_size=4096, padding=2):
+    """
+    Assign every (name, w, h) to a page position
+
+    Returns:
+        (bins, placements) where placements maps name -> (page, x, y)
+    """
+    # 大的先放，MaxRects 的填充率最好
+    order = sorted(sizes, key=lambda item: (max(item[1], item[2]), item[1] * item[2]), reverse=True)
+    bins = []
+    placements = {}
+    for name, w, h in order:
+        if w + padding > max_size or h + padding > max_size:
+            raise ValueError(f"{name} ({w}x{h}) does not fit in a {max_size}px atlas")
+        for page, bin_ in enumerate(bins):
+            position = bin_.insert(w, h)
+            if position:
+                break
+        else:
+            bins.append(MaxRectsBin(max_size, max_size, padding))
+            page = len(bins) - 1
+            position = bins[page].insert(w, h)
+        placements[name] = (page, *position)
+    return bins, placements
+
+
+def build_atlas(files, output_dir, name="cards", max_size=4096, padding=2, scale=1.0):
+    """
+    Pack ``files`` into atlas pages and write the PNGs plus ``<name>.json``
+
+    Returns:
+        The manifest dict
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    images = {}
+    for path in files:
+        img = Image.open(path).convert("RGBA")
+        if scale != 1.0:
+            img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+        images[path.name] = (img, path)
+
+    bins, placements = pack(
+        [(n, img.width, img.height) for n, (img, _) in images.items()], max_size, padding
+    )
+
+    textures = []
+    for page, bin_ in enumerate(bins):
+        width, height = bin_.used_size()
+        sheet = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        frames = []
+        for frame_name, (p, x, y) in sorted(placements.items()):
+            if p != page:
+                continue
+            img, source = images[frame_name]
+            sheet.paste(img, (x, y))
+            frames.append({
+                "filename": frame_name,
+                "frame": {"x": x, "y": y, "w": img.width, "h": img.height},
+                "rotated": False,
+                "trimmed": False,
+                "spriteSourceSize": {"x": 0, "y": 0, "w": img.width, "h": img.height},
+                "sourceSize": {"w": img.width, "h": img.height},
+            })
+        image_name = f"{name}-{page}.png"
+        sheet.save(output_dir / image_name, "PNG", optimize=True)
+        textures.append({
+            "image": image_name,
+            "format": "RGBA8888",
+            "size": {"w": width, "h": height},
+            "scale": scale,
+            "frames": frames,
+        })
+
+    manifest = {
+        "textures": textures,
+        "meta": {"app": "build_card_atlas.py", "version": "1.0", "generated": int(time.time())},
+    }
+    with open(output_dir / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack card images into texture atlases")
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR)
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--name", default="cards", help="atlas file name prefix")
+    parser.add_argument("--max-size", type=int, default=4096, help="maximum page width/height")
+    parser.add_argument("--padding", type=int, default=2)
+    parser.add_argument("--scale", type=float, default=1.0, help="resize cards before packing")
+    args = parser.parse_args()
+
+    # collect_inputs 會略過 _backup 與 _before_rembg
+    files = collect_inputs(str(args.cards_dir))
+    if not files:
+        print(f"[ERROR] No card images found in {args.cards_dir}")
+        return
+
+    print("=" * 80)
+    print(" " * 28 + "CARD ATLAS BUILDER")
+    print("=" * 80)
+    print(f"[CARDS] {len(files)} images from {args.cards_dir}")
+
+    manifest = build_atlas(files, args.output_dir, args.name, args.max_size, args.padding, args.scale)
+
+    source_bytes = sum(f.stat().st_size for f in files)
+    atlas_bytes = sum((args.output_dir / t["image"]).stat().st_size for t in manifest["textures"])
+    manifest_bytes = (args.output_dir / f"{args.name}.json").stat().st_size
+
+    print()
+    for texture in manifest["textures"]:
+        size = texture["size"]
+        used = sum(f["frame"]["w"] * f["frame"]["h"] for f in texture["frames"])
+        print(f"[PAGE] {texture['image']}: {size['w']}x{size['h']}, "
+              f"{len(texture['frames'])} frames, {used / (size['w'] * size['h']):.0%} filled")
+    print()
+    print("=" * 80)
+    print("ATLAS COMPLETE!")
+    print("=" * 80)
+    print(f"[PAGES] {len(manifest['textures'])}")
+    print(f"[BYTES] Source PNGs: {source_bytes / 1024:.0f} KB in {len(files)} requests")
+    print(f"[BYTES] Atlas: {(atlas_bytes + manifest_bytes) / 1024:.0f} KB in "
+          f"{len(manifest['textures']) + 1} requests (including {args.name}.json)")
+    print(f"[LOCATION] {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
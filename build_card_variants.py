@@ -0,0 +1,193 @@
+"""
+Build responsive card image variants (WebP / AVIF / PNG at 1x and 2x)
+產生縮小後的 1x/2x 卡片圖（WebP、AVIF，以及無損 PNG 備援），並輸出大小與畫質報告
+
+    python build_card_variants.py --width 160 --output-dir public/assets/cards/responsive
+
+Output names follow ``<card>@<density>x.<ext>``, e.g. ``fish_origami@2x.webp``.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, features
+
+from batch_remove_background import collect_inputs
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+DEFAULT_OUTPUT_DIR = ROOT / "public" / "assets" / "cards" / "responsive"
+
+DENSITIES = (1, 2)
+
+# 格式 -> (副檔名, Pillow 儲存參數)
+FORMATS = {
+    "webp": ("webp", {"quality": 85, "method": 4}),
+    "avif": ("avif", {"quality": 70, "speed": 6}),
+    "png": ("png", {"optimize": True}),
+}
+
+
+def avif_supported():
+    """Pillow 11.2 起內建 AVIF；舊版可安裝 pillow-avif-plugin"""
+    if features.check("avif"):
+        return True
+    try:
+        import pillow_avif  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def psnr(reference, candidate):
+    """以 alpha 預乘後的 RGBA 計算 PSNR（dB），完全相同時回傳 inf"""
+    ref = np.asarray(reference, dtype=np.float32)
+    cand = np.asarray(candidate.convert("RGBA"), dtype=np.float32)
+    # 完全透明的像素顏色不重要，預乘後才不會被計入誤差
+    ref = np.concatenate([ref[..., :3] * ref[..., 3:] / 255, ref[..., 3:]], axis=2)
+    cand = np.concatenate([cand[..., :3] * cand[..., 3:] / 255, cand[..., 3:]], axis=2)
+    mse = float(np.mean((ref - cand) ** 2))
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def build_variants(source_path, output_dir, width, density, formats):
+    """
+    Resize one card to ``width * density`` and encode it in every format
+
+    Runs inside a worker process.
+
+    Returns:
+        list of dicts (card, density, format, path, bytes, psnr, error)
+    """
+    if "avif" in formats:
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            pass
+
+    start = time.perf_counter()
+    source_path = Path(source_path)
+    output_dir = Path(output_dir)
+    results = []
+    try:
+        with Image.open(source_path) as img:
+            img = img.convert("RGBA")
+            target_w = width * density
+            target_h = round(img.height * target_w / img.width)
+            resized = img.resize((target_w, target_h), Image.LANCZOS)
+    except Exception as e:
+        return [{"card": source_path.name, "density": density, "format": None,
+                 "error": f"{type(e).__name__}: {e}"}]
+
+    for fmt in formats:
+        ext, options = FORMATS[fmt]
+        out_path = output_dir / f"{source_path.stem}@{density}x.{ext}"
+        result = {"card": source_path.name, "density": density, "format": fmt,
+                  "path": str(out_path), "width": target_w, "height": target_h, "error": None}
+        try:
+            resized.save(out_path, fmt.upper(), **options)
+            result["bytes"] = out_path.stat().st_size
+            with Image.open(out_path) as encoded:
+                result["psnr"] = psnr(resized, encoded)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        results.append(result)
+
+    for result in results:
+        result["time"] = time.perf_counter() - start
+    return results
+
+
+def run(files, output_dir, width=160, formats=("webp", "avif", "png"), workers=None):
+    """把每張卡片 x 每個密度分給行程池處理，回傳所有結果"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(build_variants, str(path), str(output_dir), width, density, formats)
+            for path in files for density in DENSITIES
+        ]
+        for future in as_completed(futures):
+            results.extend(future.result())
+    return results
+
+
+def print_report(files, results, formats):
+    """印出每種格式的總大小、壓縮比與最差畫質"""
+    source_bytes = sum(f.stat().st_size for f in files)
+    failed = [r for r in results if r["error"]]
+
+    print()
+    print(f"{'variant':14s} {'files':>6s} {'total KB':>10s} {'vs source':>10s} {'min PSNR':>10s}")
+    for fmt in formats:
+        for density in DENSITIES:
+            rows = [r for r in results
+                    if r["format"] == fmt and r["density"] == density and not r["error"]]
+            if not rows:
+                continue
+            total = sum(r["bytes"] for r in rows)
+            worst = min(r["psnr"] for r in rows)
+            worst_text = "lossless" if worst == float("inf") else f"{worst:.1f} dB"
+            print(f"{fmt + ' @' + str(density) + 'x':14s} {len(rows):6d} {total / 1024:10.0f} "
+                  f"{total / source_bytes:10.1%} {worst_text:>10s}")
+
+    print()
+    print(f"[SOURCE] {len(files)} PNGs, {source_bytes / 1024:.0f} KB")
+    if failed:
+        print(f"[FAILED] {len(failed)} variant(s):")
+        for r in failed:
+            print(f"  - {r['card']} @{r['density']}x {r['format']}: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build responsive WebP/AVIF/PNG card variants")
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR)
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--width", type=int, default=160, help="1x display width in CSS pixels")
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=["webp", "avif", "png"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--report", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    formats = list(args.formats)
+    if "avif" in formats and not avif_supported():
+        print("[WARNING] AVIF not supported by this Pillow build, skipping. Please run:")
+        print("  pip install -U Pillow   (or: pip install pillow-avif-plugin)")
+        formats.remove("avif")
+
+    files = collect_inputs(str(args.cards_dir))
+    if not files:
+        print(f"[ERROR] No card images found in {args.cards_dir}")
+        return
+
+    print("=" * 80)
+    print(" " * 24 + "RESPONSIVE CARD VARIANTS")
+    print("=" * 80)
+    print(f"[CARDS] {len(files)}   [WIDTH] {args.width}px @1x / {args.width * 2}px @2x")
+    print(f"[FORMATS] {', '.join(formats)}   [WORKERS] {args.workers}")
+
+    start = time.perf_counter()
+    results = run(files, args.output_dir, args.width, formats, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print_report(files, results, formats)
+    print(f"[TIME] {elapsed:.2f}s")
+    print(f"[LOCATION] {args.output_dir}")
+
+    if args.report:
+        # 無損格式的 PSNR 是 inf，JSON 裡記成 null
+        rows = [{**r, "psnr": None if r.get("psnr") == float("inf") else r.get("psnr")} for r in results]
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
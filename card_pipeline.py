@@ -0,0 +1,479 @@
+"""
+End-to-end card asset pipeline: generate -> transfer -> key -> crop -> optimize -> atlas
+從 prompt 到遊戲素材的一條龍流程；每個階段有自己的 worker pool 與輸入雜湊快取
+
+    python card_pipeline.py                          # 從 assets/cards 的原圖開始
+    python card_pipeline.py --generate               # 先用 ComfyUI 生成 CARDS + MISSING_CARDS
+    python card_pipeline.py --backend opencv --quantize --force crop
+
+Every stage writes into its own directory under ``--work-dir`` and records,
+per card, a hash of its input files and parameters together with the
+outputs it produced. A stage only rebuilds a card when that key changes, so
+a new prompt or edited original reruns that card's downstream stages and the
+atlas; an upstream rebuild that produces identical bytes stops there.
+
+Cards move through the stages independently: one card can be cropping while
+the next is still being keyed. The finished cards are published to
+``--publish-dir`` (with ``crop_manifest.json``) and the atlas to
+``--atlas-dir``; both default to ``build/`` so a run never overwrites the
+game's ``public/assets`` unless asked to:
+
+    python card_pipeline.py --publish-dir public/assets/cards --atlas-dir public/assets/atlas
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from asset_cache import ORIGINAL_SUFFIXES, AssetManifest, StageCache, hash_file
+from auto_threshold import parse_threshold
+from autocrop_cards import MANIFEST_NAME as CROP_MANIFEST_NAME, crop_to_alpha
+from backup_store import transfer
+from batch_remove_background import (BACKENDS, VARIANT_SUFFIXES, _init_pool, backend_params,
+                                     collect_inputs, process_one)
+from build_card_atlas import build_atlas
+from optimize_pngs import optimize_file
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+# 預設不直接覆寫 public/assets；要更新遊戲素材時明確指定 --publish-dir / --atlas-dir
+DEFAULT_PUBLISH_DIR = ROOT / "build" / "cards"
+DEFAULT_ATLAS_DIR = ROOT / "build" / "atlas"
+DEFAULT_WORK_DIR = ROOT / "build" / "card_pipeline"
+
+STAGES = ("generate", "transfer", "key", "crop", "optimize", "atlas")
+
+
+def _timed(func, *args):
+    """在 worker 裡執行一個工作，回傳 (結果, 秒數, 錯誤)；例外不會讓整個 pool 中斷"""
+    start = time.perf_counter()
+    try:
+        return func(*args), time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def key_file(source, target, backend, threshold, softness):
+    result = process_one(backend, source, target, threshold, softness)
+    if result["error"]:
+        raise RuntimeError(result["error"])
+
+
+def crop_file(source, target, padding, threshold):
+    """裁切一張卡片，回傳要寫進 crop_manifest.json 的位移資料"""
+    with Image.open(source) as img:
+        img = img.convert("RGBA")
+    cropped, offset = crop_to_alpha(img, padding, threshold)
+    target = Path(target)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    cropped.save(tmp_path, "PNG")
+    os.replace(tmp_path, target)
+    return {"source_size": list(img.size), "offset": list(offset),
+            "size": list(cropped.size), "padding": padding}
+
+
+def optimize(source, target, quantize, max_diff):
+    result = optimize_file(source, target, quantize, max_diff)
+    if result["error"]:
+        raise RuntimeError(result["error"])
+
+
+def original_of(card_path, manifest):
+    """
+    去背前的原圖，與原地去背的腳本用同一套規則（AssetManifest.card_source）：
+    優先記錄的來源與 _before_rembg，_backup 可能是較舊的圖；卡片還沒去背時用卡片本身
+    """
+    card_path = Path(card_path)
+    backup_path = card_path.with_name(card_path.stem + ORIGINAL_SUFFIXES[0])
+    source = manifest.card_source(card_path, backup_path)
+    if not source.exists():
+        print(f"[WARNING] No original found for {card_path.name}; keying the card itself")
+        return card_path
+    return source
+
+
+class StageFailed(Exception):
+    pass
+
+
+class Stage:
+    """
+    One pipeline stage: output directory, worker pool, cache and timing
+
+    Args:
+        name: 階段名稱
+        work_dir: 所有階段目錄的上層；快取寫在 <work_dir>/<name>/.stage_cache.json
+        executor: 這個階段專用的 executor（generate 為 None）
+        workers: executor 的大小，只用於報告
+        force: True 時忽略快取
+    """
+
+    def __init__(self, name, work_dir, executor=None, workers=1, force=False):
+        self.name = name
+        self.directory = Path(work_dir) / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cache = StageCache(self.directory)
+        self.executor = executor
+        self.workers = workers
+        self.force = force
+        self.built = 0
+        self.cached = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.first = None
+        self.last = None
+
+    def is_fresh(self, name, key):
+        if not self.force and self.cache.is_fresh(name, key):
+            self.cached += 1
+            return True
+        return False
+
+    def started(self):
+        now = time.perf_counter()
+        self.first = now if self.first is None else min(self.first, now)
+
+    def finished(self, elapsed, error=None):
+        self.last = time.perf_counter()
+        self.busy += elapsed
+        if error:
+            self.failed += 1
+        else:
+            self.built += 1
+
+    async def run(self, label, func, *args):
+        """把一個工作丟進本階段的 pool；失敗時拋出 StageFailed"""
+        self.started()
+        loop = asyncio.get_running_loop()
+        result, elapsed, error = await loop.run_in_executor(self.executor, _timed, func, *args)
+        self.finished(elapsed, error)
+        if error:
+            raise StageFailed(f"{self.name} {label}: {error}")
+        print(f"  [{self.name.upper():8s}] {label:32s} {elapsed:7.3f}s")
+        return result
+
+    @property
+    def wall(self):
+        return self.last - self.first if self.first is not None and self.last is not None else 0.0
+
+    def close(self):
+        self.cache.save()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+class CardPipeline:
+    """
+    Run every card through the stages, rebuilding only what changed
+
+    Args:
+        args: main() 解析後的參數
+    """
+
+    def __init__(self, args):
+        self.args = args
+        cpus = os.cpu_count() or 1
+        workers = args.workers or cpus
+        key_workers = args.key_workers or workers
+        rembg_threads = max(1, cpus // key_workers)
+        forced = STAGES[STAGES.index(args.force):] if args.force else ()
+
+        def stage(name, executor=None, size=1):
+            return Stage(name, args.work_dir, executor, size, force=name in forced)
+
+        self.stages = {
+            "generate": stage("generate", size=args.depth),
+            # 檔案搬移是 I/O，用執行緒；影像處理吃 CPU，各自用行程池
+            "transfer": stage("transfer", ThreadPoolExecutor(workers), workers),
+            "key": stage("key", ProcessPoolExecutor(key_workers, initializer=_init_pool,
+                                                    initargs=(rembg_threads,)), key_workers),
+            "crop": stage("crop", ProcessPoolExecutor(workers), workers),
+            "optimize": stage("optimize", ProcessPoolExecutor(workers), workers),
+            "atlas": stage("atlas", ThreadPoolExecutor(1), 1),
+        }
+        self.scheduler = None
+        self.published = 0
+
+    async def step(self, stage_name, card, source, func, params, *args):
+        """
+        Build ``card`` with one single-input stage unless its cache is fresh
+
+        Returns:
+            The stage's output path for the card
+        """
+        stage = self.stages[stage_name]
+        target = stage.directory / card
+        key = stage.cache.key([source], params)
+        if stage.is_fresh(card, key):
+            return target
+        info = await stage.run(card, func, str(source), str(target), *args)
+        stage.cache.record(card, key, [target], info)
+        return target
+
+    async def generate(self, card_info):
+        """用 ComfyUI 生成一張卡片（佇列與生成快取會略過沒變的 prompt）"""
+        stage = self.stages["generate"]
+        card = f"{card_info['name'].lower()}_origami.png"
+        if self.scheduler.queue.is_done(card_info["name"]):
+            stage.cached += 1
+            return card, stage.directory / card
+
+        stage.started()
+        start = time.perf_counter()
+        result = await self.scheduler.generate(card_info)
+        if result is not None and result.get("cached"):
+            stage.cached += 1
+        else:
+            stage.finished(time.perf_counter() - start, error=result is None)
+        if result is None:
+            raise StageFailed(f"generate {card_info['name']}: no image")
+        return card, Path(result["target"])
+
+    async def build_card(self, card, source):
+        """一張卡片依序走過 transfer -> key -> crop -> optimize -> 發佈"""
+        args = self.args
+        # 生成結果與 _backup / _before_rembg 都不會被原地覆寫，可以直接硬連結
+        hardlink = source.parent == self.stages["generate"].directory or source.name.endswith(VARIANT_SUFFIXES)
+        path = await self.step("transfer", card, source, transfer, {"hardlink": hardlink}, hardlink)
+        path = await self.step("key", card, path, key_file,
+                               backend_params(args.backend, args.threshold, args.softness),
+                               args.backend, args.threshold, args.softness)
+        path = await self.step("crop", card, path, crop_file,
+                               {"padding": args.padding, "alpha_threshold": args.alpha_threshold},
+                               args.padding, args.alpha_threshold)
+        path = await self.step("optimize", card, path, optimize,
+                               {"quantize": args.quantize, "max_diff": args.max_diff},
+                               args.quantize, args.max_diff)
+        if args.publish_dir is not None:
+            await self.publish(path, args.publish_dir / card)
+        return path
+
+    async def publish(self, path, target):
+        """內容不同時才複製到遊戲素材目錄（不用硬連結：那裡的卡片可能被原地改寫）"""
+        if target.exists() and hash_file(target) == self.stages["optimize"].cache.file_hash(path):
+            return
+        await asyncio.to_thread(transfer, path, target)
+        self.published += 1
+
+    async def build_atlas(self, files):
+        stage = self.stages["atlas"]
+        args = self.args
+        params = {"name": args.atlas_name, "max_size": args.atlas_max_size,
+                  "padding": args.atlas_padding, "scale": args.atlas_scale,
+                  "frames": [f.name for f in files]}
+        key = stage.cache.key(files, params)
+        if stage.is_fresh("atlas", key):
+            return
+        manifest = await stage.run(f"{args.atlas_name}.json ({len(files)} cards)", build_atlas, files,
+                                   args.atlas_dir, args.atlas_name, args.atlas_max_size,
+                                   args.atlas_padding, args.atlas_scale)
+        outputs = [args.atlas_dir / f"{args.atlas_name}.json"]
+        outputs += [args.atlas_dir / t["image"] for t in manifest["textures"]]
+        stage.cache.record("atlas", key, outputs)
+
+    def write_crop_manifest(self, cards):
+        """所有卡片（含這次沒重做的）的裁切位移，寫到裁切目錄與發佈目錄"""
+        crop_cache = self.stages["crop"].cache
+        manifest = {card: crop_cache.info(card) for card in sorted(cards) if crop_cache.info(card)}
+        for directory in (self.stages["crop"].directory, self.args.publish_dir):
+            if directory is not None:
+                with open(Path(directory) / CROP_MANIFEST_NAME, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+
+    async def run(self, sources, card_infos=()):
+        """
+        Build every card and the atlas
+
+        Args:
+            sources: {卡片檔名: 原圖路徑}，不需生成的卡片
+            card_infos: 要先用 ComfyUI 生成的卡片定義
+
+        Returns:
+            (built cards, errors)
+        """
+        async def from_source(card, source):
+            return card, await self.build_card(card, source)
+
+        async def from_prompt(card_info):
+            card, source = await self.generate(card_info)
+            return card, await self.build_card(card, source)
+
+        tasks = [from_source(card, source) for card, source in sorted(sources.items())]
+        tasks += [from_prompt(card_info) for card_info in card_infos]
+
+        if card_infos:
+            await self.scheduler.start()
+        try:
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if card_infos:
+                await self.scheduler.close()
+
+        built = {}
+        errors = []
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                errors.append(str(outcome) if isinstance(outcome, StageFailed)
+                              else f"{type(outcome).__name__}: {outcome}")
+            else:
+                built[outcome[0]] = outcome[1]
+
+        self.write_crop_manifest(built)
+        if built:
+            try:
+                await self.build_atlas([built[card] for card in sorted(built)])
+            except StageFailed as e:
+                errors.append(str(e))
+        return built, errors
+
+    def close(self):
+        for stage in self.stages.values():
+            stage.close()
+
+
+def print_report(pipeline, built, errors, elapsed):
+    """每個階段的重做 / 快取 / 失敗數、忙碌時間與 pool 使用率"""
+    print()
+    print("=" * 80)
+    print("CARD PIPELINE COMPLETE!")
+    print("=" * 80)
+    print(f"{'STAGE':10s} {'WORKERS':>7s} {'BUILT':>6s} {'CACHED':>6s} {'FAILED':>6s} "
+          f"{'BUSY':>9s} {'WALL':>9s} {'UTIL':>6s}")
+    for stage in pipeline.stages.values():
+        util = stage.busy / (stage.wall * stage.workers) if stage.wall else 0.0
+        print(f"{stage.name:10s} {stage.workers:7d} {stage.built:6d} {stage.cached:6d} {stage.failed:6d} "
+              f"{stage.busy:8.2f}s {stage.wall:8.2f}s {util:6.0%}")
+    print()
+    print(f"[CARDS] {len(built)} ready, {len(errors)} failed in {elapsed:.2f}s")
+    if pipeline.args.publish_dir is not None:
+        print(f"[PUBLISH] {pipeline.published} changed card(s) -> {pipeline.args.publish_dir}")
+    print(f"[ATLAS] {pipeline.args.atlas_dir / (pipeline.args.atlas_name + '.json')}")
+    if errors:
+        print()
+        print(f"[FAILED] {len(errors)} card(s):")
+        for error in errors:
+            print(f"  - {error}")
+
+
+async def _make_scheduler(args, generate_dir):
+    """載入 ComfyUI 整合與兩份卡片清單；ComfyUI 沒有啟動時回傳 (None, [])"""
+    from asset_cache import GenerationCache
+    from comfyui_scheduler import GenerationScheduler
+    from generate_card_images import CARDS, ComfyUIClient, WorkflowBuilder
+    from generate_missing_cards import MISSING_CARDS
+    from generation_queue import JobQueue
+
+    client = ComfyUIClient(args.comfyui_url)
+    if await client.check_status() == "offline":
+        print(f"[ERROR] ComfyUI is offline: {args.comfyui_url}")
+        return None, []
+
+    cards = CARDS + MISSING_CARDS
+    queue = JobQueue(generate_dir)
+    queue.add(cards, restart=args.force == "generate")
+    scheduler = GenerationScheduler(
+        client, WorkflowBuilder(args.workflows_dir), generate_dir, args.comfyui_output,
+        depth=args.depth, server_url=args.comfyui_url, candidates=args.candidates,
+        queue=queue, cache=GenerationCache.beside(generate_dir),
+    )
+    return scheduler, cards
+
+
+async def run_pipeline(args):
+    pipeline = CardPipeline(args)
+    try:
+        card_infos = []
+        if args.generate:
+            pipeline.scheduler, card_infos = await _make_scheduler(
+                args, pipeline.stages["generate"].directory)
+            if pipeline.scheduler is None:
+                return 1
+
+        # 沒有 prompt 的卡片（或不生成時的全部卡片）從既有原圖開始
+        generated = {f"{c['name'].lower()}_origami.png" for c in card_infos}
+        keying_manifest = AssetManifest(args.cards_dir)
+        sources = {path.name: original_of(path, keying_manifest) for path in collect_inputs(str(args.cards_dir))
+                   if path.name not in generated}
+        if not sources and not card_infos:
+            print(f"[ERROR] No card images found in {args.cards_dir}")
+            return 1
+
+        if args.publish_dir is not None:
+            args.publish_dir.mkdir(parents=True, exist_ok=True)
+        print(f"[CARDS] {len(sources)} from {args.cards_dir}, {len(card_infos)} from prompts")
+        print(f"[WORK] {args.work_dir}")
+        if args.force:
+            print(f"[FORCE] rebuilding {', '.join(STAGES[STAGES.index(args.force):])}")
+        print()
+
+        start = time.perf_counter()
+        built, errors = await pipeline.run(sources, card_infos)
+        print_report(pipeline, built, errors, time.perf_counter() - start)
+        return 1 if errors else 0
+    finally:
+        pipeline.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the card assets end to end, rebuilding only what changed")
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR,
+                        help="cards whose originals (*_before_rembg.png, *_backup.png) feed the pipeline")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR,
+                        help="per-stage outputs and caches")
+    parser.add_argument("--publish-dir", type=Path, default=DEFAULT_PUBLISH_DIR,
+                        help="where the finished cards are copied; pass public/assets/cards to update the game")
+    parser.add_argument("--no-publish", dest="publish_dir", action="store_const", const=None,
+                        help="leave the finished cards in the work directory")
+    parser.add_argument("--force", choices=STAGES,
+                        help="ignore the caches of this stage and every stage after it")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="pool size of the transfer, crop and optimize stages")
+    parser.add_argument("--key-workers", type=int,
+                        help="pool size of the key stage (default: --workers)")
+
+    generate = parser.add_argument_group("generate")
+    generate.add_argument("--generate", action="store_true",
+                          help="generate CARDS and MISSING_CARDS with ComfyUI first")
+    generate.add_argument("--comfyui-url", default="http://127.0.0.1:8188")
+    generate.add_argument("--comfyui-output", type=Path, default=Path("D:/ComfyUI/output"))
+    generate.add_argument("--workflows-dir", type=Path, default=Path("D:/spec-kit/backend/workflows"))
+    generate.add_argument("--depth", type=int, default=3, help="workflows queued in ComfyUI at once")
+    generate.add_argument("--candidates", type=int, default=1, help="seeds per card; the best one is kept")
+
+    key = parser.add_argument_group("key")
+    key.add_argument("--backend", choices=BACKENDS, default="pil")
+    key.add_argument("--threshold", type=parse_threshold, default=240)
+    key.add_argument("--softness", type=int, default=16)
+
+    crop = parser.add_argument_group("crop")
+    crop.add_argument("--padding", type=int, default=8)
+    crop.add_argument("--alpha-threshold", type=int, default=0)
+
+    opt = parser.add_argument_group("optimize")
+    opt.add_argument("--quantize", action="store_true")
+    opt.add_argument("--max-diff", type=int, default=8)
+
+    atlas = parser.add_argument_group("atlas")
+    atlas.add_argument("--atlas-dir", type=Path, default=DEFAULT_ATLAS_DIR,
+                       help="pass public/assets/atlas to update the game")
+    atlas.add_argument("--atlas-name", default="cards")
+    atlas.add_argument("--atlas-max-size", type=int, default=4096)
+    atlas.add_argument("--atlas-padding", type=int, default=2)
+    atlas.add_argument("--atlas-scale", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print(" " * 28 + "CARD ASSET PIPELINE")
+    print("=" * 80)
+    return asyncio.run(run_pipeline(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
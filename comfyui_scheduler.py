@@ -0,0 +1,479 @@
+"""
+Concurrent ComfyUI job scheduler for card image generation
+同時把多個 workflow 排進 ComfyUI 佇列，並各自追蹤 prompt_id
+
+ComfyUI already runs its own queue, so instead of waiting for the server to
+go idle and sleeping between cards, the scheduler keeps up to ``depth``
+prompts in flight and collects each one as soon as it finishes.
+
+Completion comes from ComfyUI's websocket events (``executing`` with
+``node: null`` / ``execution_success``); /history is only polled as a
+fallback, with an interval that backs off while a prompt is still running.
+
+With a ``JobQueue`` every state change is written to disk, so a rerun skips
+finished cards and waits on the prompts an interrupted run left in ComfyUI.
+
+Finished images are hardlinked into the generation cache and reflinked (or
+copied on a worker thread, verified by hash) into the game assets, so the
+event loop never blocks on file I/O while other prompts are in flight.
+
+Seeds are derived from each card's prompt (or its ``seed`` field) so the same
+card always produces the same workflow; with a ``GenerationCache`` such a
+workflow is answered from disk without contacting ComfyUI.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from pathlib import Path
+
+from backup_store import transfer
+
+
+COMFYUI_OUTPUT = Path("D:/ComfyUI/output")
+WORKFLOW_FILE = "flux-text-to-image-shorts.json"
+
+
+def output_images(history_entry):
+    """從 /history 的單一項目取出所有輸出圖片的檔名（含 subfolder）"""
+    filenames = []
+    for node_output in history_entry.get("outputs", {}).values():
+        for img_info in node_output.get("images", []):
+            filename = img_info.get("filename")
+            if filename:
+                subfolder = img_info.get("subfolder") or ""
+                filenames.append(str(Path(subfolder) / filename) if subfolder else filename)
+    return filenames
+
+
+def card_seed(card_info):
+    """卡片的固定種子：卡片定義的 seed，否則由 prompt 推算"""
+    if card_info.get("seed") is not None:
+        return int(card_info["seed"])
+    return int(hashlib.sha256(card_info["prompt"].encode()).hexdigest()[:8], 16)
+
+
+def apply_seed(workflow, seed):
+    """把種子寫進每個 sampler / noise 節點"""
+    for node in workflow.values():
+        inputs = node.get("inputs", {})
+        for key in ("seed", "noise_seed"):
+            if isinstance(inputs.get(key), int):
+                inputs[key] = seed
+    return seed
+
+
+def apply_candidates(workflow, count, seed=None):
+    """
+    Turn a single-image workflow into one batched submission of ``count`` seeds
+
+    Sets ``batch_size`` on the empty-latent node and a fresh seed on every
+    sampler/noise node; ComfyUI then renders the batch in one pass so the
+    model is loaded once for all candidates.
+
+    Returns:
+        The seed written into the workflow
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    for node in workflow.values():
+        inputs = node.get("inputs", {})
+        if node.get("class_type", "").startswith("Empty") and "batch_size" in inputs:
+            inputs["batch_size"] = count
+    return apply_seed(workflow, seed)
+
+
+class CompletionTracker:
+    """
+    Resolve prompt completions from ComfyUI websocket events
+
+    Falls back to polling /history when the websocket is unavailable (or
+    goes quiet), starting at ``poll_min`` seconds and backing off to
+    ``poll_max``. Once an event for a prompt has arrived over a connected
+    websocket, /history is only checked every ``safety_interval`` seconds in
+    case an event is missed. Until then events may not be reaching this
+    client (e.g. the prompt was submitted with another client_id), so polling
+    keeps its normal pace.
+
+    Args:
+        server_url: ComfyUI 網址，例如 http://127.0.0.1:8188；None 表示只輪詢
+        client_id: 送出 prompt 時使用的 client_id（事件只會送給這個 client）
+        get_history: async (prompt_id) -> /history 回應
+        on_progress: (prompt_id, value, max) 的回呼，可省略
+    """
+
+    def __init__(self, server_url, client_id, get_history, on_progress=None,
+                 poll_min=1.0, poll_max=5.0, safety_interval=30.0):
+        self.server_url = server_url.rstrip("/") if server_url else None
+        self.client_id = client_id or str(uuid.uuid4())
+        self.get_history = get_history
+        self.on_progress = on_progress
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.safety_interval = safety_interval
+        self.history_requests = 0
+        self._done = {}
+        # 已經收到過事件的 prompt：確定事件會送到這個 client
+        self._seen = set()
+        self._session = None
+        self._listener = None
+        self._closing = False
+        self._connected = asyncio.Event()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    async def start(self):
+        """連上 /ws；失敗時只用輪詢，不拋出例外"""
+        if self.server_url is None:
+            return False
+        try:
+            import aiohttp
+        except ImportError:
+            return False
+
+        ws_url = self.server_url.replace("http", "ws", 1) + f"/ws?clientId={self.client_id}"
+        self._session = aiohttp.ClientSession()
+        try:
+            ws = await self._session.ws_connect(ws_url, heartbeat=30)
+        except Exception as e:
+            print(f"[WARNING] ComfyUI websocket unavailable ({e}); polling /history instead")
+            await self._session.close()
+            self._session = None
+            return False
+
+        self._connected.set()
+        self._listener = asyncio.create_task(self._listen(ws))
+        return True
+
+    async def close(self):
+        self._closing = True
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._session is not None:
+            await self._session.close()
+
+    def _future(self, prompt_id):
+        if prompt_id not in self._done:
+            self._done[prompt_id] = asyncio.get_running_loop().create_future()
+        return self._done[prompt_id]
+
+    async def _listen(self, ws):
+        import aiohttp
+
+        try:
+            async for msg in ws:
+                # 二進位訊息是預覽圖，略過
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_event(json.loads(msg.data))
+                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+        finally:
+            self._connected.clear()
+            if not self._closing:
+                print("[WARNING] ComfyUI websocket closed; polling /history instead")
+
+    def handle_event(self, message):
+        """處理一則 ComfyUI websocket 事件"""
+        event = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        # 只處理正在 wait() 的 prompt；其他 client 或已結束的 prompt 不建立 future
+        if prompt_id not in self._done:
+            return
+        self._seen.add(prompt_id)
+
+        if event == "progress" and self.on_progress:
+            self.on_progress(prompt_id, data.get("value", 0), data.get("max", 0))
+        elif event in ("execution_success", "execution_error", "execution_interrupted") or (
+                event == "executing" and data.get("node") is None):
+            future = self._done[prompt_id]
+            if not future.done():
+                future.set_result(event)
+
+    async def _poll(self, prompt_id):
+        self.history_requests += 1
+        history = await self.get_history(prompt_id)
+        entry = history.get(prompt_id)
+        if entry and entry.get("status", {}).get("completed", False):
+            return entry
+        if entry and entry.get("status", {}).get("status_str") == "error":
+            raise RuntimeError(f"ComfyUI reported an error for prompt {prompt_id}")
+        return None
+
+    async def wait(self, prompt_id, timeout, events=True):
+        """
+        Wait for a prompt to finish
+
+        Args:
+            events: False 表示這個 prompt 的事件不會送到本 client（例如上次執行
+                送出的 prompt），只能輪詢 /history
+
+        Returns:
+            The prompt's /history entry, or None on timeout
+        """
+        done = self._future(prompt_id)
+        deadline = time.monotonic() + timeout
+        delay = self.poll_min
+
+        try:
+            while time.monotonic() < deadline:
+                remaining = deadline - time.monotonic()
+                if done.done():
+                    # 事件已到但 history 還沒寫好：短暫等待後再查
+                    await asyncio.sleep(min(self.poll_min / 4, remaining))
+                else:
+                    trusted = events and self.connected and prompt_id in self._seen
+                    interval = self.safety_interval if trusted else delay
+                    try:
+                        await asyncio.wait_for(asyncio.shield(done), min(interval, remaining))
+                    except asyncio.TimeoutError:
+                        delay = min(delay * 2, self.poll_max)
+
+                entry = await self._poll(prompt_id)
+                if entry is not None:
+                    return entry
+            return None
+        finally:
+            self._done.pop(prompt_id, None)
+            self._seen.discard(prompt_id)
+
+
+class GenerationScheduler:
+    """
+    Keep several card workflows queued in ComfyUI at once
+
+    Args:
+        client: ComfyUIClient（需要 submit_workflow 與 get_history）
+        workflow_builder: WorkflowBuilder（需要 load_and_prepare_image_workflow）
+        game_assets: 卡片圖片的目標目錄
+        comfyui_output: ComfyUI 的 output 目錄
+        depth: 同時排在 ComfyUI 佇列中的最大工作數
+        server_url: ComfyUI 網址，用來連 websocket；None 表示只輪詢 /history
+        poll_interval: 沒有 websocket 時，輪詢 /history 的最長間隔（秒）
+        timeout: 每個工作從送出到完成的時限（秒），包含在 ComfyUI 佇列中等待的時間
+        candidates: 每張卡片一次生成的候選數，只保留評分最高的一張
+        queue: JobQueue；有的話會略過已完成的卡片、接續上次送出的 prompt
+        cache: GenerationCache；workflow 相同時直接使用快取的圖片，不送進 ComfyUI
+    """
+
+    def __init__(self, client, workflow_builder, game_assets, comfyui_output=COMFYUI_OUTPUT,
+                 depth=3, server_url=None, poll_interval=3, timeout=600,
+                 workflow_file=WORKFLOW_FILE, width=720, height=1280, candidates=1, queue=None,
+                 cache=None):
+        self.client = client
+        self.workflow_builder = workflow_builder
+        self.game_assets = Path(game_assets)
+        self.comfyui_output = Path(comfyui_output)
+        self.depth = max(1, depth)
+        self.server_url = server_url
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.candidates = max(1, candidates)
+        self.queue = queue
+        self.cache = cache
+        self.skipped = []
+        self.tracker = None
+        self._slots = None
+        self._progress = {}
+        self.workflow_file = workflow_file
+        self.width = width
+        self.height = height
+
+    def prepare(self, card_info):
+        """載入並填好單張卡片的 workflow（candidates > 1 時改成批次多種子）"""
+        workflow = self.workflow_builder.load_and_prepare_image_workflow(
+            filename=self.workflow_file,
+            prompt=card_info["prompt"],
+            width=self.width,
+            height=self.height
+        )
+        if self.candidates > 1:
+            apply_candidates(workflow, self.candidates, card_seed(card_info))
+        else:
+            apply_seed(workflow, card_seed(card_info))
+        return workflow
+
+    async def run(self, cards):
+        """
+        Generate every card, keeping at most ``depth`` prompts in flight
+
+        Cards the queue already finished are left out and listed in
+        ``self.skipped``; cards with a prompt still in ComfyUI go first.
+
+        Returns:
+            List of result dicts in completion order (failed cards omitted)
+        """
+        if self.queue is not None:
+            self.skipped = [card for card in cards if self.queue.is_done(card["name"])]
+            cards = sorted((card for card in cards if not self.queue.is_done(card["name"])),
+                           key=lambda card: not self.queue.in_flight(card["name"]))
+
+        await self.start()
+        total = len(cards)
+        tasks = [
+            asyncio.create_task(self.generate(card, index, total))
+            for index, card in enumerate(cards, 1)
+        ]
+
+        results = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if result:
+                    results.append(result)
+        finally:
+            await self.close()
+        return results
+
+    async def start(self):
+        """連上事件串流並建立佇列名額；只用 generate() 時由呼叫端負責 start / close"""
+        self.tracker = CompletionTracker(
+            self.server_url, getattr(self.client, "client_id", None), self.client.get_history,
+            on_progress=self._report_progress, poll_max=self.poll_interval,
+        )
+        if await self.tracker.start():
+            print("[OK] Listening for ComfyUI progress events")
+        self._slots = asyncio.Semaphore(self.depth)
+
+    async def close(self):
+        await self.tracker.close()
+
+    async def generate(self, card_info, index=1, total=1):
+        """
+        Generate one card once a queue slot is free
+
+        Returns:
+            The result dict, or None when the card failed or timed out
+        """
+        return await self._run_job(self._slots, card_info, index, total)
+
+    def _report_progress(self, prompt_id, value, maximum):
+        # 每跨過 25% 印一次，避免多張卡同時生成時洗版
+        if prompt_id in self._progress and maximum:
+            name, last = self._progress[prompt_id]
+            quarter = value * 4 // maximum
+            if quarter > last:
+                self._progress[prompt_id] = (name, quarter)
+                print(f"  ... {name}: step {value}/{maximum} ({value / maximum:.0%})")
+
+    async def _run_job(self, slots, card_info, index, total):
+        card_name = card_info["name"]
+        async with slots:
+            try:
+                workflow = self.prepare(card_info)
+                cache_key = self.cache.key(workflow) if self.cache is not None else None
+                cached = self.cache.lookup(cache_key) if cache_key else None
+                if cached:
+                    print(f"[CACHED] [{index}/{total}] {card_name} ({card_info['color']})")
+                    result = await self.finish(card_info, None, cached, 0.0)
+                    result["cached"] = True
+                    if self.queue is not None:
+                        self.queue.mark_done(card_name, result["target"])
+                    return result
+
+                prompt_id = await self._resumable_prompt(card_name)
+                resumed = prompt_id is not None
+                if resumed:
+                    print(f"[RESUME] [{index}/{total}] {card_name} -> {prompt_id}")
+                else:
+                    prompt_id = await self.client.submit_workflow(workflow)
+                    print(f"[SUBMIT] [{index}/{total}] {card_name} ({card_info['color']}) -> {prompt_id}")
+                    if self.queue is not None:
+                        self.queue.mark_submitted(card_name, prompt_id)
+                self._progress[prompt_id] = (card_name, 0)
+
+                start_time = time.time()
+                # 上次執行送出的 prompt，事件是送給舊的 client_id，只能輪詢
+                history_entry = await self.tracker.wait(prompt_id, self.timeout, events=not resumed)
+                elapsed = time.time() - start_time
+                if history_entry is None:
+                    # prompt 還在 ComfyUI 佇列裡，保持 submitted，下次執行會接著等
+                    print(f"[TIMEOUT] [{index}/{total}] {card_name} took too long (>{self.timeout}s)")
+                    return None
+
+                print(f"[SUCCESS] [{index}/{total}] {card_name} completed in {elapsed:.1f}s")
+                result = await self.collect(card_info, prompt_id, history_entry, elapsed, cache_key)
+                if self.queue is not None:
+                    if result:
+                        self.queue.mark_done(card_name, result["target"])
+                    else:
+                        self.queue.mark_failed(card_name, "no output images")
+                return result
+
+            except Exception as e:
+                print(f"[ERROR] Error generating {card_name}: {e}")
+                if self.queue is not None:
+                    self.queue.mark_failed(card_name, f"{type(e).__name__}: {e}")
+                import traceback
+                traceback.print_exc()
+                return None
+
+    async def _resumable_prompt(self, card_name):
+        """上次執行留在 ComfyUI 的 prompt_id；prompt 已經不存在時把工作改回 pending"""
+        if self.queue is None or not self.queue.in_flight(card_name):
+            return None
+        prompt_id = self.queue.prompt_id(card_name)
+        if (await self.client.get_history(prompt_id)).get(prompt_id):
+            return prompt_id
+        get_queue = getattr(self.client, "get_queue", None)
+        if get_queue is None:
+            # 沒辦法確認佇列內容時，相信 prompt 還在，交給 timeout 處理
+            return prompt_id
+        queue = await get_queue()
+        queued = {item[1] for item in queue.get("queue_running", []) + queue.get("queue_pending", [])}
+        if prompt_id in queued:
+            return prompt_id
+        print(f"[WARNING] {card_name}: prompt {prompt_id} is no longer known to ComfyUI; resubmitting")
+        self.queue.reset(card_name)
+        return None
+
+    async def collect(self, card_info, prompt_id, history_entry, elapsed, cache_key=None):
+        """把 ComfyUI 的輸出（多張候選時取評分最高者）複製到遊戲素材目錄"""
+        sources = []
+        for filename in output_images(history_entry):
+            source_path = self.comfyui_output / filename
+            if source_path.exists():
+                sources.append(source_path)
+            else:
+                print(f"[WARNING] Source file not found: {source_path}")
+        if not sources:
+            return None
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.store, cache_key, sources)
+        return await self.finish(card_info, prompt_id, sources, elapsed)
+
+    async def finish(self, card_info, prompt_id, sources, elapsed):
+        """從候選圖中挑出一張，複製成遊戲素材"""
+        card_name = card_info["name"]
+        result = {"card": card_name, "prompt_id": prompt_id, "candidates": len(sources)}
+        source_path = sources[0]
+        if len(sources) > 1:
+            from candidate_scoring import pick_best
+
+            source_path, scores = await asyncio.to_thread(pick_best, sources)
+            for path, metrics in scores:
+                marker = "*" if path == source_path else " "
+                print(f"  {marker} {path.name}: score {metrics['score']:.3f} "
+                      f"(coverage {metrics['coverage']:.0%}, centered {metrics['centered']:.2f}, "
+                      f"background {metrics['background']:.2f})")
+            result["score"] = dict(scores)[source_path]["score"]
+
+        target_filename = f"{card_name.lower()}_origami.png"
+        target_path = self.game_assets / target_filename
+        # 卡片之後會被去背腳本原地覆寫，不能和 ComfyUI 輸出或快取共用 inode
+        method = await asyncio.to_thread(transfer, source_path, target_path)
+        print(f"[{method.upper()}] {source_path} -> {target_path}")
+        result.update({
+            "source": str(source_path),
+            "target": str(target_path),
+            "filename": target_filename,
+            "time": elapsed
+        })
+        return result
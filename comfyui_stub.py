@@ -0,0 +1,285 @@
+"""
+Local stand-in for the ComfyUI HTTP API
+本機的 ComfyUI 替身伺服器：不需要 GPU 就能測試與量測排程器
+
+It implements the endpoints the generation scripts use (POST /prompt,
+GET /history[/id], GET /queue, GET /system_stats, and the /ws event stream)
+with a single "GPU" that runs one prompt at a time for ``job_seconds`` and
+writes a placeholder PNG into ``output_dir``.
+
+    python comfyui_stub.py --port 8189 --output-dir stub_output --job-seconds 2
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import uuid
+from pathlib import Path
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+
+class ComfyUIStub:
+    """
+    Minimal ComfyUI server with one serial execution queue
+
+    Args:
+        output_dir: 假輸出圖片的存放目錄
+        job_seconds: 每個 prompt 的模擬生成時間
+        steps: 每個 prompt 送出的 progress 事件數
+        websocket: False 時不提供 /ws，用來測試輪詢的備援路徑
+    """
+
+    def __init__(self, output_dir, job_seconds=1.0, steps=20, websocket=True):
+        self.output_dir = Path(output_dir)
+        self.job_seconds = job_seconds
+        self.steps = steps
+        self.websocket = websocket
+        self.sockets = {}
+        self.history = {}
+        self.pending = []
+        self.running = None
+        self.request_counts = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+        self._worker = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/prompt", self.handle_prompt)
+        app.router.add_get("/history", self.handle_history)
+        app.router.add_get("/history/{prompt_id}", self.handle_history)
+        app.router.add_get("/queue", self.handle_queue)
+        app.router.add_get("/system_stats", self.handle_system_stats)
+        if self.websocket:
+            app.router.add_get("/ws", self.handle_ws)
+        app.middlewares.append(self._count_requests)
+        return app
+
+    @web.middleware
+    async def _count_requests(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.request_counts[route] = self.request_counts.get(route, 0) + 1
+        return await handler(request)
+
+    async def start(self, host="127.0.0.1", port=8189):
+        """啟動 HTTP 伺服器與模擬 GPU 的工作迴圈"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._worker = asyncio.create_task(self._execute_loop())
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+        for ws in list(self.sockets.values()):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle_prompt(self, request):
+        body = await request.json()
+        prompt_id = str(uuid.uuid4())
+        number = next(self._counter)
+        self.pending.append((number, prompt_id, body.get("prompt", {}), body.get("client_id")))
+        self._wakeup.set()
+        return web.json_response({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+
+    async def handle_history(self, request):
+        prompt_id = request.match_info.get("prompt_id")
+        if prompt_id is None:
+            return web.json_response(self.history)
+        if prompt_id in self.history:
+            return web.json_response({prompt_id: self.history[prompt_id]})
+        return web.json_response({})
+
+    async def handle_queue(self, request):
+        running = [[self.running[0], self.running[1], {}, {}, []]] if self.running else []
+        pending = [[n, pid, {}, {}, []] for n, pid, _, _ in self.pending]
+        return web.json_response({"queue_running": running, "queue_pending": pending})
+
+    async def handle_system_stats(self, request):
+        return web.json_response({"system": {"os": "stub", "comfyui_version": "stub"}, "devices": []})
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or str(uuid.uuid4())
+        self.sockets[client_id] = ws
+        try:
+            await ws.send_json({"type": "status", "data": {
+                "status": {"exec_info": {"queue_remaining": len(self.pending)}}, "sid": client_id}})
+            async for _ in ws:
+                pass
+        finally:
+            self.sockets.pop(client_id, None)
+        return ws
+
+    async def send(self, event, data, client_id=None):
+        """和 ComfyUI 一樣：有 client_id 只送給該 client，否則廣播"""
+        if client_id is not None:
+            targets = [self.sockets[client_id]] if client_id in self.sockets else []
+        else:
+            targets = list(self.sockets.values())
+        for ws in targets:
+            try:
+                await ws.send_json({"type": event, "data": data})
+            except ConnectionResetError:
+                pass
+
+    async def _execute_loop(self):
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self.running = self.pending.pop(0)
+            number, prompt_id, workflow, client_id = self.running
+
+            await self.send("execution_start", {"prompt_id": prompt_id}, client_id)
+            await self.send("executing", {"node": "13", "prompt_id": prompt_id}, client_id)
+            for step in range(1, self.steps + 1):
+                await asyncio.sleep(self.job_seconds / self.steps)
+                await self.send("progress", {"value": step, "max": self.steps,
+                                             "prompt_id": prompt_id, "node": "13"}, client_id)
+
+            filenames = await asyncio.to_thread(self.render_outputs, prompt_id, workflow)
+            images = [{"filename": name, "subfolder": "", "type": "output"} for name in filenames]
+            await self.send("executed", {"node": "9", "output": {"images": images},
+                                         "prompt_id": prompt_id}, client_id)
+            await self.send("execution_success", {"prompt_id": prompt_id}, client_id)
+
+            # ComfyUI 先寫 history，再送 node 為 null 的 executing
+            self.history[prompt_id] = {
+                "prompt": [number, prompt_id, workflow, {}, []],
+                "outputs": {"9": {"images": images}},
+                "status": {"status_str": "success", "completed": True, "messages": []},
+            }
+            self.running = None
+            await self.send("executing", {"node": None, "prompt_id": prompt_id}, client_id)
+
+    def render_outputs(self, prompt_id, workflow):
+        """依 workflow 的尺寸與 batch_size 寫出白底加色塊的假圖片"""
+        from PIL import Image, ImageDraw
+
+        width, height, batch_size, seed = 720, 1280, 1, 0
+        for node in workflow.values():
+            inputs = node.get("inputs", {}) if isinstance(node, dict) else {}
+            width = inputs.get("width", width) if isinstance(inputs.get("width"), int) else width
+            height = inputs.get("height", height) if isinstance(inputs.get("height"), int) else height
+            if isinstance(inputs.get("batch_size"), int):
+                batch_size = inputs["batch_size"]
+            for key in ("seed", "noise_seed"):
+                if isinstance(inputs.get(key), int):
+                    seed = inputs[key]
+
+        filenames = []
+        for i in range(batch_size):
+            rng = random.Random(seed + i)
+            img = Image.new("RGB", (width, height), "white")
+            cx = rng.uniform(0.3, 0.7) * width
+            cy = rng.uniform(0.3, 0.7) * height
+            rx = rng.uniform(0.1, 0.3) * width
+            ry = rng.uniform(0.1, 0.3) * height
+            color = tuple(rng.randrange(0, 200) for _ in range(3))
+            ImageDraw.Draw(img).ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=color)
+            name = f"stub_{prompt_id[:8]}_{i:05d}_.png"
+            img.save(self.output_dir / name, "PNG")
+            filenames.append(name)
+        return filenames
+
+
+class SimpleComfyUIClient:
+    """
+    Bare-bones async client for the ComfyUI HTTP API
+
+    Provides the subset of ComfyUIClient used by the generation scripts so
+    the stub can be exercised without the spec-kit backend on sys.path.
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:8188"):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = str(uuid.uuid4())
+        self._session = None
+
+    async def _http(self):
+        if self._session is None:
+            self._session = ClientSession(timeout=ClientTimeout(total=30))
+        return self._session
+
+    async def check_status(self):
+        try:
+            session = await self._http()
+            async with session.get(f"{self.base_url}/system_stats") as resp:
+                return "online" if resp.status == 200 else "offline"
+        except Exception:
+            return "offline"
+
+    async def submit_workflow(self, workflow):
+        session = await self._http()
+        payload = {"prompt": workflow, "client_id": self.client_id}
+        async with session.post(f"{self.base_url}/prompt", json=payload) as resp:
+            resp.raise_for_status()
+            return (await resp.json())["prompt_id"]
+
+    async def get_history(self, prompt_id):
+        session = await self._http()
+        async with session.get(f"{self.base_url}/history/{prompt_id}") as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def get_queue(self):
+        session = await self._http()
+        async with session.get(f"{self.base_url}/queue") as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class StubWorkflowBuilder:
+    """產生最小的 Flux 風格 API workflow，讓替身伺服器有尺寸與 prompt 可讀"""
+
+    def load_and_prepare_image_workflow(self, filename, prompt, width, height):
+        return {
+            "6": {"class_type": "CLIPTextEncode", "inputs": {"text": prompt, "clip": ["11", 0]}},
+            "25": {"class_type": "RandomNoise", "inputs": {"noise_seed": random.randrange(2 ** 32)}},
+            "27": {"class_type": "EmptySD3LatentImage",
+                   "inputs": {"width": width, "height": height, "batch_size": 1}},
+            "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "card", "images": ["8", 0]}},
+        }
+
+
+async def _serve(args):
+    stub = ComfyUIStub(args.output_dir, job_seconds=args.job_seconds, websocket=not args.no_websocket)
+    url = await stub.start(port=args.port)
+    print(f"[STUB] ComfyUI stand-in listening on {url}")
+    print(f"[STUB] Output dir: {stub.output_dir.resolve()}   Job time: {args.job_seconds}s")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the ComfyUI HTTP API")
+    parser.add_argument("--port", type=int, default=8189)
+    parser.add_argument("--output-dir", type=Path, default=Path("stub_output"))
+    parser.add_argument("--job-seconds", type=float, default=2.0)
+    parser.add_argument("--no-websocket", action="store_true",
+                        help="disable /ws so clients fall back to polling")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        print("\n[STOP] Stub stopped")
+
+
+if __name__ == "__main__":
+    main()
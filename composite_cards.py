@@ -0,0 +1,143 @@
+"""
+Re-composite rembg cards from cached alpha masks
+用快取的 alpha mask 重新合成卡片：調整邊緣收縮、羽化或去白邊時不必重跑 rembg
+
+    python composite_cards.py --erode 1 --feather 1.0 --defringe --in-place
+    python composite_cards.py --feather 2 --output-dir preview
+
+Masks come from the ``.mask_cache`` next to each ``*_before_rembg.png``
+original (written by rembg_worker.py). Cards without a cached mask are
+reported instead of being sent through the model.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from asset_cache import AssetManifest, MaskCache, hash_image
+from rembg_worker import DEFAULT_MODEL
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+SOURCE_SUFFIX = "_before_rembg.png"
+
+
+def refine_mask(mask, erode=0, feather=0.0):
+    """
+    Shrink and soften an alpha mask
+
+    Args:
+        mask: (H, W) uint8
+        erode: 邊緣往內收縮的像素數，去掉殘留的背景光暈
+        feather: 高斯模糊半徑（像素），0 為不羽化
+    """
+    if not erode and not feather:
+        return mask
+    img = Image.fromarray(mask, "L")
+    if erode:
+        img = img.filter(ImageFilter.MinFilter(2 * erode + 1))
+    if feather:
+        img = img.filter(ImageFilter.GaussianBlur(feather))
+    return np.asarray(img)
+
+
+def defringe(rgb, alpha, background=255):
+    """
+    Remove the white background that is mixed into semi-transparent edges
+
+    邊緣像素 = a * 前景 + (1 - a) * 白底，反解出前景顏色
+    """
+    a = alpha.astype(np.float32)[..., None] / 255
+    edge = (alpha > 0) & (alpha < 255)
+    rgb = rgb.astype(np.float32)
+    restored = (rgb - (1 - a) * background) / np.maximum(a, 1 / 255)
+    rgb[edge] = restored[edge]
+    return np.clip(rgb, 0, 255).astype(np.uint8)
+
+
+def composite_card(source_path, output_path, cache, model=DEFAULT_MODEL,
+                   erode=0, feather=0.0, defringe_edges=False):
+    """用快取的 mask 合成一張卡片，回傳結果 dict（沒有快取時 error 會說明）"""
+    start = time.perf_counter()
+    error = None
+    try:
+        with Image.open(source_path) as image:
+            key = cache.key(hash_image(image), model)
+            mask = cache.load(key)
+            if mask is None:
+                raise LookupError(f"no cached {model} mask, run rembg on it first")
+            rgb = np.asarray(image.convert("RGB"))
+        alpha = refine_mask(mask, erode, feather)
+        if defringe_edges:
+            rgb = defringe(rgb, alpha)
+        Image.fromarray(np.dstack([rgb, alpha]), "RGBA").save(output_path, "PNG")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "input": str(source_path),
+        "output": str(output_path),
+        "time": time.perf_counter() - start,
+        "error": error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-composite cards from cached rembg masks")
+    parser.add_argument("--cards-dir", type=Path, default=DEFAULT_CARDS_DIR)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model the masks were cached for")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", type=Path, help="write the cards here")
+    output.add_argument("--in-place", action="store_true",
+                        help="overwrite the cards next to their *_before_rembg.png originals")
+    parser.add_argument("--erode", type=int, default=0, help="shrink the mask by N pixels")
+    parser.add_argument("--feather", type=float, default=0.0, help="Gaussian blur radius for the mask")
+    parser.add_argument("--defringe", action="store_true",
+                        help="remove white mixed into semi-transparent edge pixels")
+    args = parser.parse_args(argv)
+
+    sources = sorted(args.cards_dir.glob("*" + SOURCE_SUFFIX))
+    if not sources:
+        print(f"[ERROR] No *{SOURCE_SUFFIX} originals found in {args.cards_dir}")
+        return 1
+
+    output_dir = args.cards_dir if args.in_place else args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = MaskCache.beside(sources[0])
+    manifest = AssetManifest(args.cards_dir) if args.in_place else None
+    params = {"model": args.model, "erode": args.erode, "feather": args.feather,
+              "defringe": args.defringe}
+
+    print("=" * 80)
+    print(" " * 22 + "COMPOSITE FROM CACHED MASKS")
+    print("=" * 80)
+    print(f"[MODEL] {args.model}   [ERODE] {args.erode}px   [FEATHER] {args.feather}px   "
+          f"[DEFRINGE] {'on' if args.defringe else 'off'}")
+
+    start = time.perf_counter()
+    results = []
+    for source in sources:
+        output_path = output_dir / (source.name[:-len(SOURCE_SUFFIX)] + ".png")
+        result = composite_card(source, output_path, cache, args.model,
+                                args.erode, args.feather, args.defringe)
+        results.append(result)
+        status = f"[ERROR] {result['error']}" if result["error"] else f"{result['time'] * 1000:.0f} ms"
+        print(f"  {output_path.name:28s} {status}")
+        if manifest is not None and not result["error"]:
+            manifest.record(source, output_path, "rembg", params)
+    if manifest is not None:
+        manifest.save()
+
+    ok = [r for r in results if not r["error"]]
+    print()
+    print(f"[DONE] {len(ok)}/{len(results)} cards in {time.perf_counter() - start:.2f}s "
+          f"(no inference)")
+    print(f"[LOCATION] {output_dir}")
+    return 1 if len(ok) < len(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,9 @@
 Generate missing origami-style card images for Sea Salt & Paper game
 生成缺失的卡片圖片
 """
+import argparse
 import asyncio
 import sys
-import time
-import shutil
 from pathlib import Path
 
 # Add spec-kit backend to path
@@ -13,7 +12,10 @@ sys.path.insert(0, str(Path("D:/spec-kit/backend/src")))
 
 from integrations.comfyui.client import ComfyUIClient
 from integrations.comfyui.workflow_builder import WorkflowBuilder
-from integrations.comfyui.queue_poller import QueuePoller
+
+from asset_cache import GenerationCache
+from comfyui_scheduler import GenerationScheduler
+from generation_queue import JobQueue
 
 
 # Missing card definitions
@@ -51,105 +53,7 @@ MISSING_CARDS = [
 ]
 
 
-async def generate_card_image(client, workflow_builder, queue_poller, card_info, index, total, game_assets):
-    """Generate a single card image and copy to game assets"""
-    card_name = card_info["name"]
-    prompt = card_info["prompt"]
-
-    print(f"\n{'='*80}")
-    print(f"[{index}/{total}] Generating: {card_name} ({card_info['color']})")
-    print("="*80)
-    print(f"[PROMPT] {prompt[:100]}...")
-
-    try:
-        # Check ComfyUI status
-        print("[CHECK] Checking ComfyUI status...")
-        status = await client.check_status()
-        if status == "offline":
-            print("[ERROR] ComfyUI is offline. Please start ComfyUI first.")
-            return None
-        print("[OK] ComfyUI is online")
-
-        # Wait for idle
-        print("[WAIT] Waiting for ComfyUI to be idle...")
-        await queue_poller.ensure_idle()
-        print("[OK] ComfyUI is idle")
-
-        # Load workflow
-        print("[LOAD] Loading Flux workflow...")
-        workflow = workflow_builder.load_and_prepare_image_workflow(
-            filename="flux-text-to-image-shorts.json",
-            prompt=prompt,
-            width=720,
-            height=1280
-        )
-        print("[OK] Workflow prepared")
-
-        # Submit
-        print("[SUBMIT] Submitting to ComfyUI...")
-        prompt_id = await client.submit_workflow(workflow)
-        print(f"[OK] Workflow submitted! Prompt ID: {prompt_id}")
-
-        # Wait for completion
-        print("[GENERATE] Generating image (this may take 30-90 seconds)...")
-        start_time = time.time()
-
-        while True:
-            history = await client.get_history(prompt_id)
-            if prompt_id in history:
-                status_data = history[prompt_id].get("status", {})
-                if status_data.get("completed", False):
-                    elapsed = time.time() - start_time
-                    print(f"[SUCCESS] Image generation completed in {elapsed:.1f}s!")
-
-                    # Extract output filename
-                    outputs = history[prompt_id].get("outputs", {})
-                    for node_output in outputs.values():
-                        if "images" in node_output:
-                            for img_info in node_output["images"]:
-                                filename = img_info.get("filename")
-                                if filename:
-                                    # Source path
-                                    source_path = Path("D:/ComfyUI/output") / filename
-                                    print(f"[FOUND] ComfyUI output: {source_path}")
-
-                                    # Target path
-                                    target_filename = f"{card_name.lower()}_origami.png"
-                                    target_path = game_assets / target_filename
-
-                                    if source_path.exists():
-                                        shutil.copy2(source_path, target_path)
-                                        print(f"[COPIED] -> {target_path}")
-                                        return {
-                                            "card": card_name,
-                                            "source": str(source_path),
-                                            "target": str(target_path),
-                                            "filename": target_filename,
-                                            "time": elapsed
-                                        }
-                                    else:
-                                        print(f"[WARNING] Source file not found: {source_path}")
-                    break
-
-            elapsed = time.time() - start_time
-            if elapsed > 300:  # 5 minute timeout
-                print(f"[TIMEOUT] Image generation took too long (>{elapsed:.0f}s)")
-                return None
-
-            # Progress update
-            if int(elapsed) % 10 == 0 and elapsed > 0:
-                print(f"  ... still generating ({elapsed:.0f}s elapsed)")
-
-            await asyncio.sleep(3)
-
-    except Exception as e:
-        print(f"[ERROR] Error generating {card_name}: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
-async def main():
+async def main(depth=3, candidates=1, restart=False, use_cache=True):
     """Generate all missing card images"""
     print("="*80)
     print(" "*20 + "SEA SALT & PAPER")
@@ -161,9 +65,16 @@ async def main():
     game_assets = Path("D:/claude-mode/board-game-sea-salt-paper/assets/cards")
     game_assets.mkdir(parents=True, exist_ok=True)
 
+    # 進度寫在素材目錄的佇列檔裡，中斷後重跑會略過已完成的卡片
+    queue = JobQueue(game_assets)
+    queue.add(MISSING_CARDS, restart=restart)
+    # 同一份 workflow（prompt、種子、尺寸、模型）生成過就直接用快取的圖片
+    cache = GenerationCache.beside(game_assets) if use_cache else None
+
     print(f"[OUTPUT] ComfyUI output: {comfyui_output}")
     print(f"[TARGET] Game assets: {game_assets}")
     print(f"[CARDS] Total cards to generate: {len(MISSING_CARDS)}")
+    print(f"[QUEUE] {queue.path} " + ", ".join(f"{k}: {v}" for k, v in sorted(queue.counts().items())))
     print(f"[TIME] Estimated time: {len(MISSING_CARDS) * 1} - {len(MISSING_CARDS) * 1.5} minutes")
     print("\n[START] Starting generation...")
     print()
@@ -172,45 +83,61 @@ async def main():
     print("\n[INIT] Initializing ComfyUI clients...")
     client = ComfyUIClient("http://127.0.0.1:8188")
     workflow_builder = WorkflowBuilder(Path("D:/spec-kit/backend/workflows"))
-    queue_poller = QueuePoller(client, poll_interval=3)
     print("[OK] Clients initialized")
 
-    # Generate images
-    results = []
-    total = len(MISSING_CARDS)
-
-    for index, card in enumerate(MISSING_CARDS, 1):
-        result = await generate_card_image(
-            client, workflow_builder, queue_poller,
-            card, index, total, game_assets
-        )
-        if result:
-            results.append(result)
+    # Check once that ComfyUI is online; after that its own queue does the pacing
+    print("[CHECK] Checking ComfyUI status...")
+    if await client.check_status() == "offline":
+        print("[ERROR] ComfyUI is offline. Please start ComfyUI first.")
+        print("        URL: http://127.0.0.1:8188")
+        return
+    print("[OK] ComfyUI is online")
 
-        # Wait between generations
-        if index < total:
-            print(f"\n[WAIT] Waiting 5 seconds before next generation...")
-            await asyncio.sleep(5)
+    # Generate images, keeping up to `depth` prompts queued in ComfyUI
+    total = len(MISSING_CARDS)
+    print(f"\n[QUEUE] Submitting up to {depth} workflows at a time")
+    if candidates > 1:
+        print(f"[BATCH] {candidates} seeds per card, keeping the best-scoring image")
+    scheduler = GenerationScheduler(client, workflow_builder, game_assets, comfyui_output,
+                                    depth=depth, server_url="http://127.0.0.1:8188",
+                                    candidates=candidates, queue=queue, cache=cache)
+    results = await scheduler.run(MISSING_CARDS)
 
     # Summary
     print("\n" + "="*80)
     print("GENERATION COMPLETE!")
     print("="*80)
-    print(f"\n[SUCCESS] Successfully generated: {len(results)}/{total} images")
-    print(f"[FAILED] Failed: {total - len(results)} images")
+    skipped = len(scheduler.skipped)
+    print(f"\n[SUCCESS] Successfully generated: {len(results)}/{total - skipped} images")
+    print(f"[SKIPPED] Already generated: {skipped} images")
+    if cache is not None:
+        print(f"[CACHE] {cache.hits} hits, {cache.misses} misses (only misses used the GPU)")
+    print(f"[FAILED] Failed: {total - skipped - len(results)} images (rerun to retry or resume)")
 
     if results:
         print("\n[RESULTS] Generated images:")
         for i, result in enumerate(results, 1):
-            print(f"  {i}. {result['card']:15s} -> {result['filename']} ({result['time']:.1f}s)")
+            timing = "cached" if result.get("cached") else f"{result['time']:.1f}s"
+            print(f"  {i}. {result['card']:15s} -> {result['filename']} ({timing})")
 
         print(f"\n[LOCATION] All images saved to: {game_assets}")
         print("\n[DONE] Images are ready to use!")
-    else:
+    elif not skipped:
         print("\n[ERROR] No images were generated. Please check:")
         print("  - ComfyUI is running (http://127.0.0.1:8188)")
         print("  - Flux workflow exists at D:\\spec-kit\\backend\\workflows\\flux-text-to-image-shorts.json")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depth", type=int, default=3,
+                        help="number of workflows queued in ComfyUI at once")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="seeds generated per card in one batch; the best one is kept")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the saved queue state and regenerate every card")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always send workflows to ComfyUI, even when the same one was generated before")
+    args = parser.parse_args()
+    asyncio.run(main(depth=args.depth, candidates=args.candidates, restart=args.restart,
+                     use_cache=not args.no_cache))
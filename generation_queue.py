@@ -0,0 +1,121 @@
+"""
+Resumable on-disk job queue for card image generation
+卡片生成的工作佇列：每張卡的狀態寫在磁碟上，中斷後重跑會接續未完成的工作
+
+The queue is a JSON file next to the game assets. Each job is keyed by card
+name and stores:
+
+    card        卡片定義（name / color / prompt ...）
+    state       pending / submitted / done / failed
+    prompt_id   送進 ComfyUI 的 prompt（submitted 之後才有）
+    output      寫入遊戲素材目錄的圖片路徑（done 之後才有）
+    error       最後一次失敗的原因
+
+The file is rewritten after every state change, so a crash or timeout loses
+at most the job that was being written. On a rerun:
+    - done jobs whose output still exists are skipped
+    - submitted jobs are resumed by waiting on their prompt_id again
+    - pending and failed jobs are submitted
+A job whose prompt changed goes back to pending.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+
+QUEUE_NAME = ".generation_queue.json"
+
+PENDING = "pending"
+SUBMITTED = "submitted"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Card generation jobs persisted to a JSON file
+
+    Args:
+        path: 佇列檔案路徑，或放置佇列檔的目錄
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if path.is_dir():
+            path = path / QUEUE_NAME
+        self.path = path
+        self.jobs = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", {})
+
+    def add(self, cards, restart=False):
+        """
+        Register cards, keeping the saved state of any that are unchanged
+
+        Args:
+            cards: 卡片定義列表
+            restart: True 時所有卡片都回到 pending（強制重新生成）
+        """
+        for card in cards:
+            job = self.jobs.get(card["name"])
+            if job is None or restart or job["card"].get("prompt") != card.get("prompt"):
+                job = self._new_job(card)
+            job["card"] = dict(card)
+            self.jobs[card["name"]] = job
+        self.save()
+
+    @staticmethod
+    def _new_job(card):
+        return {"card": dict(card), "state": PENDING, "prompt_id": None,
+                "output": None, "error": None, "updated": None}
+
+    def state(self, name):
+        return self.jobs[name]["state"]
+
+    def prompt_id(self, name):
+        return self.jobs[name]["prompt_id"]
+
+    def is_done(self, name):
+        """完成且輸出檔仍在；輸出被刪除的卡片會重新生成"""
+        job = self.jobs.get(name)
+        return bool(job and job["state"] == DONE and job["output"] and Path(job["output"]).exists())
+
+    def in_flight(self, name):
+        """已送進 ComfyUI、還沒收回結果的工作"""
+        job = self.jobs.get(name)
+        return bool(job and job["state"] == SUBMITTED and job["prompt_id"])
+
+    def mark_submitted(self, name, prompt_id):
+        self._update(name, state=SUBMITTED, prompt_id=prompt_id, error=None)
+
+    def mark_done(self, name, output):
+        self._update(name, state=DONE, output=str(output), error=None)
+
+    def mark_failed(self, name, error):
+        # prompt_id 保留下來方便對照 ComfyUI 的 history
+        self._update(name, state=FAILED, error=str(error))
+
+    def reset(self, name):
+        """prompt 已不在 ComfyUI（例如伺服器重啟過）時改回 pending"""
+        self._update(name, state=PENDING, prompt_id=None)
+
+    def _update(self, name, **fields):
+        self.jobs[name].update(fields, updated=time.time())
+        self.save()
+
+    def counts(self):
+        """{state: 卡片數}"""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
+
+    def save(self):
+        """原子寫入佇列檔，避免中斷時留下半個檔案"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "jobs": self.jobs}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
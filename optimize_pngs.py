@@ -0,0 +1,253 @@
+"""
+Lossless PNG recompression across a process pool
+把卡片 PNG 以多種 zlib 策略重新壓縮、保留最小的一份；可選擇性地做調色盤量化
+
+    python optimize_pngs.py assets/cards --in-place
+    python optimize_pngs.py assets/cards --output-dir out --quantize --max-diff 6 --report sizes.json
+
+Lossless mode never changes a decoded pixel. Every candidate is decoded again
+and compared with the original before it is kept. Candidates are:
+    - zlib strategies 0-4 (Pillow ``compress_type``) at level 9, plus ``optimize``
+    - dropping an alpha channel that is opaque everywhere
+    - an exact palette when the image has at most 256 distinct RGBA colors
+
+``--quantize`` also tries a 256-color palette (flat origami art often looks
+identical). It is only kept when no visible channel moves by more than
+``--max-diff``.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from asset_cache import AssetManifest
+from batch_remove_background import collect_inputs
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CARDS_DIR = ROOT / "assets" / "cards"
+
+# zlib 策略：0 預設、1 FILTERED、2 HUFFMAN_ONLY、3 RLE、4 FIXED
+ZLIB_STRATEGIES = (0, 1, 2, 3, 4)
+LOSSLESS_MODES = ("RGB", "RGBA", "L", "LA", "P")
+
+
+def _encode(img, **options):
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", **options)
+    return buffer.getvalue()
+
+
+def _candidates(img, icc_profile):
+    """產生 (名稱, PNG bytes)；名稱描述模式與壓縮設定"""
+    extra = {"icc_profile": icc_profile} if icc_profile else {}
+    for strategy in ZLIB_STRATEGIES:
+        yield f"zlib{strategy}", _encode(img, compress_level=9, compress_type=strategy, **extra)
+    yield "optimize", _encode(img, optimize=True, **extra)
+
+
+def _rgba(img):
+    return np.asarray(img.convert("RGBA"))
+
+
+def _exact_palette(rgba):
+    """顏色數 <= 256 時建立完全無損的調色盤圖，否則回傳 None"""
+    flat = rgba.reshape(-1, 4)
+    colors, indices = np.unique(flat.view(np.uint32).ravel(), return_inverse=True)
+    if len(colors) > 256:
+        return None
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    img = Image.fromarray(indices.astype(np.uint8).reshape(rgba.shape[:2]), "P")
+    img.putpalette(palette[:, :3].tobytes(), "RGB")
+    if (palette[:, 3] < 255).any():
+        img.info["transparency"] = palette[:, 3].tobytes()
+    return img
+
+
+def _reductions(img):
+    """不改變任何像素的模式精簡"""
+    yield "same", img
+    if img.mode not in LOSSLESS_MODES:
+        return
+    rgba = _rgba(img)
+    if img.mode in ("RGBA", "LA") and (rgba[..., 3] == 255).all():
+        yield "drop-alpha", img.convert("RGB" if img.mode == "RGBA" else "L")
+    if img.mode != "P":
+        palette_img = _exact_palette(rgba)
+        if palette_img is not None:
+            yield "palette", palette_img
+
+
+def max_visible_diff(reference, candidate):
+    """可見像素的最大通道差；完全透明的像素只比較 alpha"""
+    ref = reference.astype(np.int16)
+    cand = candidate.astype(np.int16)
+    diff = np.abs(ref - cand)
+    hidden = (reference[..., 3] == 0) & (candidate[..., 3] == 0)
+    diff[hidden, :3] = 0
+    return int(diff.max()) if diff.size else 0
+
+
+def optimize_file(source_path, output_path, quantize=False, max_diff=8):
+    """
+    Recompress one PNG and write the smallest acceptable encoding
+
+    Runs inside a worker process. The output is only replaced when the
+    result is smaller; in-place writes go through a temp file + rename.
+
+    Returns:
+        dict with before/after bytes, the winning method and max pixel difference
+    """
+    start = time.perf_counter()
+    source_path, output_path = Path(source_path), Path(output_path)
+    result = {"file": source_path.name, "output": str(output_path), "error": None,
+              "before": source_path.stat().st_size}
+    try:
+        original_bytes = source_path.read_bytes()
+        with Image.open(io.BytesIO(original_bytes)) as img:
+            img.load()
+        icc_profile = img.info.get("icc_profile")
+        reference = _rgba(img)
+
+        best = ("original", original_bytes, 0)
+        for reduction, candidate_img in _reductions(img):
+            for setting, data in _candidates(candidate_img, icc_profile):
+                if len(data) < len(best[1]):
+                    best = (f"{reduction}/{setting}", data, 0)
+
+        # 無損候選也要重新解碼驗證，確保一個像素都沒變
+        if best[0] != "original":
+            with Image.open(io.BytesIO(best[1])) as check:
+                if not np.array_equal(_rgba(check), reference):
+                    raise ValueError(f"{best[0]} changed pixels")
+
+        if quantize and img.mode != "P":
+            quantized = img.convert("RGBA").quantize(256, method=Image.Quantize.FASTOCTREE,
+                                                     dither=Image.Dither.NONE)
+            data = min((d for _, d in _candidates(quantized, icc_profile)), key=len)
+            with Image.open(io.BytesIO(data)) as check:
+                diff = max_visible_diff(reference, _rgba(check))
+            result["quantize_diff"] = diff
+            if diff <= max_diff and len(data) < len(best[1]):
+                best = ("quantize", data, diff)
+
+        method, data, diff = best
+        if method == "original" and output_path == source_path:
+            result["after"] = result["before"]
+        else:
+            tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, output_path)
+            result["after"] = len(data)
+        result.update({"method": method, "max_diff": diff})
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+def run(files, output_dir=None, quantize=False, max_diff=8, workers=None):
+    """把每個檔案分給行程池，回傳結果列表（依檔名排序）"""
+    workers = workers or os.cpu_count() or 1
+    if output_dir is not None:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        futures = [
+            pool.submit(optimize_file, str(path),
+                        str(path if output_dir is None else Path(output_dir) / path.name),
+                        quantize, max_diff)
+            for path in files
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["error"]:
+                print(f"  [ERROR] {result['file']}: {result['error']}")
+            else:
+                print(f"  {result['file']:40s} {result['before'] / 1024:8.0f} KB -> "
+                      f"{result['after'] / 1024:8.0f} KB  {result['method']}")
+    return sorted(results, key=lambda r: r["file"])
+
+
+def print_report(results, elapsed):
+    ok = [r for r in results if not r["error"]]
+    before = sum(r["before"] for r in ok)
+    after = sum(r["after"] for r in ok)
+    methods = {}
+    for r in ok:
+        methods[r["method"].split("/")[0]] = methods.get(r["method"].split("/")[0], 0) + 1
+
+    print()
+    print("=" * 80)
+    print("PNG OPTIMIZATION COMPLETE!")
+    print("=" * 80)
+    print(f"[FILES] {len(ok)}/{len(results)} in {elapsed:.2f}s")
+    if before:
+        print(f"[BYTES] {before / 1024:.0f} KB -> {after / 1024:.0f} KB "
+              f"({after / before:.1%}, saved {(before - after) / 1024:.0f} KB)")
+    print("[METHODS] " + ", ".join(f"{k}: {v}" for k, v in sorted(methods.items())))
+    rejected = [r for r in ok if "quantize_diff" in r and r["method"] != "quantize"]
+    if rejected:
+        print(f"[QUANTIZE] kept lossless for {len(rejected)} file(s) "
+              f"(max diff {max(r['quantize_diff'] for r in rejected)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lossless PNG recompression across all CPU cores")
+    parser.add_argument("inputs", nargs="?", default=str(DEFAULT_CARDS_DIR),
+                        help="directory or glob pattern of PNG files")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", type=Path, help="write optimized files here")
+    output.add_argument("--in-place", action="store_true", help="replace the input files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--quantize", action="store_true",
+                        help="also try a 256-color palette (lossy, gated by --max-diff)")
+    parser.add_argument("--max-diff", type=int, default=8,
+                        help="largest per-channel change a quantized file may have")
+    parser.add_argument("--report", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    # 備份檔是備份庫的唯讀連結，不處理
+    files = collect_inputs(args.inputs)
+    if not files:
+        print(f"[ERROR] No PNG files matched: {args.inputs}")
+        return 1
+
+    print("=" * 80)
+    print(" " * 26 + "PNG OPTIMIZATION")
+    print("=" * 80)
+    print(f"[INPUT] {len(files)} files   [WORKERS] {args.workers}   "
+          f"[QUANTIZE] {'max diff ' + str(args.max_diff) if args.quantize else 'off'}")
+
+    # 原地改寫去背輸出時要同步更新 manifest，否則會被當成「換了新圖」
+    manifest = AssetManifest(files[0].parent) if args.in_place else None
+    tracked = [f for f in files if manifest and manifest.output_entry(f) is not None]
+
+    start = time.perf_counter()
+    results = run(files, None if args.in_place else args.output_dir,
+                  args.quantize, args.max_diff, args.workers)
+    elapsed = time.perf_counter() - start
+
+    if manifest is not None and tracked:
+        for path in tracked:
+            manifest.refresh_output(path)
+        manifest.save()
+
+    print_report(results, elapsed)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Long-lived rembg inference worker
+常駐的 rembg 推論 worker：模型只載入一次，之後持續從佇列接收圖片
+
+The worker can run inside a script (RembgWorker) or as a separate server
+process that keeps the ONNX session warm between script runs:
+
+    python rembg_worker.py serve --threads 4
+    python rembg_worker.py run assets/cards/sailor_origami.png
+
+remove_files() talks to a running server when there is one and falls back
+to an in-process worker otherwise.
+
+Every mask the model computes is saved in the ``.mask_cache`` directory next
+to the source image (asset_cache.MaskCache). Running the same art through
+the same model again only composites the cached mask, and the model is not
+even loaded when every image hits the cache.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+
+DEFAULT_MODEL = "u2net"
+DEFAULT_ADDRESS = ("127.0.0.1", 6010)
+AUTHKEY = b"sea-salt-paper-rembg"
+
+
+class RembgWorker:
+    """
+    Hold one rembg session and run images through it from a queue
+
+    Args:
+        model_name: rembg 模型名稱
+        intra_op_threads: ONNX Runtime 每個運算子使用的執行緒數，None 表示預設
+        use_mask_cache: remove_file() 是否讀寫來源旁的 mask 快取
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, intra_op_threads=None, use_mask_cache=True):
+        self.model_name = model_name
+        self.intra_op_threads = intra_op_threads
+        self.use_mask_cache = use_mask_cache
+        self.session = None
+        self.load_time = None
+        self.latencies = []
+        self.mask_hits = 0
+        self.mask_misses = 0
+        self._mask_caches = {}
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def load(self):
+        """載入模型並做一次暖機推論，回傳耗時（秒）"""
+        if self.session is not None:
+            return self.load_time
+
+        from PIL import Image
+        from rembg import new_session, remove
+
+        start = time.perf_counter()
+        # rembg 從 OMP_NUM_THREADS 設定 SessionOptions 的執行緒數
+        previous = os.environ.get("OMP_NUM_THREADS")
+        if self.intra_op_threads:
+            os.environ["OMP_NUM_THREADS"] = str(self.intra_op_threads)
+        try:
+            self.session = new_session(self.model_name, providers=["CPUExecutionProvider"])
+        finally:
+            if self.intra_op_threads:
+                if previous is None:
+                    os.environ.pop("OMP_NUM_THREADS", None)
+                else:
+                    os.environ["OMP_NUM_THREADS"] = previous
+
+        # 第一次推論會配置 ONNX 記憶體，算在載入時間內
+        remove(Image.new("RGB", (64, 64), "white"), session=self.session)
+        self.load_time = time.perf_counter() - start
+        return self.load_time
+
+    def mask(self, image):
+        """對單張 PIL 圖片推論 alpha mask（(H, W) uint8），並記錄推論延遲"""
+        import numpy as np
+        from rembg import remove
+
+        self.load()
+        start = time.perf_counter()
+        mask = remove(image, session=self.session, only_mask=True)
+        self.latencies.append(time.perf_counter() - start)
+        return np.asarray(mask.convert("L"))
+
+    def remove(self, image):
+        """對單張 PIL 圖片去背（不使用快取）"""
+        return composite(image, self.mask(image))
+
+    def _mask_cache_for(self, input_path):
+        from asset_cache import MaskCache
+
+        directory = Path(input_path).resolve().parent
+        if directory not in self._mask_caches:
+            self._mask_caches[directory] = MaskCache.beside(input_path)
+        return self._mask_caches[directory]
+
+    def remove_file(self, input_path, output_path):
+        """讀取、去背並寫出一個檔案，回傳結果 dict（cached 表示沿用了快取的 mask）"""
+        from PIL import Image
+
+        start = time.perf_counter()
+        error = None
+        hit = False
+        try:
+            with Image.open(input_path) as image:
+                if self.use_mask_cache:
+                    mask, hit = self._mask_cache_for(input_path).get_or_compute(
+                        image, self.model_name, lambda: self.mask(image))
+                    if hit:
+                        self.mask_hits += 1
+                    else:
+                        self.mask_misses += 1
+                else:
+                    mask = self.mask(image)
+                composite(image, mask).save(output_path, "PNG")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return {
+            "input": str(input_path),
+            "output": str(output_path),
+            "time": time.perf_counter() - start,
+            "error": error,
+            "cached": hit,
+        }
+
+    def start(self):
+        """啟動背景執行緒，開始消化佇列（模型在第一次快取未命中時才載入）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, input_path, output_path):
+        """把一張圖片排進佇列，回傳會得到結果 dict 的 Future"""
+        self.start()
+        future = Future()
+        self._queue.put((input_path, output_path, future))
+        return future
+
+    def process(self, jobs):
+        """依序處理 (input_path, output_path) 列表，回傳結果列表"""
+        futures = [self.submit(i, o) for i, o in jobs]
+        return [f.result() for f in futures]
+
+    def close(self):
+        """等待佇列清空並停止背景執行緒"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            input_path, output_path, future = item
+            future.set_result(self.remove_file(input_path, output_path))
+
+    def stats(self):
+        """模型載入時間與每張圖片的延遲統計"""
+        times = sorted(self.latencies)
+        return {
+            "model": self.model_name,
+            "intra_op_threads": self.intra_op_threads,
+            "load_time": self.load_time,
+            "images": len(times),
+            "mask_hits": self.mask_hits,
+            "mask_misses": self.mask_misses,
+            "mean_latency": sum(times) / len(times) if times else None,
+            "max_latency": times[-1] if times else None,
+        }
+
+
+def composite(image, mask):
+    """
+    Apply an alpha mask to the source image
+
+    RGB stays the original (straight alpha) instead of rembg's cutout, which
+    blends edge pixels toward black.
+    """
+    from PIL import Image
+
+    rgba = image.convert("RGBA")
+    rgba.putalpha(Image.fromarray(mask, "L"))
+    return rgba
+
+
+def serve(worker, address=DEFAULT_ADDRESS):
+    """
+    Keep the model loaded and answer job lists from other processes
+
+    Each connection sends a list of (input_path, output_path) pairs and
+    receives the result dicts plus the worker stats.
+    """
+    print(f"[LOAD] Loading rembg model '{worker.model_name}'...")
+    load_time = worker.load()
+    print(f"[OK] Model loaded in {load_time:.2f}s")
+
+    with Listener(address, authkey=AUTHKEY) as listener:
+        print(f"[SERVE] Listening on {address[0]}:{address[1]} (Ctrl+C to stop)")
+        while True:
+            # 單一連線出錯（用戶端中斷、金鑰不符、處理失敗）不能讓常駐 server 結束
+            try:
+                with listener.accept() as conn:
+                    jobs = conn.recv()
+                    results = worker.process(jobs)
+                    conn.send({"results": results, "stats": worker.stats()})
+                    print(f"[DONE] {len(results)} image(s), "
+                          f"{sum(1 for r in results if r['error'])} failed")
+            except Exception as e:
+                print(f"[ERROR] Connection failed: {type(e).__name__}: {e}")
+
+
+def process_remote(jobs, address=DEFAULT_ADDRESS):
+    """把工作送給執行中的 serve()；沒有 server 時拋出 ConnectionRefusedError"""
+    # server 的工作目錄不一定和這裡相同，一律送絕對路徑
+    with Client(address, authkey=AUTHKEY) as conn:
+        conn.send([(str(Path(i).resolve()), str(Path(o).resolve())) for i, o in jobs])
+        return conn.recv()
+
+
+def remove_files(jobs, model_name=DEFAULT_MODEL, intra_op_threads=None, address=DEFAULT_ADDRESS):
+    """
+    Remove backgrounds for (input_path, output_path) pairs
+
+    Uses a warm server process when one is listening on ``address``;
+    otherwise loads the model once in this process.
+
+    Returns:
+        dict with "results" (list of result dicts) and "stats"
+    """
+    jobs = list(jobs)
+    try:
+        reply = process_remote(jobs, address)
+        reply["stats"]["server"] = True
+        return reply
+    except (OSError, AuthenticationError):
+        pass
+
+    worker = RembgWorker(model_name, intra_op_threads=intra_op_threads)
+    try:
+        results = worker.process(jobs)
+    finally:
+        worker.close()
+    stats = worker.stats()
+    stats["server"] = False
+    return {"results": results, "stats": stats}
+
+
+def print_stats(stats):
+    """印出模型載入時間與推論延遲"""
+    source = "warm server" if stats.get("server") else "in-process"
+    threads = stats["intra_op_threads"] or "default"
+    print(f"[MODEL] {stats['model']} ({source}, intra-op threads: {threads})")
+    if stats["load_time"] is not None:
+        print(f"[LOAD] Model load + warm-up: {stats['load_time']:.2f}s")
+    if stats.get("mask_hits"):
+        print(f"[MASK CACHE] {stats['mask_hits']} hit(s), {stats['mask_misses']} miss(es) "
+              f"- inference skipped for cached masks")
+    if stats["images"]:
+        print(f"[LATENCY] {stats['images']} image(s), mean {stats['mean_latency']:.2f}s, "
+              f"max {stats['max_latency']:.2f}s per image")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived rembg inference worker")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="ONNX Runtime intra-op thread count")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="load the model once and wait for jobs")
+    run = sub.add_parser("run", help="remove backgrounds in place")
+    run.add_argument("files", nargs="+", type=Path)
+    args = parser.parse_args(argv)
+
+    address = (DEFAULT_ADDRESS[0], args.port)
+    if args.command == "serve":
+        try:
+            serve(RembgWorker(args.model, intra_op_threads=args.threads), address)
+        except KeyboardInterrupt:
+            print("\n[STOP] Worker stopped")
+        return 0
+
+    reply = remove_files([(f, f) for f in args.files], args.model, args.threads, address)
+    for result in reply["results"]:
+        status = f"ERROR {result['error']}" if result["error"] else "OK"
+        print(f"  {Path(result['input']).name:40s} {result['time']:6.2f}s {status}")
+    print_stats(reply["stats"])
+    return 1 if any(r["error"] for r in reply["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
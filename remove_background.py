@@ -3,48 +3,81 @@ Remove white background from origami card images
 將origami卡片圖片的白色背景移除，改為透明
 """
 from PIL import Image
+import numpy as np
 import os
 from pathlib import Path
 
-def remove_white_background(image_path, output_path, threshold=240):
+from asset_cache import AssetManifest
+from backup_store import backup_original
+from auto_threshold import resolve_threshold
+
+def key_white_background(rgba, threshold=240, softness=0):
+    """
+    Key out the white background of an RGBA array in place
+
+    Pixels whose R, G and B are all above ``threshold`` become fully
+    transparent, exactly like the original per-pixel loop. With ``softness``
+    > 0, pixels whose darkest channel is within ``softness`` levels below the
+    threshold get a linear alpha ramp instead of a hard 0/255 cut.
+
+    ``threshold`` may also be "otsu" or "valley" to pick it per image from
+    the histogram of the darkest channel (see auto_threshold.py).
+
+    Args:
+        rgba: (H, W, 4) uint8 陣列，會被直接修改
+        threshold: 白色閾值（0-255）或自動方法名稱，高於此值的像素會變透明
+        softness: 閾值以下的漸層寬度，0 表示硬切
+
+    Returns:
+        The same ``rgba`` array
+    """
+    # RGB 三個通道都大於閾值 <=> 最暗的通道大於閾值
+    darkest = np.minimum(np.minimum(rgba[..., 0], rgba[..., 1]), rgba[..., 2])
+    threshold = resolve_threshold(darkest, threshold)
+    background = darkest > threshold
+
+    if softness > 0:
+        # 漸層區：threshold - softness < darkest <= threshold
+        ramp = ~background & (darkest > threshold - softness)
+        # 在閾值上 alpha 最低，離閾值 softness 以上則完全不透明
+        scale = (threshold + 1 - darkest[ramp].astype(np.uint16)) * 255 // (softness + 1)
+        alpha = rgba[..., 3]
+        alpha[ramp] = (alpha[ramp].astype(np.uint16) * scale // 255).astype(np.uint8)
+
+    # 將白色變為完全透明
+    rgba[background] = (255, 255, 255, 0)
+    return rgba
+
+
+def remove_white_background(image_path, output_path, threshold=240, softness=0):
     """
     Remove white background from an image and make it transparent
 
     Args:
         image_path: 輸入圖片路徑
         output_path: 輸出圖片路徑
-        threshold: 白色閾值（0-255），高於此值的像素會變透明
+        threshold: 白色閾值（0-255），或 "otsu" / "valley" 每張圖自動決定
+        softness: 閾值以下的 alpha 漸層寬度（0 = 硬切）
     """
     print(f"Processing: {image_path}")
 
-    # 打開圖片並轉換為RGBA模式
+    # 打開圖片並轉換為RGBA模式，複製成可寫入的陣列
     img = Image.open(image_path)
-    img = img.convert("RGBA")
-
-    # 獲取圖片數據
-    datas = img.getdata()
+    rgba = np.array(img.convert("RGBA"))
 
-    new_data = []
-    for item in datas:
-        # item是(R, G, B, A)
-        # 如果RGB都很接近白色，則設為透明
-        if item[0] > threshold and item[1] > threshold and item[2] > threshold:
-            # 將白色變為完全透明
-            new_data.append((255, 255, 255, 0))
-        else:
-            # 保持原色
-            new_data.append(item)
-
-    # 更新圖片數據
-    img.putdata(new_data)
+    key_white_background(rgba, threshold=threshold, softness=softness)
 
     # 保存為PNG（支持透明）
-    img.save(output_path, "PNG")
+    Image.fromarray(rgba, "RGBA").save(output_path, "PNG")
     print(f"Saved: {output_path}")
 
 
-def process_all_cards():
-    """批次處理所有卡片圖片"""
+def process_all_cards(force=False, threshold=240):
+    """
+    批次處理所有卡片圖片（force=True 時忽略快取全部重做）
+
+    threshold 可為 "otsu" / "valley"，每張卡片各自從直方圖決定閾值
+    """
     # 圖片目錄
     cards_dir = Path("D:/claude-mode/board-game-sea-salt-paper/assets/cards")
 
@@ -69,7 +102,10 @@ def process_all_cards():
     print("=" * 80)
     print()
 
+    manifest = AssetManifest(cards_dir)
+    params = {"threshold": threshold, "softness": 16}
     success_count = 0
+    skipped_count = 0
 
     for card_file in card_files:
         input_path = cards_dir / card_file
@@ -81,39 +117,51 @@ def process_all_cards():
         # 輸出路徑（覆蓋原檔案）
         output_path = input_path
 
-        # 也可以先備份原檔案
+        # 原圖保存在備份檔，一律從備份去背
         backup_filename = card_file.replace(".png", "_backup.png")
         backup_path = cards_dir / backup_filename
-        if not backup_path.exists():
-            print(f"[BACKUP] Creating backup: {backup_path}")
-            img_backup = Image.open(input_path)
-            img_backup.save(backup_path, "PNG")
+        source_path = manifest.card_source(input_path, backup_path)
+        if source_path == input_path:
+            # 第一次處理或卡片換了新圖：更新備份
+            method = backup_original(input_path, backup_path)
+            print(f"[BACKUP] Creating backup: {backup_path} ({method})")
+            source_path = backup_path
+
+        if not force and manifest.is_fresh(source_path, output_path, "pil", params):
+            print(f"[CACHED] Unchanged: {card_file}")
+            skipped_count += 1
+            continue
 
         try:
-            remove_white_background(input_path, output_path, threshold=240)
+            remove_white_background(source_path, output_path, **params)
+            manifest.record(source_path, output_path, "pil", params)
             success_count += 1
         except Exception as e:
             print(f"[ERROR] Failed to process {card_file}: {e}")
 
+    manifest.save()
+
     print()
     print("=" * 80)
     print("PROCESSING COMPLETE!")
     print("=" * 80)
     print(f"[SUCCESS] Processed: {success_count}/{len(card_files)} images")
-    print(f"[BACKUP] Original files saved with _backup.png extension")
+    print(f"[CACHED] Unchanged, skipped: {skipped_count}")
+    print(f"[BACKUP] Originals kept in .originals (linked as _backup.png)")
     print(f"[LOCATION] {cards_dir}")
     print()
     print("All images now have transparent backgrounds!")
 
 
 if __name__ == "__main__":
-    # 確認Pillow已安裝
+    # 確認Pillow與NumPy已安裝
     try:
         from PIL import Image
-        print("[OK] Pillow is installed")
+        import numpy
+        print("[OK] Pillow and NumPy are installed")
     except ImportError:
-        print("[ERROR] Pillow not installed. Please run:")
-        print("  pip install Pillow")
+        print("[ERROR] Pillow or NumPy not installed. Please run:")
+        print("  pip install Pillow numpy")
         exit(1)
 
     process_all_cards()
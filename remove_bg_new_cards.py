@@ -2,10 +2,12 @@
 AI-based background removal for new cards using rembg
 """
 from pathlib import Path
-from rembg import remove
-from PIL import Image
 
-def remove_background_with_ai():
+from asset_cache import AssetManifest
+from backup_store import backup_original
+from rembg_worker import DEFAULT_MODEL, print_stats, remove_files
+
+def remove_background_with_ai(intra_op_threads=None, force=False):
     """使用 rembg AI 模型去背新卡片"""
     cards_dir = Path("D:/claude-mode/board-game-sea-salt-paper/assets/cards")
 
@@ -21,7 +23,10 @@ def remove_background_with_ai():
     print("="*80)
     print()
 
-    success_count = 0
+    manifest = AssetManifest(cards_dir)
+    params = {"model": DEFAULT_MODEL}
+    skipped_count = 0
+    jobs = []
 
     for i, card_file in enumerate(new_card_files, 1):
         input_path = cards_dir / card_file
@@ -30,44 +35,48 @@ def remove_background_with_ai():
             print(f"[{i}/{len(new_card_files)}] SKIP: {card_file} - File not found")
             continue
 
-        # 備份原圖
+        # 備份原圖；卡片換了新圖時更新備份
         backup_file = card_file.replace(".png", "_before_rembg.png")
         backup_path = cards_dir / backup_file
-        if not backup_path.exists():
-            import shutil
-            shutil.copy2(input_path, backup_path)
+        source_path = manifest.card_source(input_path, backup_path)
+        if source_path == input_path:
+            backup_original(input_path, backup_path)
             print(f"  [BACKUP] Created: {backup_file}")
+            source_path = backup_path
 
+        # 一律從備份的原圖去背，避免對已去背的圖片再跑一次模型
         output_path = cards_dir / card_file
+        if not force and manifest.is_fresh(source_path, output_path, "rembg", params):
+            print(f"[{i}/{len(new_card_files)}] CACHED: {card_file} - Unchanged")
+            skipped_count += 1
+            continue
+        jobs.append((source_path, output_path))
 
-        print(f"[{i}/{len(new_card_files)}] Processing: {card_file}")
-        print(f"  Input:  {input_path}")
-        print(f"  Output: {output_path}")
-
-        try:
-            # 讀取圖片
-            input_image = Image.open(input_path)
-
-            # AI 去背
-            print("  [AI] Removing background with AI model...")
-            output_image = remove(input_image)
+    # 模型只載入一次（若有常駐的 rembg_worker.py serve 則直接使用）
+    print(f"[AI] Removing background from {len(jobs)} image(s) with AI model...")
+    reply = remove_files(jobs, intra_op_threads=intra_op_threads) if jobs else {"results": [], "stats": None}
 
-            # 保存
-            output_image.save(output_path, "PNG")
+    success_count = 0
+    for i, result in enumerate(reply["results"], 1):
+        print(f"[{i}/{len(jobs)}] {Path(result['output']).name} ({result['time']:.2f}s)")
+        if result["error"]:
+            print(f"  [ERROR] Failed: {result['error']}")
+        else:
             print(f"  [SUCCESS] Saved with transparent background!")
+            manifest.record(result["input"], result["output"], "rembg", params)
             success_count += 1
+    manifest.save()
 
-        except Exception as e:
-            print(f"  [ERROR] Failed: {e}")
-            import traceback
-            traceback.print_exc()
-
+    if reply["stats"]:
         print()
+        print_stats(reply["stats"])
+    print()
 
     print("="*80)
     print("AI BACKGROUND REMOVAL COMPLETE!")
     print("="*80)
     print(f"[SUCCESS] Processed: {success_count}/{len(new_card_files)} images")
+    print(f"[CACHED] Unchanged, skipped: {skipped_count}")
     print(f"[METHOD] Used rembg AI model for professional background removal")
     print(f"[LOCATION] {cards_dir}")
     print()
@@ -7,42 +7,120 @@ import numpy as np
 from pathlib import Path
 from PIL import Image
 
-def remove_white_background_opencv(input_path, output_path):
+from asset_cache import AssetManifest
+from backup_store import backup_original
+from auto_threshold import resolve_threshold
+
+class OpenCVKeyer:
     """
-    使用 OpenCV 移除白色背景
+    Reusable OpenCV keying pipeline
+
+    灰度、閾值、形態學與 alpha 羽化都寫進預先配置好的緩衝區，kernel 也只建立一次；
+    同尺寸的圖片連續處理時，除了解碼之外不會再配置新的陣列。
+
+    原本的 close x2 + open x1（3x3）等同於 dilate 5x5 -> erode 7x7 -> dilate 3x3，
+    六次掃描合併成三次。
 
     Args:
-        input_path: 輸入圖片路徑
-        output_path: 輸出圖片路徑
+        threshold: 灰度高於此值的像素視為白色背景；"otsu" / "valley" 則每張圖
+            從灰度直方圖自動決定（實際使用的值記在 last_threshold）
+        feather: 羽化寬度（像素）；> 0 時以距離轉換讓 alpha 從邊緣往內漸變到 255
     """
-    # 讀取圖片
-    img = cv2.imread(str(input_path))
 
-    # 轉換為灰度圖
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def __init__(self, threshold=240, feather=0):
+        self.threshold = threshold
+        self.feather = feather
+        self.last_threshold = None
+        self._dilate_close = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        self._erode_fused = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+        self._dilate_open = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._shape = None
+
+    def _allocate(self, shape):
+        if shape == self._shape:
+            return
+        height, width = shape
+        self.gray = np.empty((height, width), np.uint8)
+        self.mask = np.empty((height, width), np.uint8)
+        self.scratch = np.empty((height, width), np.uint8)
+        self.distance = np.empty((height, width), np.float32) if self.feather > 0 else None
+        self.output = np.empty((height, width, 4), np.uint8)
+        self._shape = shape
+
+    def mask_of(self, bgr):
+        """
+        Foreground mask of a BGR image (255 = card, 0 = background)
+
+        回傳內部緩衝區，下一次呼叫會覆寫；要保留請自行 copy()。
+        """
+        self._allocate(bgr.shape[:2])
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        self.last_threshold = resolve_threshold(self.gray, self.threshold)
+        cv2.threshold(self.gray, self.last_threshold, 255, cv2.THRESH_BINARY_INV, dst=self.mask)
+        cv2.dilate(self.mask, self._dilate_close, dst=self.scratch)
+        cv2.erode(self.scratch, self._erode_fused, dst=self.mask)
+        cv2.dilate(self.mask, self._dilate_open, dst=self.scratch)
+        self.mask, self.scratch = self.scratch, self.mask
+
+        if self.feather > 0:
+            # 到最近背景像素的距離 * (255 / feather)，convertScaleAbs 會飽和在 255
+            cv2.distanceTransform(self.mask, cv2.DIST_L2, 3, dst=self.distance)
+            cv2.convertScaleAbs(self.distance, dst=self.mask, alpha=255.0 / self.feather)
+        return self.mask
+
+    def key(self, bgr):
+        """
+        Key one BGR image and return it as BGRA
+
+        回傳內部緩衝區，下一次呼叫會覆寫。
+        """
+        alpha = self.mask_of(bgr)
+        # cvtColor 一次寫完 BGR + 不透明 alpha，比 split/merge 快一個數量級
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA, dst=self.output)
+        self.output[..., 3] = alpha
+        return self.output
+
+    def key_file(self, input_path, output_path):
+        """讀檔、去背並寫出 PNG（支持透明）"""
+        img = cv2.imread(str(input_path), cv2.IMREAD_COLOR)
+        if img is None:
+            raise FileNotFoundError(f"Cannot read image: {input_path}")
+        cv2.imwrite(str(output_path), self.key(img))
+        return output_path
+
+
+def white_background_mask_opencv(img, threshold=240):
+    """
+    計算前景 mask（前景 255、白色背景 0）
+
+    Args:
+        img: cv2.imread 讀入的 BGR 圖片
+        threshold: 灰度高於此值的像素視為白色背景
+    """
+    return OpenCVKeyer(threshold).mask_of(img)
 
-    # 創建mask：將接近白色的部分標記為背景
-    # 閾值設為240，任何灰度值大於240的像素都視為白色背景
-    _, mask = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
 
-    # 進行形態學操作來清理mask
-    kernel = np.ones((3,3), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+def remove_white_background_opencv(input_path, output_path, threshold=240, feather=0):
+    """
+    使用 OpenCV 移除白色背景
 
-    # 將圖片轉換為RGBA
-    b, g, r = cv2.split(img)
-    rgba = [r, g, b, mask]
-    output_img = cv2.merge(rgba)
+    Args:
+        input_path: 輸入圖片路徑
+        output_path: 輸出圖片路徑
+        threshold: 灰度高於此值的像素視為白色背景，或 "otsu" / "valley"
+        feather: alpha 羽化寬度（像素），0 為硬邊
 
-    # 保存為PNG（支持透明）
-    cv2.imwrite(str(output_path), output_img)
+    批次處理請直接重複使用同一個 OpenCVKeyer。
+    """
+    return OpenCVKeyer(threshold, feather).key_file(input_path, output_path)
 
-    return output_path
 
+def process_all_cards(force=False, feather=0, threshold=240):
+    """
+    批次處理所有卡片（force=True 時忽略快取全部重做）
 
-def process_all_cards():
-    """批次處理所有卡片"""
+    feather 為 alpha 羽化寬度；threshold 可為 "otsu" / "valley" 每張自動決定
+    """
     cards_dir = Path("D:/claude-mode/board-game-sea-salt-paper/assets/cards")
 
     card_files = [
@@ -65,24 +143,42 @@ def process_all_cards():
     print("=" * 80)
     print()
 
+    manifest = AssetManifest(cards_dir)
+    params = {"threshold": threshold, "feather": feather}
+    keyer = OpenCVKeyer(threshold=threshold, feather=feather)
     success_count = 0
+    skipped_count = 0
 
     for i, card_file in enumerate(card_files, 1):
         # 使用backup作為輸入（原始圖片）
         backup_file = card_file.replace(".png", "_backup.png")
         input_path = cards_dir / backup_file
+        output_path = cards_dir / card_file
+
+        # 卡片換了新圖（或還沒有backup）時，先用新圖更新backup
+        if output_path.exists():
+            source_path = manifest.card_source(output_path, input_path)
+            if source_path == output_path:
+                backup_original(output_path, input_path)
+                print(f"[{i}/{len(card_files)}] BACKUP: {card_file} -> {backup_file}")
+            else:
+                # 備份可能是其他後端留下的（例如 _before_rembg.png）
+                input_path = source_path
 
         # 如果沒有backup，跳過
         if not input_path.exists():
             print(f"[{i}/{len(card_files)}] SKIP: {card_file} - No backup found")
             continue
 
-        output_path = cards_dir / card_file
+        if not force and manifest.is_fresh(input_path, output_path, "opencv", params):
+            print(f"[{i}/{len(card_files)}] CACHED: {card_file} - Unchanged")
+            skipped_count += 1
+            continue
 
         print(f"[{i}/{len(card_files)}] Processing: {card_file}")
 
         try:
-            remove_white_background_opencv(input_path, output_path)
+            keyer.key_file(input_path, output_path)
 
             # 驗證輸出
             if output_path.exists():
@@ -90,6 +186,7 @@ def process_all_cards():
                 img = Image.open(output_path)
                 if img.mode == 'RGBA':
                     print(f"  [SUCCESS] Transparent background created!")
+                    manifest.record(input_path, output_path, "opencv", params)
                     success_count += 1
                 else:
                     print(f"  [WARNING] Image saved but may not have transparency")
@@ -101,11 +198,14 @@ def process_all_cards():
             import traceback
             traceback.print_exc()
 
+    manifest.save()
+
     print()
     print("=" * 80)
     print("BACKGROUND REMOVAL COMPLETE!")
     print("=" * 80)
     print(f"[SUCCESS] Processed: {success_count}/{len(card_files)} images")
+    print(f"[CACHED] Unchanged, skipped: {skipped_count}")
     print(f"[METHOD] OpenCV threshold-based background removal")
     print(f"[LOCATION] {cards_dir}")
     print()
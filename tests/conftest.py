@@ -0,0 +1,5 @@
+"""pytest setup for the Python asset scripts at the repository root"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
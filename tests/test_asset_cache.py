@@ -0,0 +1,100 @@
+"""
+AssetManifest.card_source / plan_jobs when the in-place backend changes
+換後端時備份檔名不同（_backup.png / _before_rembg.png），不能規劃出來源不存在的工作
+"""
+import numpy as np
+from PIL import Image
+
+from asset_cache import AssetManifest
+from batch_remove_background import backend_params, plan_jobs
+
+
+def _write_art(path, value):
+    Image.fromarray(np.full((16, 8, 3), value, dtype=np.uint8), "RGB").save(path)
+
+
+def _key_in_place_with_pil(cards_dir):
+    """模擬 --backend pil 原地去背：原圖在 _backup.png，卡片是輸出"""
+    card = cards_dir / "fish_origami.png"
+    backup = cards_dir / "fish_origami_backup.png"
+    _write_art(backup, 200)
+    Image.fromarray(np.zeros((16, 8, 4), dtype=np.uint8), "RGBA").save(card)
+
+    manifest = AssetManifest(cards_dir)
+    manifest.record(backup, card, "pil", backend_params("pil", 240, 16))
+    manifest.save()
+    return card, backup
+
+
+def test_card_source_falls_back_to_recorded_source(tmp_path):
+    card, backup = _key_in_place_with_pil(tmp_path)
+    manifest = AssetManifest(tmp_path)
+
+    missing = tmp_path / "fish_origami_before_rembg.png"
+    assert manifest.card_source(card, missing) == backup
+
+
+def test_card_source_falls_back_to_alternates(tmp_path):
+    card, backup = _key_in_place_with_pil(tmp_path)
+    manifest = AssetManifest(tmp_path)
+    # 記錄的來源不在了，仍可用另一個後端的備份
+    manifest.entries[manifest._key(card)]["source"] = "gone.png"
+
+    missing = tmp_path / "fish_origami_before_rembg.png"
+    assert manifest.card_source(card, missing, [missing, backup]) == backup
+
+
+def test_switching_backend_plans_job_from_existing_backup(tmp_path):
+    card, backup = _key_in_place_with_pil(tmp_path)
+    manifest = AssetManifest(tmp_path)
+
+    jobs, skipped = plan_jobs([card], "rembg", None, manifest, {"model": "u2net"})
+
+    assert skipped == []
+    assert jobs == [(backup, card)]
+    assert not (tmp_path / "fish_origami_before_rembg.png").exists()
+
+
+def test_new_art_still_refreshes_the_backend_backup(tmp_path):
+    card, backup = _key_in_place_with_pil(tmp_path)
+    _write_art(card, 50)
+    manifest = AssetManifest(tmp_path)
+
+    jobs, _ = plan_jobs([card], "rembg", None, manifest, {"model": "u2net"})
+
+    before_rembg = tmp_path / "fish_origami_before_rembg.png"
+    assert jobs == [(before_rembg, card)]
+    assert before_rembg.exists()
+
+
+def _write_keyed(path, value):
+    """已去背的卡片：上半部保留原圖顏色，下半部透明"""
+    pixels = np.full((16, 8, 4), value, dtype=np.uint8)
+    pixels[..., 3] = 255
+    pixels[8:, :, 3] = 0
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+def test_card_source_without_entry_picks_matching_original(tmp_path):
+    card = tmp_path / "fish_origami.png"
+    backup = tmp_path / "fish_origami_backup.png"
+    before_rembg = tmp_path / "fish_origami_before_rembg.png"
+    _write_keyed(card, 120)
+    _write_art(backup, 30)
+    _write_art(before_rembg, 120)
+    manifest = AssetManifest(tmp_path)
+
+    # 沒有記錄時不能因為 _backup.png 存在就拿較舊的圖
+    assert manifest.card_source(card, backup) == before_rembg
+
+
+def test_keyed_card_without_original_is_not_backed_up(tmp_path):
+    card = tmp_path / "fish_origami.png"
+    _write_keyed(card, 120)
+    manifest = AssetManifest(tmp_path)
+
+    jobs, _ = plan_jobs([card], "pil", None, manifest, {"threshold": 240})
+
+    backup = tmp_path / "fish_origami_backup.png"
+    assert jobs == [(backup, card)]
+    assert not backup.exists()
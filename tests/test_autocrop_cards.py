@@ -0,0 +1,34 @@
+"""
+In-place auto-crop keeps the keying manifest in sync
+原地裁切後重新去背不能把裁過的卡片當成新圖、覆蓋掉原圖備份
+"""
+import numpy as np
+from PIL import Image
+
+from asset_cache import AssetManifest, hash_file
+from autocrop_cards import crop_cards
+from batch_remove_background import backend_params, plan_jobs
+
+
+def test_in_place_crop_refreshes_keying_manifest(tmp_path):
+    card = tmp_path / "fish_origami.png"
+    backup = tmp_path / "fish_origami_backup.png"
+    Image.fromarray(np.full((64, 32, 3), 200, dtype=np.uint8), "RGB").save(backup)
+    keyed = np.zeros((64, 32, 4), dtype=np.uint8)
+    keyed[20:40, 10:20] = 255
+    Image.fromarray(keyed, "RGBA").save(card)
+
+    params = backend_params("pil", 240, 16)
+    manifest = AssetManifest(tmp_path)
+    manifest.record(backup, card, "pil", params)
+    manifest.save()
+    backup_hash = hash_file(backup)
+
+    crop_cards([card], output_dir=None, padding=2)
+    assert Image.open(card).size == (14, 24)
+
+    jobs, skipped = plan_jobs([card], "pil", None, AssetManifest(tmp_path), params)
+
+    assert jobs == []
+    assert skipped == [(backup, card)]
+    assert hash_file(backup) == backup_hash
@@ -0,0 +1,26 @@
+"""
+collect_inputs: directories skip backup variants, explicit patterns do not
+目錄模式略過備份檔；使用者寫出的 glob 照單全收
+"""
+from batch_remove_background import collect_inputs
+
+
+def _touch(directory, *names):
+    for name in names:
+        (directory / name).write_bytes(b"")
+
+
+def test_directory_skips_variants(tmp_path):
+    _touch(tmp_path, "crab.png", "crab_backup.png", "crab_before_rembg.png")
+
+    assert collect_inputs(str(tmp_path)) == [tmp_path / "crab.png"]
+    assert len(collect_inputs(str(tmp_path), include_variants=True)) == 3
+
+
+def test_glob_pattern_is_honored(tmp_path):
+    _touch(tmp_path, "crab.png", "crab_backup.png", "fish_backup.png")
+
+    assert collect_inputs(str(tmp_path / "*_backup.png")) == [
+        tmp_path / "crab_backup.png",
+        tmp_path / "fish_backup.png",
+    ]
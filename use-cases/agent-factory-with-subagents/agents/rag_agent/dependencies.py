@@ -5,6 +5,8 @@ from typing import Optional, Dict, Any
 import asyncpg
 import openai
 from settings import load_settings
+from utils.pg_codecs import init_connection
+from utils.embedding_store import EmbeddingStore
 
 
 @dataclass
@@ -14,6 +16,7 @@ class AgentDependencies:
     # Core dependencies
     db_pool: Optional[asyncpg.Pool] = None
     openai_client: Optional[openai.AsyncOpenAI] = None
+    embedding_store: Optional[EmbeddingStore] = None
     settings: Optional[Any] = None
     
     # Session context
@@ -31,7 +34,8 @@ class AgentDependencies:
             self.db_pool = await asyncpg.create_pool(
                 self.settings.database_url,
                 min_size=self.settings.db_pool_min_size,
-                max_size=self.settings.db_pool_max_size
+                max_size=self.settings.db_pool_max_size,
+                init=init_connection
             )
         
         # Initialize OpenAI client (or compatible provider)
@@ -40,24 +44,45 @@ class AgentDependencies:
                 api_key=self.settings.llm_api_key,
                 base_url=self.settings.llm_base_url
             )
+        
+        # Persistent embedding cache shared with ingestion
+        if not self.embedding_store and self.settings.embedding_cache_path:
+            self.embedding_store = EmbeddingStore(
+                self.settings.embedding_cache_path,
+                max_mb=self.settings.embedding_cache_max_mb
+            )
     
     async def cleanup(self):
         """Clean up external connections."""
         if self.db_pool:
             await self.db_pool.close()
             self.db_pool = None
+        if self.embedding_store:
+            self.embedding_store.close()
+            self.embedding_store = None
     
     async def get_embedding(self, text: str) -> list[float]:
-        """Generate embedding for text using OpenAI."""
+        """Generate embedding for text using OpenAI, reading through the embedding cache."""
         if not self.openai_client:
             await self.initialize()
         
+        model = self.settings.embedding_model
+        dimension = self.settings.embedding_dimension
+        if self.embedding_store:
+            cached = self.embedding_store.get(model, dimension, text)
+            if cached is not None:
+                return cached
+        
         response = await self.openai_client.embeddings.create(
-            model=self.settings.embedding_model,
+            model=model,
             input=text
         )
-        # Return as list of floats - asyncpg will handle conversion
-        return response.data[0].embedding
+        # Return as list of floats - the pool's vector codec encodes it directly
+        embedding = response.data[0].embedding
+        
+        if self.embedding_store:
+            self.embedding_store.put(model, dimension, text, embedding)
+        return embedding
     
     def set_user_preference(self, key: str, value: Any):
         """Set a user preference for the session."""
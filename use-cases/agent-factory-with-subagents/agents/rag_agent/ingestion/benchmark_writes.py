@@ -0,0 +1,131 @@
+"""
+Benchmark chunk writes: one INSERT per chunk vs. COPY with binary vectors.
+
+Every run happens inside a transaction that is rolled back, so the benchmark
+can be pointed at a real database without leaving rows behind.
+
+    python -m ingestion.benchmark_writes --documents 20 --chunks 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .chunker import DocumentChunk
+from .ingest import copy_documents
+
+try:
+    from ..utils.db_utils import db_pool, init_connection
+except ImportError:
+    # For direct execution or testing
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.db_utils import db_pool, init_connection
+
+load_dotenv()
+
+
+def make_documents(count: int, chunks_per_document: int, dimension: int) -> List[tuple]:
+    """Synthetic (title, source, content, chunks, metadata) records."""
+    documents = []
+    for d in range(count):
+        chunks = []
+        for i in range(chunks_per_document):
+            chunk = DocumentChunk(
+                content=f"Benchmark chunk {i} of document {d}. " * 20,
+                index=i,
+                start_char=i * 1000,
+                end_char=(i + 1) * 1000,
+                metadata={"title": f"Benchmark {d}", "chunk_method": "benchmark"},
+                token_count=250
+            )
+            chunk.embedding = [random.uniform(-1, 1) for _ in range(dimension)]
+            chunks.append(chunk)
+        content = " ".join(chunk.content for chunk in chunks)
+        documents.append((f"Benchmark {d}", f"benchmark/doc{d}.md", content, chunks, {"benchmark": True}))
+    return documents
+
+
+async def write_per_row(conn: asyncpg.Connection, documents: List[tuple]):
+    """The original path: one INSERT per document and per chunk, text-encoded vectors."""
+    for title, source, content, chunks, metadata in documents:
+        row = await conn.fetchrow(
+            """
+            INSERT INTO documents (title, source, content, metadata)
+            VALUES ($1, $2, $3, $4)
+            RETURNING id::text
+            """,
+            title, source, content, json.dumps(metadata)
+        )
+        for chunk in chunks:
+            await conn.execute(
+                """
+                INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
+                VALUES ($1::uuid, $2, $3::vector, $4, $5, $6)
+                """,
+                row["id"],
+                chunk.content,
+                '[' + ','.join(map(str, chunk.embedding)) + ']',
+                chunk.index,
+                json.dumps(chunk.metadata),
+                chunk.token_count
+            )
+
+
+async def write_copy(conn: asyncpg.Connection, documents: List[tuple]):
+    """The bulk path: all documents and chunks in two COPY commands."""
+    await copy_documents(conn, documents)
+
+
+async def timed_rollback(conn: asyncpg.Connection, writer, documents: List[tuple]) -> float:
+    """Run a writer inside a transaction, roll it back and return the elapsed seconds."""
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        start = time.perf_counter()
+        await writer(conn, documents)
+        return time.perf_counter() - start
+    finally:
+        await transaction.rollback()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare per-row INSERT and COPY chunk writes")
+    parser.add_argument("--documents", type=int, default=20, help="Documents per run")
+    parser.add_argument("--chunks", type=int, default=50, help="Chunks per document")
+    parser.add_argument("--dimension", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method (best is reported)")
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents, args.chunks, args.dimension)
+    rows = args.documents * args.chunks
+
+    # Separate connections: the per-row path sends text vectors and JSON strings, as it did originally
+    text_conn = await asyncpg.connect(db_pool.database_url)
+    binary_conn = await asyncpg.connect(db_pool.database_url)
+    try:
+        await init_connection(binary_conn)
+
+        print(f"Writing {args.documents} documents x {args.chunks} chunks ({rows} rows), best of {args.repeat}")
+        timings = {}
+        for name, conn, writer in (("per-row INSERT", text_conn, write_per_row),
+                                   ("COPY binary", binary_conn, write_copy)):
+            timings[name] = min([await timed_rollback(conn, writer, documents) for _ in range(args.repeat)])
+            print(f"  {name:15s} {timings[name]:8.3f}s  {rows / timings[name]:10.0f} rows/s")
+
+        speedup = timings["per-row INSERT"] / timings["COPY binary"]
+        print(f"COPY is {speedup:.1f}x faster")
+    finally:
+        await text_conn.close()
+        await binary_conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,7 +5,7 @@ Document embedding generation for vector search.
 import os
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Any, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -17,12 +17,14 @@ from .chunker import DocumentChunk
 # Import flexible providers
 try:
     from ..utils.providers import get_embedding_client, get_embedding_model
+    from ..utils.embedding_store import EmbeddingStore
 except ImportError:
     # For direct execution or testing
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from utils.providers import get_embedding_client, get_embedding_model
+    from utils.embedding_store import EmbeddingStore
 
 # Load environment variables
 load_dotenv()
@@ -42,7 +44,8 @@ class EmbeddingGenerator:
         model: str = EMBEDDING_MODEL,
         batch_size: int = 100,
         max_retries: int = 3,
-        retry_delay: float = 1.0
+        retry_delay: float = 1.0,
+        store: Optional[EmbeddingStore] = None
     ):
         """
         Initialize embedding generator.
@@ -52,11 +55,13 @@ class EmbeddingGenerator:
             batch_size: Number of texts to process in parallel
             max_retries: Maximum number of retry attempts
             retry_delay: Delay between retries in seconds
+            store: Persistent embedding cache to read through
         """
         self.model = model
         self.batch_size = batch_size
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.store = store
         
         # Model-specific configurations
         self.model_configs = {
@@ -85,6 +90,19 @@ class EmbeddingGenerator:
         if len(text) > self.config["max_tokens"] * 4:  # Rough token estimation
             text = text[:self.config["max_tokens"] * 4]
         
+        if self.store is not None:
+            cached = self.store.get(self.model, self.config["dimensions"], text)
+            if cached is not None:
+                return cached
+        
+        embedding = await self._request_embedding(text)
+        
+        if self.store is not None:
+            self.store.put(self.model, self.config["dimensions"], text, embedding)
+        return embedding
+    
+    async def _request_embedding(self, text: str) -> List[float]:
+        """Call the embeddings API for one text, retrying on errors."""
         for attempt in range(self.max_retries):
             try:
                 response = await embedding_client.embeddings.create(
@@ -141,11 +159,32 @@ class EmbeddingGenerator:
             
             processed_texts.append(text)
         
+        if self.store is None:
+            return await self._request_embeddings(processed_texts)
+        
+        # Read through the persistent cache; only misses go to the API
+        dimension = self.config["dimensions"]
+        embeddings = self.store.get_many(self.model, dimension, processed_texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = await self._request_embeddings([processed_texts[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+            # Zero vectors are fallbacks for failed requests, not real embeddings
+            self.store.put_many(self.model, dimension, [
+                (processed_texts[i], embedding)
+                for i, embedding in zip(missing, fresh)
+                if processed_texts[i].strip() and any(embedding)
+            ])
+        return embeddings
+    
+    async def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Call the embeddings API for a batch of texts, retrying on errors."""
         for attempt in range(self.max_retries):
             try:
                 response = await embedding_client.embeddings.create(
                     model=self.model,
-                    input=processed_texts
+                    input=texts
                 )
                 
                 return [data.embedding for data in response.data]
@@ -162,13 +201,13 @@ class EmbeddingGenerator:
                 logger.error(f"OpenAI API error in batch: {e}")
                 if attempt == self.max_retries - 1:
                     # Fallback to individual processing
-                    return await self._process_individually(processed_texts)
+                    return await self._process_individually(texts)
                 await asyncio.sleep(self.retry_delay)
                 
             except Exception as e:
                 logger.error(f"Unexpected error in batch embedding: {e}")
                 if attempt == self.max_retries - 1:
-                    return await self._process_individually(processed_texts)
+                    return await self._process_individually(texts)
                 await asyncio.sleep(self.retry_delay)
     
     async def _process_individually(
@@ -192,7 +231,7 @@ class EmbeddingGenerator:
                     embeddings.append([0.0] * self.config["dimensions"])
                     continue
                 
-                embedding = await self.generate_embedding(text)
+                embedding = await self._request_embedding(text)
                 embeddings.append(embedding)
                 
                 # Small delay to avoid overwhelming the API
@@ -296,43 +335,6 @@ class EmbeddingGenerator:
         return self.config["dimensions"]
 
 
-# Cache for embeddings
-class EmbeddingCache:
-    """Simple in-memory cache for embeddings."""
-    
-    def __init__(self, max_size: int = 1000):
-        """Initialize cache."""
-        self.cache: Dict[str, List[float]] = {}
-        self.access_times: Dict[str, datetime] = {}
-        self.max_size = max_size
-    
-    def get(self, text: str) -> Optional[List[float]]:
-        """Get embedding from cache."""
-        text_hash = self._hash_text(text)
-        if text_hash in self.cache:
-            self.access_times[text_hash] = datetime.now()
-            return self.cache[text_hash]
-        return None
-    
-    def put(self, text: str, embedding: List[float]):
-        """Store embedding in cache."""
-        text_hash = self._hash_text(text)
-        
-        # Evict oldest entries if cache is full
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-            del self.cache[oldest_key]
-            del self.access_times[oldest_key]
-        
-        self.cache[text_hash] = embedding
-        self.access_times[text_hash] = datetime.now()
-    
-    def _hash_text(self, text: str) -> str:
-        """Generate hash for text."""
-        import hashlib
-        return hashlib.md5(text.encode()).hexdigest()
-
-
 # Factory function
 def create_embedder(
     model: str = EMBEDDING_MODEL,
@@ -344,31 +346,17 @@ def create_embedder(
     
     Args:
         model: Embedding model to use
-        use_cache: Whether to use caching
+        use_cache: Whether to read through the persistent embedding cache
+            (EMBEDDING_CACHE_PATH, shared with the search agent)
         **kwargs: Additional arguments for EmbeddingGenerator
     
     Returns:
         EmbeddingGenerator instance
     """
-    embedder = EmbeddingGenerator(model=model, **kwargs)
-    
-    if use_cache:
-        # Add caching capability
-        cache = EmbeddingCache()
-        original_generate = embedder.generate_embedding
-        
-        async def cached_generate(text: str) -> List[float]:
-            cached = cache.get(text)
-            if cached is not None:
-                return cached
-            
-            embedding = await original_generate(text)
-            cache.put(text, embedding)
-            return embedding
-        
-        embedder.generate_embedding = cached_generate
+    if use_cache and "store" not in kwargs:
+        kwargs["store"] = EmbeddingStore()
     
-    return embedder
+    return EmbeddingGenerator(model=model, **kwargs)
 
 
 # Example usage
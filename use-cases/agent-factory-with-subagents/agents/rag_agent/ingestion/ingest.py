@@ -5,12 +5,16 @@ Main ingestion script for processing markdown documents into vector DB and knowl
 import os
 import asyncio
 import logging
-import json
 import glob
+import hashlib
+import inspect
+import uuid
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
 import argparse
+import time
 
 import asyncpg
 from dotenv import load_dotenv
@@ -35,6 +39,140 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+DOCUMENT_COLUMNS = ["id", "title", "source", "content", "metadata", "content_hash"]
+CHUNK_COLUMNS = ["document_id", "content", "embedding", "chunk_index", "metadata", "token_count", "content_hash"]
+
+# (title, source, content, chunks, metadata) for copy_documents
+DocumentRecord = Tuple[str, str, str, List[DocumentChunk], Dict[str, Any]]
+
+
+def content_hash(*parts: str) -> str:
+    """SHA-256 hex digest of the parts, NUL-separated so part boundaries matter."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _embedding_value(chunk: DocumentChunk):
+    """The chunk's embedding, or None when it has none (missing or empty)."""
+    embedding = getattr(chunk, "embedding", None)
+    if embedding is None or len(embedding) == 0:
+        return None
+    return embedding
+
+
+def _embedding_failed(chunk: DocumentChunk) -> bool:
+    """True for the zero-vector fallbacks the embedder returns when a request fails."""
+    embedding = getattr(chunk, "embedding", None)
+    return "embedding_error" in chunk.metadata or embedding is None or not any(embedding)
+
+
+def chunk_records(document_id, chunks: Sequence[DocumentChunk]) -> List[tuple]:
+    """Rows for the chunks table in CHUNK_COLUMNS order."""
+    return [
+        (
+            document_id,
+            chunk.content,
+            _embedding_value(chunk),
+            chunk.index,
+            chunk.metadata,
+            chunk.token_count,
+            getattr(chunk, "content_hash", None)
+        )
+        for chunk in chunks
+    ]
+
+
+async def copy_documents(
+    conn: asyncpg.Connection,
+    documents: Sequence[DocumentRecord],
+    content_hashes: Optional[Sequence[str]] = None
+) -> List[str]:
+    """
+    Write documents and all of their chunks with two COPY commands.
+    
+    Document IDs are generated client-side so chunks can reference them without
+    a round trip per document. Embeddings go over the wire in pgvector's binary
+    format. Run inside a transaction so a failure leaves nothing behind.
+    
+    Args:
+        conn: Connection set up by init_connection (binary vector and jsonb codecs)
+        documents: (title, source, content, chunks, metadata) per document
+        content_hashes: Optional document hashes in the same order
+    
+    Returns:
+        Document IDs in input order
+    """
+    document_ids = [uuid.uuid4() for _ in documents]
+    hashes = content_hashes or [None] * len(documents)
+    
+    await conn.copy_records_to_table(
+        "documents",
+        records=[
+            (document_id, title, source, content, metadata, document_hash)
+            for document_id, (title, source, content, _, metadata), document_hash
+            in zip(document_ids, documents, hashes)
+        ],
+        columns=DOCUMENT_COLUMNS
+    )
+    
+    await conn.copy_records_to_table(
+        "chunks",
+        records=[
+            record
+            for document_id, (_, _, _, chunks, _) in zip(document_ids, documents)
+            for record in chunk_records(document_id, chunks)
+        ],
+        columns=CHUNK_COLUMNS
+    )
+    
+    return [str(document_id) for document_id in document_ids]
+
+
+@dataclass
+class DocumentJob:
+    """A document moving through the ingestion stages."""
+    index: int
+    file_path: str
+    start_time: datetime = field(default_factory=datetime.now)
+    content: str = ""
+    title: str = ""
+    source: str = ""
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    chunks: List[DocumentChunk] = field(default_factory=list)
+    # None when a chunk failed to embed, so the next incremental run retries the document
+    content_hash: Optional[str] = ""
+    # Incremental mode: the stored copy of the document and its chunk IDs by content hash
+    document_id: Optional[str] = None
+    stored_chunks: Dict[str, List[str]] = field(default_factory=dict)
+    # Position in chunks -> ID of the stored chunk that is kept for it
+    reused: Dict[int, str] = field(default_factory=dict)
+    result: Optional[IngestionResult] = None
+    
+    def fail(self, error: str):
+        """Finish the job with an error; later stages pass it through."""
+        self.result = IngestionResult(
+            document_id="",
+            title=self.title or os.path.basename(self.file_path),
+            chunks_created=0,
+            entities_extracted=0,
+            relationships_created=0,
+            processing_time_ms=(datetime.now() - self.start_time).total_seconds() * 1000,
+            errors=[error]
+        )
+    
+    def skip(self):
+        """Finish the job without writing anything; the stored document is up to date."""
+        self.result = IngestionResult(
+            document_id=self.document_id,
+            title=self.title,
+            chunks_created=0,
+            processing_time_ms=(datetime.now() - self.start_time).total_seconds() * 1000,
+            skipped=True
+        )
+
 
 class DocumentIngestionPipeline:
     """Pipeline for ingesting documents into vector DB and knowledge graph."""
@@ -68,6 +206,22 @@ class DocumentIngestionPipeline:
         self.chunker = create_chunker(self.chunker_config)
         self.embedder = create_embedder()
         
+        # Part of every document hash, so changing the chunking settings or the
+        # embedding model re-ingests documents whose text did not change
+        self.hash_settings = "|".join(str(value) for value in (
+            self.embedder.model,
+            config.chunk_size,
+            config.chunk_overlap,
+            config.max_chunk_size,
+            config.use_semantic_chunking
+        ))
+        
+        # Busy seconds per stage, reported after pipelined runs
+        self.stage_times: Dict[str, float] = {}
+        
+        # Incremental mode: stored documents whose file no longer exists
+        self.documents_deleted = 0
+        
         self._initialized = False
     
     async def initialize(self):
@@ -88,6 +242,9 @@ class DocumentIngestionPipeline:
         if self._initialized:
             await close_database()
             self._initialized = False
+        if self.embedder.store is not None:
+            self.embedder.store.close()
+            self.embedder.store = None
     
     async def ingest_documents(
         self,
@@ -118,6 +275,32 @@ class DocumentIngestionPipeline:
         
         logger.info(f"Found {len(markdown_files)} markdown files to process")
         
+        if self.config.pipelined:
+            results = await self._ingest_pipelined(markdown_files, progress_callback)
+        else:
+            results = await self._ingest_sequential(markdown_files, progress_callback)
+        
+        if self.config.incremental:
+            self.documents_deleted = await self._delete_removed_documents(markdown_files)
+        
+        # Log summary
+        total_chunks = sum(r.chunks_created for r in results)
+        total_errors = sum(len(r.errors) for r in results)
+        
+        logger.info(f"Ingestion complete: {len(results)} documents, {total_chunks} chunks, {total_errors} errors")
+        
+        if self.embedder.store is not None:
+            stats = self.embedder.store.stats()
+            logger.info(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        
+        return results
+    
+    async def _ingest_sequential(
+        self,
+        markdown_files: List[str],
+        progress_callback: Optional[callable] = None
+    ) -> List[IngestionResult]:
+        """Ingest documents one at a time: read, chunk, embed, save, then the next file."""
         results = []
         
         for i, file_path in enumerate(markdown_files):
@@ -142,12 +325,87 @@ class DocumentIngestionPipeline:
                     errors=[str(e)]
                 ))
         
-        # Log summary
-        total_chunks = sum(r.chunks_created for r in results)
-        total_errors = sum(len(r.errors) for r in results)
+        return results
+    
+    async def _ingest_pipelined(
+        self,
+        markdown_files: List[str],
+        progress_callback: Optional[callable] = None
+    ) -> List[IngestionResult]:
+        """
+        Ingest documents with reading, chunking, embedding and saving as separate stages.
         
-        logger.info(f"Ingestion complete: {len(results)} documents, {total_chunks} chunks, {total_errors} errors")
+        Stages are connected by bounded queues and each runs its own number of
+        workers (see IngestionConfig), so while one document waits on the
+        embeddings API others are being chunked and committed. A job that fails
+        in one stage is passed through the rest with its error result.
         
+        Args:
+            markdown_files: Files to ingest
+            progress_callback: Optional callback for progress updates
+        
+        Returns:
+            Ingestion results in the order of markdown_files
+        """
+        config = self.config
+        stages = [
+            ("read", self._read_stage, config.read_concurrency),
+            ("chunk", self._chunk_stage, config.chunk_concurrency),
+            ("embed", self._embed_stage, config.embed_concurrency),
+            ("save", self._save_stage, config.save_concurrency),
+        ]
+        queues = [asyncio.Queue(maxsize=config.queue_size) for _ in stages]
+        results: List[Optional[IngestionResult]] = [None] * len(markdown_files)
+        completed = 0
+        self.stage_times = {name: 0.0 for name, _, _ in stages}
+        
+        def finish(job: DocumentJob):
+            nonlocal completed
+            results[job.index] = job.result
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, len(markdown_files))
+        
+        async def worker(name: str, handler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                if job.result is None:
+                    started = time.perf_counter()
+                    try:
+                        await handler(job)
+                    except Exception as e:
+                        logger.error(f"Failed to {name} {job.file_path}: {e}")
+                        job.fail(str(e))
+                    self.stage_times[name] += time.perf_counter() - started
+                if outbox is not None:
+                    await outbox.put(job)
+                else:
+                    finish(job)
+        
+        async def run_stage(position: int):
+            name, handler, concurrency = stages[position]
+            outbox = queues[position + 1] if position + 1 < len(stages) else None
+            await asyncio.gather(*(
+                worker(name, handler, queues[position], outbox) for _ in range(concurrency)
+            ))
+            # Stop the next stage once everything from this one has been handed over
+            if outbox is not None:
+                for _ in range(stages[position + 1][2]):
+                    await outbox.put(None)
+        
+        async def feed():
+            for index, file_path in enumerate(markdown_files):
+                await queues[0].put(DocumentJob(index=index, file_path=file_path))
+            for _ in range(stages[0][2]):
+                await queues[0].put(None)
+        
+        await asyncio.gather(feed(), *(run_stage(i) for i in range(len(stages))))
+        
+        logger.info("Stage busy time: " + ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in self.stage_times.items()
+        ))
         return results
     
     async def _ingest_single_document(self, file_path: str) -> IngestionResult:
@@ -160,75 +418,155 @@ class DocumentIngestionPipeline:
         Returns:
             Ingestion result
         """
-        start_time = datetime.now()
-        
-        # Read document
-        document_content = self._read_document(file_path)
-        document_title = self._extract_title(document_content, file_path)
-        document_source = os.path.relpath(file_path, self.documents_folder)
-        
-        # Extract metadata from content
-        document_metadata = self._extract_document_metadata(document_content, file_path)
-        
-        logger.info(f"Processing document: {document_title}")
-        
-        # Chunk the document
-        chunks = await self.chunker.chunk_document(
-            content=document_content,
-            title=document_title,
-            source=document_source,
-            metadata=document_metadata
-        )
-        
-        if not chunks:
-            logger.warning(f"No chunks created for {document_title}")
-            return IngestionResult(
-                document_id="",
-                title=document_title,
-                chunks_created=0,
-                entities_extracted=0,
-                relationships_created=0,
-                processing_time_ms=(datetime.now() - start_time).total_seconds() * 1000,
-                errors=["No chunks created"]
+        job = DocumentJob(index=0, file_path=file_path)
+        for stage in (self._read_stage, self._chunk_stage, self._embed_stage, self._save_stage):
+            if job.result is not None:
+                break
+            await stage(job)
+        return job.result
+    
+    async def _read_stage(self, job: DocumentJob):
+        """Read the file and extract title, source and metadata."""
+        job.content = await asyncio.to_thread(self._read_document, job.file_path)
+        job.title = self._extract_title(job.content, job.file_path)
+        job.source = os.path.relpath(job.file_path, self.documents_folder)
+        job.metadata = self._extract_document_metadata(job.content, job.file_path)
+        job.content_hash = content_hash(self.hash_settings, job.content)
+        
+        if self.config.incremental:
+            await self._load_stored_document(job)
+            if job.result is not None:
+                logger.info(f"Unchanged, skipping: {job.title}")
+                return
+        
+        logger.info(f"Processing document: {job.title}")
+    
+    async def _load_stored_document(self, job: DocumentJob):
+        """Find the stored copy of the document; skip the job if its hash matches."""
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id::text, content_hash
+                FROM documents
+                WHERE source = $1
+                ORDER BY updated_at DESC
+                LIMIT 1
+                """,
+                job.source
+            )
+            if row is None:
+                return
+            
+            job.document_id = row["id"]
+            if row["content_hash"] == job.content_hash:
+                job.skip()
+                return
+            
+            chunk_rows = await conn.fetch(
+                """
+                SELECT id::text, content_hash
+                FROM chunks
+                WHERE document_id = $1::uuid AND content_hash IS NOT NULL
+                """,
+                job.document_id
             )
         
-        logger.info(f"Created {len(chunks)} chunks")
+        for chunk_row in chunk_rows:
+            job.stored_chunks.setdefault(chunk_row["content_hash"], []).append(chunk_row["id"])
+    
+    async def _chunk_stage(self, job: DocumentJob):
+        """Split the document into chunks."""
+        chunks = self.chunker.chunk_document(
+            content=job.content,
+            title=job.title,
+            source=job.source,
+            metadata=job.metadata
+        )
+        # SemanticChunker is async, SimpleChunker (--no-semantic) is not
+        job.chunks = await chunks if inspect.isawaitable(chunks) else chunks
         
-        # Entity extraction removed (graph-related functionality)
-        entities_extracted = 0
+        if not job.chunks:
+            logger.warning(f"No chunks created for {job.title}")
+            job.fail("No chunks created")
+            return
         
-        # Generate embeddings
-        embedded_chunks = await self.embedder.embed_chunks(chunks)
-        logger.info(f"Generated embeddings for {len(embedded_chunks)} chunks")
+        # Chunks whose text is already stored keep their row and embedding
+        for position, chunk in enumerate(job.chunks):
+            chunk.content_hash = content_hash(self.embedder.model, chunk.content)
+            stored = job.stored_chunks.get(chunk.content_hash)
+            if stored:
+                job.reused[position] = stored.pop()
         
-        # Save to PostgreSQL
-        document_id = await self._save_to_postgres(
-            document_title,
-            document_source,
-            document_content,
-            embedded_chunks,
-            document_metadata
-        )
+        logger.info(f"Created {len(job.chunks)} chunks ({len(job.reused)} unchanged)")
+    
+    async def _embed_stage(self, job: DocumentJob):
+        """Generate embeddings for the chunks that are not already stored."""
+        pending = [chunk for position, chunk in enumerate(job.chunks) if position not in job.reused]
+        embedded = await self.embedder.embed_chunks(pending) if pending else []
+        
+        # embed_chunks returns new chunk objects, except for chunks that failed.
+        # Those keep no hash so they are never reused, and the document hash is
+        # not stored so the next incremental run embeds them again.
+        failed = 0
+        for chunk, original in zip(embedded, pending):
+            if _embedding_failed(chunk):
+                chunk.content_hash = None
+                failed += 1
+            else:
+                chunk.content_hash = original.content_hash
+        if failed:
+            logger.warning(f"{failed} chunks of {job.title} failed to embed; the document will be retried")
+            job.content_hash = None
+        
+        embedded = iter(embedded)
+        job.chunks = [
+            chunk if position in job.reused else next(embedded)
+            for position, chunk in enumerate(job.chunks)
+        ]
+        logger.info(f"Generated embeddings for {len(pending)} chunks")
+    
+    async def _save_stage(self, job: DocumentJob):
+        """Save the document and its chunks to PostgreSQL."""
+        if job.document_id:
+            document_id = await self._update_in_postgres(job)
+        else:
+            document_id = await self._save_to_postgres(
+                job.title,
+                job.source,
+                job.content,
+                job.chunks,
+                job.metadata,
+                job.content_hash
+            )
         
         logger.info(f"Saved document to PostgreSQL with ID: {document_id}")
         
-        # Knowledge graph functionality removed
-        relationships_created = 0
-        graph_errors = []
-        
-        # Calculate processing time
-        processing_time = (datetime.now() - start_time).total_seconds() * 1000
-        
-        return IngestionResult(
+        # Entity extraction and knowledge graph functionality removed
+        job.result = IngestionResult(
             document_id=document_id,
-            title=document_title,
-            chunks_created=len(chunks),
-            entities_extracted=entities_extracted,
-            relationships_created=relationships_created,
-            processing_time_ms=processing_time,
-            errors=graph_errors
+            title=job.title,
+            chunks_created=len(job.chunks) - len(job.reused),
+            chunks_reused=len(job.reused),
+            entities_extracted=0,
+            relationships_created=0,
+            processing_time_ms=(datetime.now() - job.start_time).total_seconds() * 1000,
+            errors=[]
         )
     
+    async def _delete_removed_documents(self, markdown_files: List[str]) -> int:
+        """Delete stored documents whose file is no longer in the documents folder; chunks cascade."""
+        sources = [os.path.relpath(file_path, self.documents_folder) for file_path in markdown_files]
+        async with db_pool.acquire() as conn:
+            deleted = await conn.execute(
+                "DELETE FROM documents WHERE NOT (source = ANY($1::text[]))",
+                sources
+            )
+        
+        count = int(deleted.split()[-1])
+        if count:
+            logger.info(f"Deleted {count} documents whose files were removed")
+        return count
+    
     def _find_markdown_files(self) -> List[str]:
         """Find all markdown files in the documents folder."""
         if not os.path.exists(self.documents_folder):
@@ -301,48 +639,135 @@ class DocumentIngestionPipeline:
         source: str,
         content: str,
         chunks: List[DocumentChunk],
-        metadata: Dict[str, Any]
+        metadata: Dict[str, Any],
+        document_hash: Optional[str] = None
     ) -> str:
         """Save document and chunks to PostgreSQL."""
+        if self.config.bulk_insert:
+            async with db_pool.acquire() as conn:
+                async with conn.transaction():
+                    document_ids = await copy_documents(
+                        conn,
+                        [(title, source, content, chunks, metadata)],
+                        [document_hash]
+                    )
+                    return document_ids[0]
+        
+        return await self._insert_rows(title, source, content, chunks, metadata, document_hash)
+    
+    async def _insert_rows(
+        self,
+        title: str,
+        source: str,
+        content: str,
+        chunks: List[DocumentChunk],
+        metadata: Dict[str, Any],
+        document_hash: Optional[str] = None
+    ) -> str:
+        """Save document and chunks with one INSERT per row (used with bulk_insert=False)."""
         async with db_pool.acquire() as conn:
             async with conn.transaction():
                 # Insert document
                 document_result = await conn.fetchrow(
                     """
-                    INSERT INTO documents (title, source, content, metadata)
-                    VALUES ($1, $2, $3, $4)
+                    INSERT INTO documents (title, source, content, metadata, content_hash)
+                    VALUES ($1, $2, $3, $4, $5)
                     RETURNING id::text
                     """,
                     title,
                     source,
                     content,
-                    json.dumps(metadata)
+                    metadata,
+                    document_hash
                 )
                 
                 document_id = document_result["id"]
                 
-                # Insert chunks
-                for chunk in chunks:
-                    # Convert embedding to PostgreSQL vector string format
-                    embedding_data = None
-                    if hasattr(chunk, 'embedding') and chunk.embedding:
-                        # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-                        embedding_data = '[' + ','.join(map(str, chunk.embedding)) + ']'
-                    
-                    await conn.execute(
+                await self._write_chunks(conn, document_id, chunks)
+                
+                return document_id
+    
+    async def _write_chunks(self, conn: asyncpg.Connection, document_id: str, chunks: List[DocumentChunk]):
+        """Add chunks to a document with COPY, or one INSERT per chunk with bulk_insert=False."""
+        if not chunks:
+            return
+        
+        if self.config.bulk_insert:
+            await conn.copy_records_to_table(
+                "chunks",
+                records=chunk_records(document_id, chunks),
+                columns=CHUNK_COLUMNS
+            )
+            return
+        
+        for record in chunk_records(document_id, chunks):
+            await conn.execute(
+                """
+                INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count, content_hash)
+                VALUES ($1::uuid, $2, $3::vector, $4, $5, $6, $7)
+                """,
+                *record
+            )
+    
+    async def _update_in_postgres(self, job: DocumentJob) -> str:
+        """
+        Bring a stored document up to date in one transaction.
+        
+        Chunks in job.reused keep their rows and embeddings and only get their
+        new position and metadata. Stored chunks that no longer appear in the
+        document are deleted and the remaining chunks are added.
+        """
+        new_chunks = [chunk for position, chunk in enumerate(job.chunks) if position not in job.reused]
+        
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    UPDATE documents
+                    SET title = $2, content = $3, metadata = $4, content_hash = $5
+                    WHERE id = $1::uuid
+                    """,
+                    job.document_id,
+                    job.title,
+                    job.content,
+                    job.metadata,
+                    job.content_hash
+                )
+                
+                # Copies left behind by earlier runs without --incremental
+                await conn.execute(
+                    "DELETE FROM documents WHERE source = $1 AND id <> $2::uuid",
+                    job.source,
+                    job.document_id
+                )
+                
+                deleted = await conn.execute(
+                    "DELETE FROM chunks WHERE document_id = $1::uuid AND NOT (id = ANY($2::uuid[]))",
+                    job.document_id,
+                    list(job.reused.values())
+                )
+                
+                if job.reused:
+                    await conn.executemany(
                         """
-                        INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
-                        VALUES ($1::uuid, $2, $3::vector, $4, $5, $6)
+                        UPDATE chunks
+                        SET chunk_index = $2, token_count = $3, metadata = metadata || $4::jsonb
+                        WHERE id = $1::uuid
                         """,
-                        document_id,
-                        chunk.content,
-                        embedding_data,
-                        chunk.index,
-                        json.dumps(chunk.metadata),
-                        chunk.token_count
+                        [
+                            (chunk_id, job.chunks[position].index, job.chunks[position].token_count,
+                             job.chunks[position].metadata)
+                            for position, chunk_id in job.reused.items()
+                        ]
                     )
                 
-                return document_id
+                await self._write_chunks(conn, job.document_id, new_chunks)
+        
+        logger.info(
+            f"Updated {job.title}: {len(new_chunks)} new, {len(job.reused)} unchanged, "
+            f"{deleted.split()[-1]} removed chunks"
+        )
+        return job.document_id
     
     async def _clean_databases(self):
         """Clean existing data from databases."""
@@ -364,6 +789,14 @@ async def main():
     parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size for splitting documents")
     parser.add_argument("--chunk-overlap", type=int, default=200, help="Chunk overlap size")
     parser.add_argument("--no-semantic", action="store_true", help="Disable semantic chunking")
+    parser.add_argument("--pipelined", action="store_true", help="Run read, chunk, embed and save as concurrent stages")
+    parser.add_argument("--read-concurrency", type=int, default=4, help="Reader workers in pipelined mode")
+    parser.add_argument("--chunk-concurrency", type=int, default=4, help="Chunker workers in pipelined mode")
+    parser.add_argument("--embed-concurrency", type=int, default=4, help="Embedding workers in pipelined mode")
+    parser.add_argument("--save-concurrency", type=int, default=4, help="PostgreSQL writers in pipelined mode")
+    parser.add_argument("--queue-size", type=int, default=8, help="Documents buffered between stages")
+    parser.add_argument("--incremental", "-i", action="store_true", help="Skip unchanged documents and re-embed only changed chunks")
+    parser.add_argument("--row-inserts", action="store_true", help="Insert chunks one row at a time instead of COPY")
     # Graph-related arguments removed
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
     
@@ -380,7 +813,15 @@ async def main():
     config = IngestionConfig(
         chunk_size=args.chunk_size,
         chunk_overlap=args.chunk_overlap,
-        use_semantic_chunking=not args.no_semantic
+        use_semantic_chunking=not args.no_semantic,
+        pipelined=args.pipelined,
+        read_concurrency=args.read_concurrency,
+        chunk_concurrency=args.chunk_concurrency,
+        embed_concurrency=args.embed_concurrency,
+        save_concurrency=args.save_concurrency,
+        queue_size=args.queue_size,
+        bulk_insert=not args.row_inserts,
+        incremental=args.incremental
     )
     
     # Create and run pipeline
@@ -407,6 +848,10 @@ async def main():
         print("="*50)
         print(f"Documents processed: {len(results)}")
         print(f"Total chunks created: {sum(r.chunks_created for r in results)}")
+        if config.incremental:
+            print(f"Documents unchanged: {sum(r.skipped for r in results)}")
+            print(f"Chunks reused: {sum(r.chunks_reused for r in results)}")
+            print(f"Documents deleted: {pipeline.documents_deleted}")
         # Graph-related stats removed
         print(f"Total errors: {sum(len(r.errors) for r in results)}")
         print(f"Total processing time: {total_time:.2f} seconds")
@@ -415,7 +860,12 @@ async def main():
         # Print individual results
         for result in results:
             status = "✓" if not result.errors else "✗"
-            print(f"{status} {result.title}: {result.chunks_created} chunks")
+            if result.skipped:
+                print(f"{status} {result.title}: unchanged")
+            elif result.chunks_reused:
+                print(f"{status} {result.title}: {result.chunks_created} chunks ({result.chunks_reused} reused)")
+            else:
+                print(f"{status} {result.title}: {result.chunks_created} chunks")
             
             if result.errors:
                 for error in result.errors:
@@ -83,6 +83,17 @@ class Settings(BaseSettings):
         default=1536,
         description="Embedding vector dimension"
     )
+    
+    # Embedding Cache Configuration
+    embedding_cache_path: str = Field(
+        default=".embedding_cache.sqlite3",
+        description="SQLite file for cached embeddings, shared with ingestion (empty disables)"
+    )
+    
+    embedding_cache_max_mb: int = Field(
+        default=512,
+        description="Size limit for cached embeddings in megabytes"
+    )
 
 
 def load_settings() -> Settings:
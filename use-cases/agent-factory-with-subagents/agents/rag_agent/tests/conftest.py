@@ -28,7 +28,8 @@ def test_settings():
         default_text_weight=0.3,
         db_pool_min_size=1,
         db_pool_max_size=5,
-        embedding_dimension=1536
+        embedding_dimension=1536,
+        embedding_cache_path=""
     )
 
 
@@ -5,7 +5,8 @@ from unittest.mock import AsyncMock, patch, MagicMock
 import asyncpg
 import openai
 
-from ..dependencies import AgentDependencies
+from ..dependencies import AgentDependencies, init_connection
+from ..utils.embedding_store import EmbeddingStore
 from ..settings import Settings, load_settings
 
 
@@ -66,7 +67,8 @@ class TestAgentDependencies:
                         mock_create_pool.assert_called_once_with(
                             test_settings.database_url,
                             min_size=test_settings.db_pool_min_size,
-                            max_size=test_settings.db_pool_max_size
+                            max_size=test_settings.db_pool_max_size,
+                            init=init_connection
                         )
                         
                         # Verify OpenAI client creation
@@ -217,6 +219,20 @@ class TestEmbeddingGeneration:
         
         with pytest.raises(ConnectionError, match="Network unavailable"):
             await deps.get_embedding("test text")
+    
+    @pytest.mark.asyncio
+    async def test_get_embedding_reads_through_store(self, test_dependencies, tmp_path):
+        """Test repeated texts are served from the embedding cache."""
+        deps, connection = test_dependencies
+        deps.embedding_store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+        
+        first = await deps.get_embedding("test text")
+        second = await deps.get_embedding("test text")
+        
+        assert second == pytest.approx(first)
+        deps.openai_client.embeddings.create.assert_called_once()
+        assert deps.embedding_store.stats()["hits"] == 1
+        assert deps.embedding_store.stats()["misses"] == 1
 
 
 class TestUserPreferences:
@@ -346,7 +362,8 @@ class TestDatabaseIntegration:
             mock_create_pool.assert_called_once_with(
                 test_settings.database_url,
                 min_size=test_settings.db_pool_min_size,
-                max_size=test_settings.db_pool_max_size
+                max_size=test_settings.db_pool_max_size,
+                init=init_connection
             )
             assert deps.db_pool is mock_pool
     
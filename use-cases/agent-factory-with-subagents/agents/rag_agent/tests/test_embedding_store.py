@@ -0,0 +1,74 @@
+"""Test the persistent embedding cache."""
+
+import pytest
+
+from ..utils.embedding_store import EmbeddingStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Embedding store in a temporary file."""
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    yield store
+    store.close()
+
+
+class TestEmbeddingStore:
+    """Test lookups, persistence and eviction."""
+    
+    def test_miss_then_hit(self, store):
+        """Test stored embeddings are returned and counted."""
+        assert store.get("model", 3, "hello") is None
+        
+        store.put("model", 3, "hello", [0.1, 0.2, 0.3])
+        
+        assert store.get("model", 3, "hello") == pytest.approx([0.1, 0.2, 0.3])
+        assert store.stats()["hits"] == 1
+        assert store.stats()["misses"] == 1
+    
+    def test_key_includes_model_and_dimension(self, store):
+        """Test the same text under another model or dimension is a miss."""
+        store.put("model", 3, "hello", [0.1, 0.2, 0.3])
+        
+        assert store.get("other-model", 3, "hello") is None
+        assert store.get("model", 2, "hello") is None
+    
+    def test_get_many_keeps_order(self, store):
+        """Test batch lookups return results in input order."""
+        store.put_many("model", 2, [("a", [1.0, 0.0]), ("c", [0.0, 1.0])])
+        
+        results = store.get_many("model", 2, ["a", "b", "c", "a"])
+        
+        assert results[0] == [1.0, 0.0]
+        assert results[1] is None
+        assert results[2] == [0.0, 1.0]
+        assert results[3] == [1.0, 0.0]
+    
+    def test_persists_across_instances(self, tmp_path):
+        """Test embeddings survive reopening the file."""
+        path = str(tmp_path / "embeddings.sqlite3")
+        first = EmbeddingStore(path)
+        first.put("model", 2, "hello", [0.5, 0.25])
+        first.close()
+        
+        second = EmbeddingStore(path)
+        assert second.get("model", 2, "hello") == [0.5, 0.25]
+        second.close()
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test the oldest entries go first once the size limit is exceeded."""
+        store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"), max_mb=1)
+        vector = [0.0] * 1024  # 4 KB per entry
+        
+        for i in range(400):
+            store.put("model", 1024, f"text {i}", vector)
+            if i == 0:
+                continue
+            # Keep the first entry in use
+            store.get("model", 1024, "text 0")
+        
+        stats = store.stats()
+        assert stats["bytes"] <= store.max_bytes
+        assert store.get("model", 1024, "text 0") is not None
+        assert store.get("model", 1024, "text 1") is None
+        store.close()
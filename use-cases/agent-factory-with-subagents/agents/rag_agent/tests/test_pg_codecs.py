@@ -0,0 +1,59 @@
+"""Test binary asyncpg codecs."""
+
+import struct
+
+import numpy as np
+import pytest
+
+from ..utils.pg_codecs import (
+    encode_vector, decode_vector, encode_json, decode_json, encode_jsonb, decode_jsonb
+)
+
+
+class TestVectorCodec:
+    """Test pgvector binary encoding."""
+    
+    def test_encode_matches_wire_format(self):
+        """Test header and big-endian float4 payload."""
+        data = encode_vector([1.0, -2.5, 0.25])
+        
+        assert data == struct.pack(">HH3f", 3, 0, 1.0, -2.5, 0.25)
+    
+    def test_round_trip_list_and_array(self):
+        """Test lists and NumPy arrays decode to the same float32 values."""
+        values = [0.1, 0.2, 0.3]
+        
+        for value in (values, np.array(values, dtype=np.float64)):
+            decoded = decode_vector(encode_vector(value))
+            assert decoded.dtype == np.float32
+            np.testing.assert_allclose(decoded, values, rtol=1e-6)
+    
+    def test_accepts_text_vector(self):
+        """Test pgvector text literals are still accepted."""
+        assert encode_vector("[1,2,3]") == encode_vector([1.0, 2.0, 3.0])
+    
+    def test_rejects_nested_embedding(self):
+        """Test 2-D input is rejected."""
+        with pytest.raises(ValueError):
+            encode_vector([[1.0, 2.0]])
+    
+    def test_rejects_empty_embedding(self):
+        """Test an empty embedding is rejected instead of sent as a 0-dim vector."""
+        with pytest.raises(ValueError):
+            encode_vector([])
+
+
+class TestJsonCodec:
+    """Test json and jsonb binary encoding."""
+    
+    def test_jsonb_round_trip(self):
+        """Test jsonb values carry the version byte and decode to Python objects."""
+        data = encode_jsonb({"page": 1, "tags": ["a"]})
+        
+        assert data[:1] == b"\x01"
+        assert decode_jsonb(data) == {"page": 1, "tags": ["a"]}
+    
+    def test_json_strings_pass_through(self):
+        """Test strings are treated as already-encoded JSON."""
+        assert encode_json('{"page": 1}') == b'{"page": 1}'
+        assert decode_json(encode_json({"page": 1})) == {"page": 1}
@@ -39,6 +39,19 @@ class TestSemanticSearch:
         args = connection.fetch.call_args[0]
         assert args[2] == 5  # match_count parameter
     
+    @pytest.mark.asyncio
+    async def test_semantic_search_passes_embedding_directly(self, test_dependencies, mock_database_responses):
+        """Test semantic search hands the embedding to the vector codec without formatting it."""
+        deps, connection = test_dependencies
+        connection.fetch.return_value = mock_database_responses['semantic_search']
+        
+        ctx = RunContext(deps=deps)
+        await semantic_search(ctx, "Python programming")
+        
+        args = connection.fetch.call_args[0]
+        assert isinstance(args[1], list)
+        assert len(args[1]) == 1536
+    
     @pytest.mark.asyncio
     async def test_semantic_search_respects_max_count(self, test_dependencies, mock_database_responses):
         """Test semantic search respects maximum count limit."""
@@ -4,7 +4,6 @@ from typing import Optional, List, Dict, Any
 from pydantic_ai import RunContext
 from pydantic import BaseModel, Field
 import asyncpg
-import json
 from dependencies import AgentDependencies
 
 
@@ -48,16 +47,13 @@ async def semantic_search(
         # Generate embedding for query
         query_embedding = await deps.get_embedding(query)
         
-        # Convert embedding to PostgreSQL vector string format
-        embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-        
-        # Execute semantic search
+        # Execute semantic search; the pool's vector codec sends the embedding as binary
         async with deps.db_pool.acquire() as conn:
             results = await conn.fetch(
                 """
                 SELECT * FROM match_chunks($1::vector, $2)
                 """,
-                embedding_str,
+                query_embedding,
                 match_count
             )
         
@@ -68,7 +64,7 @@ async def semantic_search(
                 document_id=str(row['document_id']),
                 content=row['content'],
                 similarity=row['similarity'],
-                metadata=json.loads(row['metadata']) if row['metadata'] else {},
+                metadata=row['metadata'] or {},
                 document_title=row['document_title'],
                 document_source=row['document_source']
             )
@@ -113,17 +109,13 @@ async def hybrid_search(
         # Generate embedding for query
         query_embedding = await deps.get_embedding(query)
         
-        # Convert embedding to PostgreSQL vector string format
-        # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-        embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-        
-        # Execute hybrid search
+        # Execute hybrid search; the pool's vector codec sends the embedding as binary
         async with deps.db_pool.acquire() as conn:
             results = await conn.fetch(
                 """
                 SELECT * FROM hybrid_search($1::vector, $2, $3, $4)
                 """,
-                embedding_str,
+                query_embedding,
                 query,
                 match_count,
                 text_weight
@@ -138,7 +130,7 @@ async def hybrid_search(
                 'combined_score': row['combined_score'],
                 'vector_similarity': row['vector_similarity'],
                 'text_similarity': row['text_similarity'],
-                'metadata': json.loads(row['metadata']) if row['metadata'] else {},
+                'metadata': row['metadata'] or {},
                 'document_title': row['document_title'],
                 'document_source': row['document_source']
             }
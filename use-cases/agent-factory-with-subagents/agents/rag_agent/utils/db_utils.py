@@ -3,7 +3,6 @@ Database utilities for PostgreSQL connection and operations.
 """
 
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta, timezone
@@ -15,6 +14,8 @@ import asyncpg
 from asyncpg.pool import Pool
 from dotenv import load_dotenv
 
+from .pg_codecs import init_connection
+
 # Load environment variables
 load_dotenv()
 
@@ -45,7 +46,8 @@ class DatabasePool:
                 min_size=5,
                 max_size=20,
                 max_inactive_connection_lifetime=300,
-                command_timeout=60
+                command_timeout=60,
+                init=init_connection
             )
             logger.info("Database connection pool initialized")
     
@@ -113,7 +115,7 @@ async def get_document(document_id: str) -> Optional[Dict[str, Any]]:
                 "title": result["title"],
                 "source": result["source"],
                 "content": result["content"],
-                "metadata": json.loads(result["metadata"]),
+                "metadata": result["metadata"],
                 "created_at": result["created_at"].isoformat(),
                 "updated_at": result["updated_at"].isoformat()
             }
@@ -156,7 +158,7 @@ async def list_documents(
         
         if metadata_filter:
             conditions.append(f"d.metadata @> ${len(params) + 1}::jsonb")
-            params.append(json.dumps(metadata_filter))
+            params.append(metadata_filter)
         
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
@@ -176,7 +178,7 @@ async def list_documents(
                 "id": row["id"],
                 "title": row["title"],
                 "source": row["source"],
-                "metadata": json.loads(row["metadata"]),
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat(),
                 "updated_at": row["updated_at"].isoformat(),
                 "chunk_count": row["chunk_count"]
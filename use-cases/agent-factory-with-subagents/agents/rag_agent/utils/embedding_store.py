@@ -0,0 +1,186 @@
+"""
+Persistent embedding cache shared by ingestion and search.
+
+Embeddings are stored in a single SQLite file keyed by (model, dimension,
+SHA-256 of the text) as float32 blobs, so a text that was embedded once - by
+an ingestion run or by a search query - is never sent to the API again while
+it stays in the cache. When the stored vectors exceed max_bytes the least
+recently used entries are evicted.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+DEFAULT_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+# Evict down to this fraction of max_bytes so eviction does not run on every put
+_EVICT_TARGET = 0.9
+
+
+class EmbeddingStore:
+    """SQLite-backed embedding cache with LRU eviction by size."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_mb: int = DEFAULT_MAX_MB):
+        """
+        Open (or create) the cache file.
+
+        Args:
+            path: SQLite database file
+            max_mb: Size limit for stored vectors in megabytes
+        """
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Several processes (ingestion, the agent) may share the file
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimension, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._stored_bytes()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """SHA-256 of the text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, dimension: int, text: str) -> Optional[List[float]]:
+        """Cached embedding for one text, or None."""
+        return self.get_many(model, dimension, [text])[0]
+
+    def get_many(self, model: str, dimension: int, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Cached embeddings for several texts.
+
+        Args:
+            model: Embedding model name
+            dimension: Embedding dimension
+            texts: Texts to look up
+
+        Returns:
+            Embedding or None per text, in input order
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        unique = list(dict.fromkeys(hashes))
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self._conn.execute(
+                f"""
+                SELECT text_hash, embedding FROM embeddings
+                WHERE model = ? AND dimension = ? AND text_hash IN ({",".join("?" * len(batch))})
+                """,
+                (model, dimension, *batch)
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimension = ? AND text_hash = ?",
+                [(now, model, dimension, text_hash) for text_hash in found]
+            )
+            self._conn.commit()
+
+        results = [found.get(text_hash) for text_hash in hashes]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put(self, model: str, dimension: int, text: str, embedding: Sequence[float]):
+        """Store the embedding for one text."""
+        self.put_many(model, dimension, [(text, embedding)])
+
+    def put_many(self, model: str, dimension: int, items: Sequence[Tuple[str, Sequence[float]]]):
+        """
+        Store embeddings, then evict old entries if the cache is over its limit.
+
+        Args:
+            model: Embedding model name
+            dimension: Embedding dimension
+            items: (text, embedding) pairs
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model, dimension, self.text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in items
+        ]
+        self._conn.executemany(
+            """
+            INSERT OR REPLACE INTO embeddings (model, dimension, text_hash, embedding, last_used)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+        self._conn.commit()
+        # Replaced rows are counted twice until the next resync in _evict
+        self._size += sum(len(row[3]) for row in rows)
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is below its target size."""
+        self._size = self._stored_bytes()
+        target = self.max_bytes * _EVICT_TARGET
+        if self._size <= target:
+            return
+
+        removed = 0
+        cursor = self._conn.execute("SELECT rowid, length(embedding) FROM embeddings ORDER BY last_used")
+        doomed = []
+        for rowid, size in cursor:
+            if self._size - removed <= target:
+                break
+            doomed.append((rowid,))
+            removed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+        self._conn.commit()
+        self._size -= removed
+        logger.info(f"Evicted {len(doomed)} embeddings from {self.path}")
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(length(embedding)), 0) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for this process and the current cache size."""
+        entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self._size}
+
+    def close(self):
+        """Close the database file."""
+        self._conn.close()
@@ -177,6 +177,20 @@ class IngestionConfig(BaseModel):
     max_chunk_size: int = Field(default=2000, ge=500, le=10000)
     use_semantic_chunking: bool = True
     
+    # Pipelined ingestion: stages connected by bounded queues
+    pipelined: bool = False
+    read_concurrency: int = Field(default=4, ge=1, le=64)
+    chunk_concurrency: int = Field(default=4, ge=1, le=64)
+    embed_concurrency: int = Field(default=4, ge=1, le=64)
+    save_concurrency: int = Field(default=4, ge=1, le=64)
+    queue_size: int = Field(default=8, ge=1, le=1000)
+    
+    # COPY chunks in bulk instead of one INSERT per chunk
+    bulk_insert: bool = True
+    
+    # Skip unchanged documents and re-embed only new or changed chunks
+    incremental: bool = False
+    
     @field_validator('chunk_overlap')
     @classmethod
     def validate_overlap(cls, v: int, info) -> int:
@@ -193,4 +207,6 @@ class IngestionResult(BaseModel):
     title: str
     chunks_created: int
     processing_time_ms: float
-    errors: List[str] = Field(default_factory=list)
\ No newline at end of file
+    errors: List[str] = Field(default_factory=list)
+    chunks_reused: int = 0
+    skipped: bool = False
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Binary type codecs for asyncpg connections.
+
+Registered on every pool connection through init_connection so embeddings and
+metadata can be passed as Python objects: NumPy arrays or float lists for
+pgvector columns, dicts and lists for json/jsonb. Everything is sent in binary
+format, which also makes the codecs usable with copy_records_to_table.
+"""
+
+import json
+from typing import Any
+
+import asyncpg
+import numpy as np
+
+
+# pgvector binary wire format: uint16 dimension, uint16 unused, dimension x big-endian float4
+_VECTOR_HEADER = np.dtype(">u2")
+_VECTOR_ELEMENT = np.dtype(">f4")
+
+# jsonb binary wire format: version byte followed by the JSON text
+_JSONB_VERSION = b"\x01"
+
+
+def encode_vector(value) -> bytes:
+    """
+    Encode an embedding in pgvector's binary format.
+
+    Args:
+        value: NumPy array, list of floats, or pgvector text ('[1,2,3]')
+
+    Returns:
+        Binary vector payload
+    """
+    if isinstance(value, str):
+        value = np.array(value.strip("[]").split(","), dtype=np.float32)
+    array = np.asarray(value, dtype=_VECTOR_ELEMENT)
+    if array.ndim != 1:
+        raise ValueError(f"Expected a 1-D embedding, got shape {array.shape}")
+    if array.size == 0:
+        raise ValueError("Cannot encode an empty embedding; pass None for a missing one")
+    return np.array([array.size, 0], dtype=_VECTOR_HEADER).tobytes() + array.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """Decode a binary pgvector value into a float32 NumPy array."""
+    dimension = int(np.frombuffer(data, dtype=_VECTOR_HEADER, count=1)[0])
+    return np.frombuffer(data, dtype=_VECTOR_ELEMENT, count=dimension, offset=4).astype(np.float32)
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode a Python value as JSON text; strings are assumed to be JSON already."""
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return value.encode("utf-8")
+
+
+def decode_json(data: bytes) -> Any:
+    """Decode JSON text into Python objects."""
+    return json.loads(data)
+
+
+def encode_jsonb(value: Any) -> bytes:
+    """Encode a Python value in jsonb's binary format."""
+    return _JSONB_VERSION + encode_json(value)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    """Decode a binary jsonb value into Python objects."""
+    return json.loads(data[1:])
+
+
+async def register_vector_codec(conn: asyncpg.Connection):
+    """Register the binary pgvector codec on a connection."""
+    await conn.set_type_codec(
+        "vector",
+        schema="public",
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary"
+    )
+
+
+async def register_json_codecs(conn: asyncpg.Connection):
+    """Register binary json and jsonb codecs that accept and return Python objects."""
+    await conn.set_type_codec(
+        "json",
+        schema="pg_catalog",
+        encoder=encode_json,
+        decoder=decode_json,
+        format="binary"
+    )
+    await conn.set_type_codec(
+        "jsonb",
+        schema="pg_catalog",
+        encoder=encode_jsonb,
+        decoder=decode_jsonb,
+        format="binary"
+    )
+
+
+async def init_connection(conn: asyncpg.Connection):
+    """
+    Connection init hook for asyncpg.create_pool(init=...).
+
+    Args:
+        conn: Newly opened connection
+    """
+    await register_vector_codec(conn)
+    await register_json_codecs(conn)